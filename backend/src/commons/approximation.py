@@ -0,0 +1,150 @@
+import json
+import os
+from functools import lru_cache
+from numbers import Real
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+"""
+    Fast evaluation profile of the metrics that are global statistics of the CIELab image (e.g. the visual clutter
+    metrics m10 and m11): they are evaluated on a downscaled image, optionally on an evenly spaced sample of its tiles
+    (the scalar results are then averaged, weighted by the tile areas), instead of the full-resolution image.
+
+    The results are approximations, stored and reported along with the profile settings they were evaluated with and
+    their expected deviation from the exact results (see describe_approximation). The deviation is measured over a
+    screenshot corpus by a calibration benchmark (system_performance_tests/calibrate_fast_profile.py), and read from
+    the calibration file it writes, shipped for the default settings. Without a calibration for the metric and the
+    profile settings, no deviation is reported (None) rather than a guessed one.
+"""
+
+# evaluation profiles a request can ask for, "exact" being the reference (research) evaluation
+EVALUATION_PROFILES = ("exact", "fast")
+EXACT_PROFILE: str = "exact"
+FAST_PROFILE: str = "fast"
+
+# default settings of the fast profile: downscaling factor of the image, number of sampled tiles (0 evaluates the
+# whole downscaled image) and size of the (square) tiles, in pixels of the downscaled image
+DEFAULT_FAST_PROFILE_SCALE: float = 0.5
+DEFAULT_FAST_PROFILE_TILES: int = 0
+DEFAULT_FAST_PROFILE_TILE_SIZE: int = 256
+DEFAULT_FAST_PROFILE_CALIBRATION: str = "metrics_evaluator/fast_profile_calibration.json"
+
+
+class FastProfile:
+    """
+    Settings of the fast evaluation profile.
+    """
+
+    def __init__(self, scale: float = DEFAULT_FAST_PROFILE_SCALE, tiles: int = DEFAULT_FAST_PROFILE_TILES,
+                 tile_size: int = DEFAULT_FAST_PROFILE_TILE_SIZE):
+        if not 0 < scale <= 1:
+            raise ValueError(f"The downscaling factor must be in (0, 1], got {scale}.")
+        self.scale = scale
+        self.tiles = tiles
+        self.tile_size = tile_size
+
+    @classmethod
+    def from_env(cls) -> "FastProfile":
+        return cls(
+            scale=float(os.environ.get("FAST_PROFILE_SCALE") or DEFAULT_FAST_PROFILE_SCALE),
+            tiles=int(os.environ.get("FAST_PROFILE_TILES") or DEFAULT_FAST_PROFILE_TILES),
+            tile_size=int(os.environ.get("FAST_PROFILE_TILE_SIZE") or DEFAULT_FAST_PROFILE_TILE_SIZE)
+        )
+
+    @property
+    def key(self) -> str:
+        """
+        Identifier of the settings, under which they are calibrated (and their results cached and reported).
+        """
+        if self.tiles:
+            return f"scale={self.scale:g},tiles={self.tiles},tile_size={self.tile_size}"
+        return f"scale={self.scale:g}"
+
+
+def downscale(image: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Downscale an image (2-D, or 3-D with the channels last) by a factor, averaging the pixels (area interpolation).
+    """
+    if scale == 1:
+        return image
+    height, width = image.shape[:2]
+    size = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+    return cv2.resize(np.ascontiguousarray(image), size, interpolation=cv2.INTER_AREA)
+
+
+def sample_tiles(image: np.ndarray, tile_size: int, count: int) -> List[np.ndarray]:
+    """
+    Pick count square tiles of an image, evenly spaced over its grid of tiles (row-major order), the same tiles for
+    the same image size. The whole image is the only tile if it is not larger than count tiles.
+    """
+    rows, columns = image.shape[0] // tile_size, image.shape[1] // tile_size
+    if count <= 0 or rows * columns <= count:
+        return [image]
+    indices = np.linspace(0, rows * columns - 1, count).round().astype(int)
+    return [
+        image[row * tile_size:(row + 1) * tile_size, column * tile_size:(column + 1) * tile_size]
+        for row, column in (divmod(index, columns) for index in indices)
+    ]
+
+
+def evaluate_fast(execute: Callable[[np.ndarray], List], lab_image: np.ndarray, profile: FastProfile,
+                  sample: bool = True) -> List:
+    """
+    Evaluate a metric of the CIELab image with the fast profile.
+
+    Args:
+        execute: evaluates the metric on a CIELab image
+        lab_image: the CIELab image
+        profile: the fast profile settings
+        sample: whether the metric can be evaluated on a sample of tiles, i.e. all its results are scalars
+
+    Returns:
+        The results of the metric, the scalar results being averaged over the sampled tiles
+    """
+    lab_image = downscale(lab_image, profile.scale)
+    tiles = sample_tiles(lab_image, profile.tile_size, profile.tiles) if sample else [lab_image]
+    if len(tiles) == 1:
+        return execute(tiles[0])
+
+    tile_results = [execute(tile) for tile in tiles]
+    weights = [tile.shape[0] * tile.shape[1] for tile in tiles]
+    results = []
+    for values in zip(*tile_results):
+        if not all(isinstance(value, Real) for value in values):
+            raise ValueError("Only scalar results can be averaged over tiles.")
+        results.append(float(np.average(values, weights=weights)))
+    return results
+
+
+@lru_cache(maxsize=4)
+def _load_calibration(path: str, mtime: float) -> Dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def get_expected_deviation(metric_id: str, profile: FastProfile) -> Optional[Dict]:
+    """
+    Retrieve the deviation of the fast results of a metric from its exact results, as calibrated: the mean signed
+    ("bias") and absolute ("mean", "p95", "max") deviations relative to the exact results, the number of calibration
+    samples and the median speedup. None if the metric is not calibrated with these settings.
+    """
+    path = os.environ.get("FAST_PROFILE_CALIBRATION") or DEFAULT_FAST_PROFILE_CALIBRATION
+    try:
+        calibration = _load_calibration(path, os.path.getmtime(path))
+    except (OSError, ValueError):
+        return None
+    return calibration.get("metrics", {}).get(metric_id, {}).get(profile.key)
+
+
+def describe_approximation(metric_id: str, profile: FastProfile) -> Dict:
+    """
+    Describe the approximate results of a metric, as stored along with them: the profile, its settings and the
+    calibrated deviation from the exact results.
+    """
+    return {
+        "profile": FAST_PROFILE,
+        "settings": profile.key,
+        "expected_deviation": get_expected_deviation(metric_id, profile)
+    }
@@ -0,0 +1,178 @@
+import os
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from commons.create_webdriver import create_webdriver
+
+try:
+    import psutil
+except ImportError:  # memory-based recycling is disabled without psutil
+    psutil = None
+
+"""
+    Pool of warm headless Chrome instances shared by the screenshot capturer, the DOM analyzer and the metrics
+    driving a browser (e.g. the accessibility checks). A browser is leased for one page at a time, its state is
+    cleared when it is returned, and it is recycled after a number of pages or once it grows over its memory budget.
+"""
+
+# window size of the browser per component, Chrome's headless default otherwise
+WINDOW_SIZES: Dict[str, Tuple[int, int]] = {
+    'ScreenshotCapturer': (1200, 1200),
+}
+DEFAULT_WINDOW_SIZE: Tuple[int, int] = (800, 600)
+
+
+class _Browser:
+    def __init__(self):
+        self.driver = create_webdriver('')
+        self.page_count = 0
+
+    def memory_usage(self) -> int:
+        """
+        Resident memory of the browser processes (Chrome and its renderers) in bytes, 0 if unknown.
+        """
+        if psutil is None:
+            return 0
+        try:
+            service_process = psutil.Process(self.driver.service.process.pid)
+            return sum(child.memory_info().rss for child in service_process.children(recursive=True))
+        except (AttributeError, psutil.Error):
+            return 0
+
+    def visited_origins(self) -> Set[str]:
+        """
+        Origins of the documents loaded in the windows of the browser (their main frames and subframes), i.e. the
+        origins that may have stored data during the lease.
+        """
+        origins = set()
+        for handle in self.driver.window_handles:
+            self.driver.switch_to.window(handle)
+            frames = [self.driver.execute_cdp_cmd('Page.getFrameTree', {})['frameTree']]
+            while frames:
+                frame = frames.pop()
+                origins.add(frame['frame'].get('securityOrigin', ''))
+                frames.extend(frame.get('childFrames', []))
+            url = urlsplit(self.driver.current_url)
+            origins.add(f"{url.scheme}://{url.netloc}")
+        # opaque origins (about:blank, data: URLs) have no storage of their own
+        return {origin for origin in origins if re.match(r'^https?://[^/]+$', origin)}
+
+    def reset(self):
+        """
+        Clear the state left by the previous lease, so that the next one starts from an isolated context.
+        """
+        origins = self.visited_origins()
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+        self.driver.get('about:blank')
+        self.driver.delete_all_cookies()
+        self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        self.driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+        # storage is cleared per origin, CDP has no wildcard origin
+        for origin in sorted(origins):
+            self.driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"Failed to quit browser: {e}")
+
+
+class BrowserPool:
+    """
+    Bounded pool of browsers with lease/return semantics. Browsers are started lazily, up to the size of the pool,
+    and stay warm between leases.
+    """
+
+    def __init__(self, size: Optional[int] = None, max_pages: Optional[int] = None,
+                 max_memory_bytes: Optional[int] = None):
+        self.size = size or int(os.environ.get("BROWSER_POOL_SIZE") or 2)
+        # number of pages after which a browser is replaced, 0 never replaces it
+        self.max_pages = max_pages if max_pages is not None else int(os.environ.get("BROWSER_MAX_PAGES") or 50)
+        # memory budget of a browser, 0 disables memory-based recycling
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else \
+            int(os.environ.get("BROWSER_MAX_MEMORY_MB") or 0) * 1024 * 1024
+        self._idle: "queue.LifoQueue[_Browser]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._pid = os.getpid()
+
+    def start(self):
+        """
+        Start every browser of the pool, so that the first requests do not pay the cold start.
+        """
+        for _ in range(self.size - self._idle.qsize()):
+            self._idle.put(_Browser())
+        return self
+
+    @contextmanager
+    def lease(self, component_name: str = ''):
+        """
+        Lease a browser for the duration of the context, waiting for one to be returned if all are in use.
+        """
+        self._slots.acquire()
+        browser = None
+        try:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                browser = _Browser()
+            browser.driver.set_window_size(*WINDOW_SIZES.get(component_name, DEFAULT_WINDOW_SIZE))
+            yield browser.driver
+        finally:
+            if browser is not None:
+                self._return(browser)
+            self._slots.release()
+
+    def _return(self, browser: _Browser):
+        browser.page_count += 1
+        recycle = (self.max_pages and browser.page_count >= self.max_pages) or \
+                  (self.max_memory_bytes and browser.memory_usage() > self.max_memory_bytes)
+        if not recycle:
+            try:
+                browser.reset()
+            except Exception as e:
+                print(f"Failed to reset browser, replacing it: {e}")
+                recycle = True
+        if recycle:
+            # the replacement is started lazily, by the next lease
+            browser.quit()
+        else:
+            self._idle.put(browser)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+
+
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Retrieve the browser pool of the current process. Forked processes (e.g. metric workers) get a pool of their own.
+    """
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None or _browser_pool._pid != os.getpid():
+            _browser_pool = BrowserPool()
+        return _browser_pool
+
+
+def shutdown_browser_pool():
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is not None and _browser_pool._pid == os.getpid():
+            _browser_pool.close()
+        _browser_pool = None
@@ -0,0 +1,83 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+"""
+    sRGB to CIELab conversion in single precision, shared by the image preprocessing and the visual clutter code.
+    The output matches skimage.color.rgb2lab (D65 illuminant, 2° observer) up to float32 rounding.
+"""
+
+# reference white points, as the XYZ values of the white in the scale of the RGB to XYZ conversion
+D65_WHITE_POINT: Tuple[float, float, float] = (0.95047, 1.0, 1.08883)
+# as used by AIM's visual clutter implementation (on XYZ values in [0, 1]), kept for the results to stay comparable
+AIM_WHITE_POINT: Tuple[float, float, float] = (95.047, 100.0, 108.833)
+
+# sRGB (linear) to XYZ, D65
+XYZ_FROM_RGB = np.array(
+    [
+        [0.412453, 0.357580, 0.180423],
+        [0.212671, 0.715160, 0.072169],
+        [0.019334, 0.119193, 0.950227],
+    ]
+)
+
+# rows converted at once, bounding the temporaries to a few times the size of a band of the image
+DEFAULT_CHUNK_ROWS: int = 256
+
+
+def _linearize(values: np.ndarray) -> np.ndarray:
+    # inverse sRGB gamma of values in [0, 1]
+    values = np.asarray(values, dtype=np.float32)
+    return np.where(
+        values > 0.04045, ((values + np.float32(0.055)) / np.float32(1.055)) ** np.float32(2.4),
+        values / np.float32(12.92)
+    ).astype(np.float32, copy=False)
+
+
+# linear values of the 256 levels of 8-bit channels
+_LINEAR_LUT: np.ndarray = _linearize(np.arange(256) / 255.0)
+
+
+def srgb_to_lab(image: np.ndarray, white_point: Tuple[float, float, float] = D65_WHITE_POINT,
+                chunk_rows: Optional[int] = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+    """
+    Convert an RGB image to the CIELab color space.
+
+    Args:
+        image: RGB image of shape (height, width, 3), either uint8 (converted through a lookup table) or with values
+            in [0, 255]
+        white_point: the reference white the XYZ values are normalized with
+        chunk_rows: number of rows converted at once, None to convert the whole image at once
+
+    Returns:
+        the Lab image as a float32 array of shape (height, width, 3)
+    """
+    image = np.asarray(image)
+    height = image.shape[0]
+    # the normalization by the white point is folded into the XYZ conversion
+    matrix = (XYZ_FROM_RGB / np.asarray(white_point)[:, None]).T.astype(np.float32)
+    lab = np.empty(image.shape[:2] + (3,), dtype=np.float32)
+    chunk_rows = chunk_rows or max(height, 1)
+
+    for start in range(0, height, chunk_rows):
+        chunk = image[start:start + chunk_rows, :, :3]
+        if chunk.dtype == np.uint8:
+            linear = _LINEAR_LUT[chunk]
+        else:
+            linear = _linearize(chunk / np.float32(255.0))
+
+        xyz = linear @ matrix
+        mask = xyz > 0.008856
+        f = np.cbrt(xyz, out=linear)
+        np.multiply(xyz, np.float32(7.787), out=xyz)
+        np.add(xyz, np.float32(16 / 116), out=xyz)
+        np.copyto(f, xyz, where=~mask)
+
+        out = lab[start:start + chunk_rows]
+        np.subtract(f[:, :, 1] * np.float32(116), np.float32(16), out=out[:, :, 0])
+        np.subtract(f[:, :, 0], f[:, :, 1], out=out[:, :, 1])
+        out[:, :, 1] *= np.float32(500)
+        np.subtract(f[:, :, 1], f[:, :, 2], out=out[:, :, 2])
+        out[:, :, 2] *= np.float32(200)
+
+    return lab
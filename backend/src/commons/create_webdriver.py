@@ -14,6 +14,9 @@ def create_webdriver(component_name: str):
     options.add_argument("--mute-audio")
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
+    # network events are read from the performance log to detect when a page has settled
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
 
     if component_name == 'ScreenshotCapturer':
         # Set specific options for ScreenshotCapturer
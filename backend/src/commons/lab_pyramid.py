@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+import numpy as np
+from pyrtools import pyramids
+
+from commons.visual_clutter_utils import centered_dft
+
+"""
+    Multi-scale decomposition of a CIELab image shared by the visual clutter metrics (feature congestion and subband
+    entropy), so that it is computed once per evaluation rather than by each metric: per channel (L, a, b), the levels
+    of its Gaussian pyramid, the first one being the channel itself, and its centered 2-D DFT, from which steerable
+    pyramids are built (see SteerableFreqBasis).
+"""
+
+LAB_CHANNELS: Tuple[str, ...] = ("L", "a", "b")
+# number of levels of the Gaussian pyramids, the number of scales of the feature congestion metric
+GAUSSIAN_LEVELS: int = 3
+
+
+class LabPyramid:
+    """
+    Gaussian pyramids and DFTs of the channels of a CIELab image, as read-only float64 (complex128) arrays named
+    "<channel>/gaussian/<level>" and "<channel>/dft" (e.g. shared through a SharedArrayGroup).
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+
+    @classmethod
+    def build(cls, lab_image: np.ndarray, levels: int = GAUSSIAN_LEVELS) -> "LabPyramid":
+        """
+        Decompose a CIELab image, the channels in parallel (the filters and FFTs release the GIL).
+        """
+        def decompose(channel: int) -> Dict[str, np.ndarray]:
+            name = LAB_CHANNELS[channel]
+            gaussian = pyramids.GaussianPyramid(lab_image[:, :, channel], height=levels).pyr_coeffs
+            arrays = {f"{name}/gaussian/{level}": gaussian[(level, 0)] for level in range(levels)}
+            arrays[f"{name}/dft"] = centered_dft(arrays[f"{name}/gaussian/0"])
+            return arrays
+
+        arrays = {}
+        with ThreadPoolExecutor(max_workers=len(LAB_CHANNELS)) as executor:
+            for channel_arrays in executor.map(decompose, range(len(LAB_CHANNELS))):
+                arrays.update(channel_arrays)
+        for array in arrays.values():
+            array.setflags(write=False)
+        return cls(arrays)
+
+    @property
+    def levels(self) -> int:
+        return sum(1 for name in self.arrays if name.startswith(f"{LAB_CHANNELS[0]}/gaussian/"))
+
+    def channel(self, channel: str) -> np.ndarray:
+        return self.arrays[f"{channel}/gaussian/0"]
+
+    def gaussian_pyramid(self, channel: str) -> Dict:
+        """
+        The Gaussian pyramid of a channel, keyed as pyrtools' pyr_coeffs ((level, 0), from fine to coarse).
+        """
+        return {(level, 0): self.arrays[f"{channel}/gaussian/{level}"] for level in range(self.levels)}
+
+    def dft(self, channel: str) -> np.ndarray:
+        return self.arrays[f"{channel}/dft"]
+
+    @property
+    def lab_image(self) -> np.ndarray:
+        """
+        The CIELab image (float64), e.g. to downscale it.
+        """
+        return np.dstack([self.channel(channel) for channel in LAB_CHANNELS])
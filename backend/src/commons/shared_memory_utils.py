@@ -0,0 +1,126 @@
+import os
+import tempfile
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+"""
+    Utility functions for handing image artifacts (RGB, grayscale, CIELab arrays) to the metric workers without
+    pickling them. An array is written once to a memory-mapped file in /dev/shm, and workers attach read-only views
+    to it by its path.
+"""
+
+# /dev/shm is memory-backed on Linux, fall back to the temporary directory elsewhere (e.g. macOS)
+SHARED_MEMORY_DIR: str = os.environ.get("SHARED_MEMORY_DIR") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+
+
+class SharedArray:
+    """
+    Picklable handle of a NumPy array stored in a memory-mapped .npy file.
+    Only the path is sent to the workers.
+    """
+
+    def __init__(self, path: str, as_image: bool = False):
+        self.path = path
+        self.as_image = as_image
+
+    @classmethod
+    def create(cls, array: np.ndarray, as_image: bool = False) -> "SharedArray":
+        """
+        Copy an array into a new memory-mapped file.
+
+        Args:
+            array: the array to be shared
+            as_image: whether the array (RGB or grayscale, uint8) should be opened as a PIL image
+        """
+        path = os.path.join(SHARED_MEMORY_DIR, f"wui_artifact_{uuid.uuid4().hex}.npy")
+        shared = np.lib.format.open_memmap(path, mode="w+", dtype=array.dtype, shape=array.shape)
+        shared[...] = array
+        shared.flush()
+        del shared
+        return cls(path, as_image)
+
+    @classmethod
+    def create_stacked(cls, arrays: Iterable[np.ndarray], shape: Tuple[int, ...], dtype,
+                       as_image: bool = False) -> "SharedArray":
+        """
+        Copy arrays stacked along their first axis (e.g. the tiles of an image, from top to bottom) into a new
+        memory-mapped file, one array at a time, without stacking them in memory.
+
+        Args:
+            arrays: the arrays to be shared, of the shape of the stacked array but along the first axis
+            shape: the shape of the stacked array
+            dtype: the data type of the stacked array
+            as_image: whether the array (RGB or grayscale, uint8) should be opened as a PIL image
+        """
+        path = os.path.join(SHARED_MEMORY_DIR, f"wui_artifact_{uuid.uuid4().hex}.npy")
+        shared = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=tuple(shape))
+        start = 0
+        for array in arrays:
+            shared[start:start + len(array)] = array
+            start += len(array)
+        shared.flush()
+        del shared
+        return cls(path, as_image)
+
+    def open(self) -> Any:
+        """
+        Attach a read-only view of the array, or a PIL image if it was shared as one.
+        """
+        array = np.asarray(np.load(self.path, mmap_mode="r"))
+        if self.as_image:
+            return Image.fromarray(array)
+        return array
+
+    def unlink(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SharedArrayGroup:
+    """
+    Picklable handle of named NumPy arrays making up a single artifact (e.g. the levels of a pyramid), each stored in
+    a memory-mapped .npy file. The arrays are opened together, and passed to the factory of the artifact if any.
+    """
+
+    def __init__(self, arrays: Dict[str, SharedArray], factory: Optional[Callable[[Dict[str, np.ndarray]], Any]] = None):
+        self.arrays = arrays
+        self.factory = factory
+
+    @classmethod
+    def create(cls, arrays: Dict[str, np.ndarray],
+               factory: Optional[Callable[[Dict[str, np.ndarray]], Any]] = None) -> "SharedArrayGroup":
+        """
+        Copy named arrays into new memory-mapped files.
+
+        Args:
+            arrays: the arrays to be shared, by name
+            factory: builds the artifact from the read-only views of the arrays (a class, or a function of a module,
+                     so that it is sent to the workers by name)
+        """
+        return cls({name: SharedArray.create(array) for name, array in arrays.items()}, factory)
+
+    def open(self) -> Any:
+        arrays = {name: shared_array.open() for name, shared_array in self.arrays.items()}
+        if self.factory is not None:
+            return self.factory(arrays)
+        return arrays
+
+    def unlink(self):
+        for shared_array in self.arrays.values():
+            shared_array.unlink()
+
+
+def open_shared(artifact: Any) -> Any:
+    """
+    Attach a shared artifact, other artifacts are returned as they are.
+    """
+    if isinstance(artifact, (SharedArray, SharedArrayGroup)):
+        return artifact.open()
+    return artifact
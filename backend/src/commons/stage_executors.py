@@ -0,0 +1,50 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+"""
+    Bounded executors for the blocking stages of the request handling, so that they are awaited off the asyncio event
+    loop: one slow page (or a slow storage request) then only occupies a thread of its stage, and the server keeps
+    handling other requests. Each stage has its own concurrency limit, configurable per server instance.
+"""
+
+# stage name: (environment variable holding its number of threads, default number of threads)
+STAGES: Dict[str, tuple] = {
+    # rendering pages and capturing screenshots with Selenium, each capture leases a browser from the browser pool
+    "capture": ("CAPTURE_STAGE_WORKERS", 2),
+    # decoding uploaded screenshots (PNG inputs)
+    "decoding": ("DECODING_STAGE_WORKERS", 2),
+    # uploads and queries to the Supabase storage and database
+    "storage": ("STORAGE_STAGE_WORKERS", 8),
+    # evaluation of the metrics of a WUI (the task graphs, which wait on the metric worker pool)
+    "evaluation": ("EVALUATION_STAGE_WORKERS", 4),
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_stage_executor(stage: str) -> ThreadPoolExecutor:
+    """
+    Retrieve the executor of a stage, creating it on first use.
+    """
+    if stage not in _executors:
+        env_variable, default_workers = STAGES[stage]
+        max_workers = int(os.environ.get(env_variable) or default_workers)
+        _executors[stage] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{stage}_stage")
+    return _executors[stage]
+
+
+async def run_in_stage(stage: str, func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking function in the executor of a stage and await its result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_stage_executor(stage), partial(func, *args, **kwargs))
+
+
+def shutdown_stage_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False)
+    _executors.clear()
@@ -0,0 +1,196 @@
+import struct
+import zlib
+from typing import Iterator, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from commons.shared_memory_utils import SharedArray
+from image_preprocessing.InputImage import PNG_SIGNATURE
+
+"""
+    Utility classes for full-page screenshots stored as vertical tiles. The tiles are memory-mapped files (see
+    shared_memory_utils), so that tile-decomposable metrics can stream over them and combine per-tile statistics,
+    keeping their memory usage bounded by the size of a tile rather than the height of the page.
+"""
+
+# PNG row filters tried by Pillow's encoder, in its order (the average filter only when optimizing)
+PNG_FILTER_NONE, PNG_FILTER_SUB, PNG_FILTER_UP, PNG_FILTER_PAETH = 0, 1, 2, 4
+
+
+class ImageTile:
+    """
+    A horizontal band of a tiled image. With an overlap, the band also holds rows of the neighbouring tiles, the rows
+    of the tile itself being array[core].
+    """
+
+    def __init__(self, array: np.ndarray, top: int, core: slice):
+        self.array = array
+        self.top = top
+        self.core = core
+        self._pil_image: Optional[Image.Image] = None
+
+    @property
+    def height(self) -> int:
+        return self.core.stop - self.core.start
+
+    @property
+    def pil_image(self) -> Image.Image:
+        if self._pil_image is None:
+            self._pil_image = Image.fromarray(self.array)
+        return self._pil_image
+
+    @property
+    def grayscale_image(self) -> Image.Image:
+        from image_preprocessing.ImagePreprocessing import ImagePreprocessing
+        return ImagePreprocessing.convert_pil_image_to_grayscale(self.pil_image)
+
+    @property
+    def lab_image(self) -> np.ndarray:
+        from image_preprocessing.ImagePreprocessing import ImagePreprocessing
+        return ImagePreprocessing.convert_pil_image_to_lab(self.pil_image)
+
+
+class TiledImage:
+    """
+    Picklable handle of an RGB image stored as vertical tiles (top to bottom) of the same width.
+    """
+
+    def __init__(self, tiles: List[SharedArray], width: int, height: int):
+        self.tiles = tiles
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def create(cls, tile_arrays: Iterator[np.ndarray]) -> "TiledImage":
+        """
+        Store tiles (uint8 RGB arrays, from top to bottom) into memory-mapped files, one tile at a time.
+        """
+        tiles = []
+        width = height = 0
+        for tile_array in tile_arrays:
+            tiles.append(SharedArray.create(tile_array))
+            height += tile_array.shape[0]
+            width = tile_array.shape[1]
+        return cls(tiles, width, height)
+
+    def iter_tiles(self, overlap: int = 0) -> Iterator[ImageTile]:
+        """
+        Iterate over the tiles, from top to bottom.
+
+        Args:
+            overlap: number of rows of the neighbouring tiles to include above and below each tile, e.g. for
+                neighbourhood operations to be computed correctly along the tile borders
+        """
+        top = 0
+        for i, tile in enumerate(self.tiles):
+            array = tile.open()
+            above = self.tiles[i - 1].open()[-overlap:] if overlap and i > 0 else array[:0]
+            below = self.tiles[i + 1].open()[:overlap] if overlap and i < len(self.tiles) - 1 else array[:0]
+            core = slice(len(above), len(above) + len(array))
+            if len(above) or len(below):
+                array = np.concatenate([above, array, below])
+            yield ImageTile(array, top, core)
+            top += core.stop - core.start
+
+    def share(self) -> SharedArray:
+        """
+        Copy the tiles into a single memory-mapped image, one tile at a time, for the metrics that need the whole
+        image.
+        """
+        return SharedArray.create_stacked(
+            (tile.open() for tile in self.tiles), (self.height, self.width, 3), np.uint8, as_image=True
+        )
+
+    def to_png(self, compress_level: int = 6) -> bytes:
+        """
+        Encode the image as a PNG file (8-bit RGB), one tile at a time, the rows being filtered as Pillow does.
+        """
+        compressor = zlib.compressobj(compress_level)
+        row_size = self.width * 3
+        idat = []
+        prior = np.zeros(row_size, dtype=np.uint8)
+        for tile in self.tiles:
+            rows = tile.open().reshape(-1, row_size)
+            idat.append(compressor.compress(_filter_png_rows(rows, prior)))
+            prior = rows[-1]
+        idat.append(compressor.flush())
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return PNG_SIGNATURE + _png_chunk(b"IHDR", header) + _png_chunk(b"IDAT", b"".join(idat)) + \
+            _png_chunk(b"IEND", b"")
+
+    def to_image(self) -> Image.Image:
+        """
+        Stitch the tiles into a single image.
+        """
+        image = Image.new("RGB", (self.width, self.height))
+        for tile in self.iter_tiles():
+            image.paste(tile.pil_image, (0, tile.top))
+        return image
+
+    def unlink(self):
+        for tile in self.tiles:
+            tile.unlink()
+
+
+def _filter_png_rows(rows: np.ndarray, prior: np.ndarray) -> bytes:
+    """
+    Filter the rows of a PNG image (uint8, 3 bytes per pixel), each with the filter whose output is the closest to
+    zero (the sum of its bytes taken as signed), the first one in Pillow's order in case of a tie.
+
+    Args:
+        rows: the rows to be filtered
+        prior: the row above the first one, zeros for the first row of the image
+    """
+    x = rows.astype(np.int16)
+    b = np.vstack([prior[np.newaxis], rows[:-1]]).astype(np.int16)
+    a = np.zeros_like(x)
+    a[:, 3:] = x[:, :-3]
+    c = np.zeros_like(b)
+    c[:, 3:] = b[:, :-3]
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+    filter_types = np.array([PNG_FILTER_NONE, PNG_FILTER_UP, PNG_FILTER_SUB, PNG_FILTER_PAETH], dtype=np.uint8)
+    filtered = np.stack([x, x - b, x - a, x - paeth]).astype(np.uint8)
+    distances = np.minimum(filtered, 256 - filtered.astype(np.int32)).sum(axis=2)
+    # argmin picks the first of the filters with the smallest distance
+    best = np.argmin(distances, axis=0)
+    output = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    output[:, 0] = filter_types[best]
+    output[:, 1:] = filtered[best, np.arange(len(rows))]
+    return output.tobytes()
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+class RunningMoments:
+    """
+    Mean and standard deviation of values streamed in chunks (e.g. per tile), merged with Chan et al.'s parallel
+    algorithm so that the result matches the statistics of the concatenated values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values: np.ndarray):
+        count = values.size
+        if count == 0:
+            return
+        values = values.astype(np.float64, copy=False)
+        mean = float(np.mean(values))
+        m2 = float(np.var(values)) * count
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
@@ -0,0 +1,38 @@
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+"""
+    Time limit of the metrics evaluated in the worker processes, interrupting a metric running for too long rather
+    than letting it hold its worker (and store its results once they are no longer expected).
+"""
+
+
+class MetricTimeout(BaseException):
+    """
+    Raised in a worker when a metric runs for longer than its timeout. Not an Exception, so that metrics catching
+    their own errors do not swallow it.
+    """
+
+
+@contextmanager
+def time_limit(seconds: Optional[float]):
+    """
+    Interrupt the code of the context with MetricTimeout once it has run for the given time, in the main thread of a
+    process only (e.g. a metric worker), no limit otherwise.
+    """
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def interrupt(signum, frame):
+        raise MetricTimeout()
+
+    previous_handler = signal.signal(signal.SIGALRM, interrupt)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
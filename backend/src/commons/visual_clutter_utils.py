@@ -1,15 +1,32 @@
-from typing import Dict, List, Optional, Tuple, Union
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
-from scipy import signal
+from pyrtools.pyramids.c.wrapper import pointOp
+from pyrtools.tools.utils import rcosFn
+from scipy.special import factorial
 from skimage import transform
 
+from commons.color_conversion import AIM_WHITE_POINT, srgb_to_lab
+from commons.convolution import convolve2d
+
 """    
     Utility functions for computation of visual clutter metrics (feature congestion & subband entropy)
     Implemented by AIM (https://github.com/aalto-ui/aim).
+
+    The filter kernels only depend on their parameters, they are built once per process and returned as read-only
+    arrays (the filter bank). The overlap normalization maps of RRoverlapconv are cached per kernel and image shape.
 """
 
+# number of overlap normalization maps kept, e.g. for every kernel and pyramid level of an evaluation
+OVERLAP_SUM_CACHE_SIZE: int = 64
+
+
+def _read_only(*arrays: np.ndarray):
+    for array in arrays:
+        array.setflags(write=False)
+
 
 def normalize(arr: np.ndarray) -> np.ndarray:
     """
@@ -47,12 +64,8 @@ def conv2(
     Returns:
         Convolution ndarray of input matrices
     """
-    if mode == "same":
-        return np.rot90(
-            signal.convolve2d(np.rot90(x, 2), np.rot90(y, 2), mode=mode), 2
-        )
-    else:
-        return signal.convolve2d(x, y)
+    # the backend (direct, separable, OpenCV or FFT) is picked from the sizes of x and y
+    return convolve2d(x, y, mode="same" if mode == "same" else "full")
 
 
 def RRoverlapconv(kernel: np.ndarray, in_: np.ndarray) -> np.ndarray:
@@ -72,15 +85,32 @@ def RRoverlapconv(kernel: np.ndarray, in_: np.ndarray) -> np.ndarray:
     # Convolve with the original kernel
     out = conv2(in_, kernel, mode="same")
 
-    # Convolve kernel with an image of 1's, of the same size as the input image
-    rect = np.ones_like(in_)
-
-    overlapsum = conv2(rect, kernel, "same")
+    overlapsum = _overlap_sum(kernel.shape, kernel.dtype.str, kernel.tobytes(), in_.shape)
     # Now scale the output image at each pixel by the relative overlap of the filter with the image
     out = np.sum(kernel) * out / overlapsum
     return out
 
 
+@lru_cache(maxsize=OVERLAP_SUM_CACHE_SIZE)
+def _overlap_sum(
+        kernel_shape: Tuple[int, int], kernel_dtype: str, kernel_bytes: bytes, shape: Tuple[int, int]
+) -> np.ndarray:
+    """
+    Convolves a kernel with an image of 1's of the given shape, i.e. the sum
+    of the kernel weights overlapping the image at each pixel. Along the axes
+    the kernel does not extend over, the map is constant, so it is computed
+    on a single row (or column) and broadcast.
+    """
+    kernel = np.frombuffer(kernel_bytes, dtype=kernel_dtype).reshape(kernel_shape)
+    rect = np.ones(
+        (shape[0] if kernel_shape[0] > 1 else 1, shape[1] if kernel_shape[1] > 1 else 1)
+    )
+    overlapsum = conv2(rect, kernel, "same")
+    _read_only(overlapsum)
+    return overlapsum
+
+
+@lru_cache(maxsize=None)
 def RRgaussfilter1D(
         halfsupport: int, sigma: Union[int, float], center: Union[int, float] = 0
 ) -> np.ndarray:
@@ -97,15 +127,16 @@ def RRgaussfilter1D(
     Returns:
         Filtered ndarray of input image with the filter kernel
     """
-    t = list(range(-halfsupport, halfsupport + 1))
-    kernel = np.array(
-        [np.exp(-((x - center) ** 2) / (2 * sigma ** 2)) for x in t]
-    )
-    kernel = kernel / sum(kernel)
+    t = np.arange(-halfsupport, halfsupport + 1)
+    kernel = np.exp(-((t - center) ** 2) / (2 * sigma ** 2))
+    kernel = kernel / np.sum(kernel)
 
-    return kernel.reshape(1, kernel.shape[0])
+    kernel = kernel.reshape(1, kernel.shape[0])
+    _read_only(kernel)
+    return kernel
 
 
+@lru_cache(maxsize=None)
 def DoG1filter(
         a: int, sigma: Union[int, float]
 ) -> Tuple[np.ndarray, np.ndarray]:
@@ -129,14 +160,16 @@ def DoG1filter(
     sigi = 0.71 * sigma
     sigo = 1.14 * sigma
 
-    t = range(-a, a + 1)
+    t = np.arange(-a, a + 1)
 
-    gi = np.array([np.exp(-(x ** 2) / (2 * sigi ** 2)) for x in t])
+    gi = np.exp(-(t ** 2) / (2 * sigi ** 2))
     gi = gi / np.sum(gi)
-    go = np.array([np.exp(-(x ** 2) / (2 * sigo ** 2)) for x in t])
+    go = np.exp(-(t ** 2) / (2 * sigo ** 2))
     go = go / np.sum(go)
 
-    return gi.reshape(1, gi.shape[0]), go.reshape(1, go.shape[0])
+    gi, go = gi.reshape(1, gi.shape[0]), go.reshape(1, go.shape[0])
+    _read_only(gi, go)
+    return gi, go
 
 
 def addborder(
@@ -238,23 +271,33 @@ def RRcontrast1channel(pyr: Dict, DoG_sigma: Union[int, float] = 2) -> List:
     Returns:
         1-channel list contrast
     """
-    levels = len(pyr)
-    contrast = [0] * levels
+    return [RRcontrast1level(pyr[(i, 0)], DoG_sigma) for i in range(0, len(pyr))]
+
 
+def RRcontrast1level(image: np.ndarray, DoG_sigma: Union[int, float] = 2) -> np.ndarray:
+    """
+    Filters a single level of a Gaussian pyramid with a 1-channel contrast feature detector.
+
+    Args:
+        image: Level of a Gaussian pyramid
+        DoG_sigma: Size of the center-surround (Difference-of-Gaussian) filter
+                   used for computing the contrast. Default = 2.
+                   Refer to DoG1filter
+
+    Returns:
+        1-channel contrast ndarray
+    """
     # Here we're using the difference-of-gaussian filters. Separable.
     # Refer to routine 'DoG1filter'.
     innerG1, outerG1 = DoG1filter(round(DoG_sigma * 3), DoG_sigma)
 
     # Do contrast feature computation with these filters:
-    for i in range(0, levels):
-        inner = filt2(innerG1, pyr[(i, 0)])
-        inner = filt2(innerG1.T, inner)
-        outer = filt2(outerG1, pyr[(i, 0)])
-        outer = filt2(outerG1.T, outer)
-        tmp = inner - outer
-        contrast[i] = abs(tmp)  # ** 2
-
-    return contrast
+    inner = filt2(innerG1, image)
+    inner = filt2(innerG1.T, inner)
+    outer = filt2(outerG1, image)
+    outer = filt2(outerG1.T, outer)
+    tmp = inner - outer
+    return abs(tmp)  # ** 2
 
 
 def reduce(
@@ -435,20 +478,18 @@ def imrotate(
     return im
 
 
-def orient_filtnew(
-        pyr: np.ndarray, sigma: Union[int, float] = 16 / 14
+@lru_cache(maxsize=None)
+def orientation_filters(
+        sigma: Union[int, float] = 16 / 14
 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
-    Filters "pyr" (in principle, one level of the Gaussian pyramid generated
-    by gausspyr) with 2nd derivative filters in 4 directions.
+    Builds the 2nd derivative filters in 4 directions used by orient_filtnew.
 
     Args:
-        pyr: Gaussian pyramid. It can be computed from this "pyrtools" package
         sigma: Sigma of filter
 
     Returns:
-        4 output images appended together in a list, in the order horizontal,
-        vertical, up-left, and down-right.
+        The horizontal, vertical, up-left, and down-right filters
     """
     halfsupport = round(3 * sigma)
     # halfsupport was 10, for default sigma.  We need a halfsupport of about
@@ -486,6 +527,27 @@ def orient_filtnew(
     GGc = GGc / np.sum(GGc)
     L = -GGa + 2 * GGb - GGc
 
+    _read_only(H, V, L, R)
+    return H, V, L, R
+
+
+def orient_filtnew(
+        pyr: np.ndarray, sigma: Union[int, float] = 16 / 14
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Filters "pyr" (in principle, one level of the Gaussian pyramid generated
+    by gausspyr) with 2nd derivative filters in 4 directions.
+
+    Args:
+        pyr: Gaussian pyramid. It can be computed from this "pyrtools" package
+        sigma: Sigma of filter
+
+    Returns:
+        4 output images appended together in a list, in the order horizontal,
+        vertical, up-left, and down-right.
+    """
+    H, V, L, R = orientation_filters(sigma)
+
     hout = filt2(H, pyr)
     vout = filt2(V, pyr)
     lout = filt2(L, pyr)
@@ -508,12 +570,24 @@ def histc(x: np.ndarray, bins: np.ndarray) -> np.ndarray:
         Counts the number of values in x that are within each specified bin range
     """
     map_to_bins = np.digitize(
-        x, bins
+        np.ravel(x), bins
     )  # Get indices of the bins to which each value in input array belongs.
-    res = np.zeros(bins.shape)
-    for el in map_to_bins:
-        res[el - 1] += 1  # Increment appropriate bin.
-    return res
+    # Values below the first edge (index 0) or from the last edge on (index len(bins)) are counted in the last bin
+    map_to_bins -= 1
+    map_to_bins %= len(bins)
+    return np.bincount(map_to_bins, minlength=len(bins)).astype(float)
+
+
+def _entropy_bin_counts(x: np.ndarray, nbins: int) -> np.ndarray:
+    # uniform binning between the minimum and the maximum of x, as computed by entropy
+    edges = np.histogram_bin_edges(x, bins=nbins - 1)
+    return histc(x, edges)
+
+
+def _entropy_from_counts(counts: np.ndarray) -> float:
+    ref_hist = counts / float(np.sum(counts))
+    ref_hist = ref_hist[np.nonzero(ref_hist)]
+    return -np.sum(ref_hist * np.log(ref_hist))
 
 
 def entropy(x: np.ndarray, nbins: Optional[int] = None) -> float:
@@ -535,58 +609,151 @@ def entropy(x: np.ndarray, nbins: Optional[int] = None) -> float:
     elif nbins == 1:
         return 0
 
-    edges = np.histogram(x, bins=nbins - 1)[1]
-    ref_hist = histc(x, edges)
-    ref_hist = ref_hist / float(np.sum(ref_hist))
-    ref_hist = ref_hist[np.nonzero(ref_hist)]
-    ref_ent = -np.sum(ref_hist * np.log(ref_hist))
-
-    return ref_ent
+    return _entropy_from_counts(_entropy_bin_counts(x, nbins))
 
 
-def rgb2lab(im: np.ndarray) -> np.ndarray:
+def band_entropies(bands: Iterable[np.ndarray]) -> np.ndarray:
     """
-    Converts the RGB color space to the CIELab color space.
+    Computes the entropies of several signals at once (e.g. the bands of a
+    steerable pyramid), each with sqrt(number of samples) bins as in entropy.
 
     Args:
-        im: Input RGB image
+        bands: Ndarray signals, flattened
 
     Returns:
-        Output Lab image
+        Ndarray of the entropies of the bands
     """
-    im = im / 255.0  # get r,g,b value in the range of [0,1]
+    counts = []
+    sizes = []
+    for band in bands:
+        band = np.ravel(band)
+        # empty and single sample bands have no bins, and raise a ValueError as in entropy
+        counts.append(_entropy_bin_counts(band, int(np.ceil(np.sqrt(band.shape[0])))))
+        sizes.append(len(counts[-1]))
 
-    # the figure from graybar.m and the infromation from the website
-    # http://www.cinenet.net/~spitzak/conversion/whysrgb.html, we can conclude
-    # that our RGB system is sRGB
-
-    # if RGB system is sRGB
-    mask = im >= 0.04045
-    im[mask] = ((im[mask] + 0.055) / 1.055) ** 2.4
-    im[~mask] = im[~mask] / 12.92
-
-    # Observer. = 2°, Illuminant = D65
-    matrix = np.array(
-        [
-            [0.412453, 0.357580, 0.180423],
-            [0.212671, 0.715160, 0.072169],
-            [0.019334, 0.119193, 0.950227],
-        ]
-    )
+    if not counts:
+        return np.zeros(0)
+
+    # the probabilities of the bins of all bands, summed per band
+    all_counts = np.concatenate(counts)
+    totals = np.repeat(np.add.reduceat(all_counts, np.cumsum([0] + sizes[:-1])), sizes)
+    probabilities = all_counts / totals
+    nonzero = probabilities > 0
+    terms = np.zeros_like(probabilities)
+    terms[nonzero] = probabilities[nonzero] * np.log(probabilities[nonzero])
+    return -np.add.reduceat(terms, np.cumsum([0] + sizes[:-1]))
+
+
+def centered_dft(image: np.ndarray) -> np.ndarray:
+    """
+    Computes the 2-D DFT of an image with the zero frequency at the center, the
+    input of SteerableFreqBasis.decompose.
+
+    Args:
+        image: Input ndarray image
 
-    c_im = np.dot(im, matrix.T)
-    c_im[:, :, 0] = c_im[:, :, 0] / 95.047
-    c_im[:, :, 1] = c_im[:, :, 1] / 100.000
-    c_im[:, :, 2] = c_im[:, :, 2] / 108.833
+    Returns:
+        Complex ndarray of the shape of the image
+    """
+    return np.fft.fftshift(np.fft.fft2(np.asarray(image, dtype=float)))
+
+
+class SteerableFreqBasis:
+    """
+    Fourier domain masks of a steerable frequency pyramid (pyrtools' SteerablePyramidFreq,
+    not complex, twidth=1) for an image shape, so that several images of the same shape
+    (e.g. the L, a and b channels) are decomposed from their DFT without building the masks
+    again. Decompositions are identical to the pyr_coeffs of SteerablePyramidFreq.
+    """
+
+    def __init__(self, shape: Tuple[int, int], height: int, order: int):
+        self.shape = tuple(shape)
+        self.height = height
+        self.order = order
+        self.num_orientations = order + 1
+
+        dims = np.asarray(shape)
+        ctr = np.ceil((np.asarray(dims) + 0.5) / 2).astype(int)
+        (xramp, yramp) = np.meshgrid(np.linspace(-1, 1, dims[1] + 1)[:-1],
+                                     np.linspace(-1, 1, dims[0] + 1)[:-1])
+        angle = np.arctan2(yramp, xramp)
+        log_rad = np.sqrt(xramp ** 2 + yramp ** 2)
+        log_rad[ctr[0] - 1, ctr[1] - 1] = log_rad[ctr[0] - 1, ctr[1] - 2]
+        log_rad = np.log2(log_rad)
+
+        # Radial transition function (a raised cosine in log-frequency)
+        (Xrcos, Yrcos) = rcosFn(1, -0.5, np.asarray([0, 1]))
+        Yrcos = np.sqrt(Yrcos)
+        YIrcos = np.sqrt(1.0 - Yrcos ** 2)
+        self.lo0mask = pointOp(log_rad, YIrcos, Xrcos[0], Xrcos[1] - Xrcos[0])
+        self.hi0mask = pointOp(log_rad, Yrcos, Xrcos[0], Xrcos[1] - Xrcos[0])
+
+        lutsize = 1024
+        Xcosn = np.pi * np.arange(-(2 * lutsize + 1), (lutsize + 2)) / lutsize
+        const = (2 ** (2 * order)) * (factorial(order, exact=True) ** 2) / float(
+            self.num_orientations * factorial(2 * order, exact=True))
+        Ycosn = np.sqrt(const) * (np.cos(Xcosn)) ** order
+
+        # per level: the high-pass mask, the orientation masks, the crop of the low-pass band and the low-pass mask
+        self.levels = []
+        for _ in range(height):
+            Xrcos -= np.log2(2)
+            himask = pointOp(log_rad, Yrcos, Xrcos[0], Xrcos[1] - Xrcos[0])
+            anglemasks = [
+                pointOp(angle, Ycosn, Xcosn[0] + np.pi * b / self.num_orientations, Xcosn[1] - Xcosn[0])
+                for b in range(self.num_orientations)
+            ]
+
+            dims = np.asarray(log_rad.shape)
+            ctr = np.ceil((dims + 0.5) / 2).astype(int)
+            lodims = np.ceil((dims - 0.5) / 2).astype(int)
+            loctr = np.ceil((lodims + 0.5) / 2).astype(int)
+            lostart = ctr - loctr
+            loend = lostart + lodims
+            crop = (slice(lostart[0], loend[0]), slice(lostart[1], loend[1]))
+            # pointOp reads its input as a contiguous buffer
+            log_rad = np.ascontiguousarray(log_rad[crop])
+            angle = np.ascontiguousarray(angle[crop])
+            YIrcos = np.abs(np.sqrt(1.0 - Yrcos ** 2))
+            lomask = pointOp(log_rad, YIrcos, Xrcos[0], Xrcos[1] - Xrcos[0])
+            self.levels.append((himask, anglemasks, crop, lomask))
+
+    def decompose(self, imdft: np.ndarray) -> Dict:
+        """
+        Decomposes an image from its centered DFT (see centered_dft).
+
+        Args:
+            imdft: Centered DFT of the image, of the shape of the basis
+
+        Returns:
+            The pyramid coefficients, keyed and ordered as SteerablePyramidFreq.pyr_coeffs
+        """
+        coeffs = {}
+        hi0 = np.fft.ifft2(np.fft.ifftshift(imdft * self.hi0mask))
+        coeffs['residual_highpass'] = np.real(hi0)
+
+        lodft = imdft * self.lo0mask
+        for i, (himask, anglemasks, crop, lomask) in enumerate(self.levels):
+            for b, anglemask in enumerate(anglemasks):
+                banddft = (-1j) ** self.order * lodft * anglemask * himask
+                coeffs[(i, b)] = np.real(np.fft.ifft2(np.fft.ifftshift(banddft)))
+            lodft = lodft[crop] * lomask
+
+        coeffs['residual_lowpass'] = np.real(np.fft.ifft2(np.fft.ifftshift(lodft)))
+        return coeffs
 
-    mask = c_im >= 0.008856
-    c_im[mask] = c_im[mask] ** (1 / 3)
-    c_im[~mask] = 7.787 * c_im[~mask] + 16 / 116
 
-    im_Lab = np.zeros_like(c_im)
+def rgb2lab(im: np.ndarray) -> np.ndarray:
+    """
+    Converts the RGB color space to the CIELab color space.
 
-    im_Lab[:, :, 0] = (116 * c_im[:, :, 1]) - 16
-    im_Lab[:, :, 1] = 500 * (c_im[:, :, 0] - c_im[:, :, 1])
-    im_Lab[:, :, 2] = 200 * (c_im[:, :, 1] - c_im[:, :, 2])
+    Args:
+        im: Input RGB image
 
-    return im_Lab
+    Returns:
+        Output Lab image (float32)
+    """
+    # the figure from graybar.m and the infromation from the website
+    # http://www.cinenet.net/~spitzak/conversion/whysrgb.html, we can conclude
+    # that our RGB system is sRGB (Observer. = 2°, Illuminant = D65)
+    return srgb_to_lab(im, white_point=AIM_WHITE_POINT)
@@ -1,8 +1,10 @@
+from functools import lru_cache
 from io import BytesIO
-from typing import List
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 import os
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
 import uuid
 
@@ -12,6 +14,25 @@ url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 supabase: Client = create_client(url, key)
 
+# PostgreSQL error code of a column that does not exist
+UNDEFINED_COLUMN = '42703'
+
+
+@lru_cache(maxsize=None)
+def has_column(table: str, column: str) -> bool:
+    """
+    Check whether a column added by a migration (see the README) exists, so that databases which have not run it yet
+    are still served, without the feature of the column. Checked once per server process.
+    """
+    try:
+        supabase.table(table).select(column).limit(1).execute()
+        return True
+    except APIError as e:
+        if e.code != UNDEFINED_COLUMN:
+            raise
+        print(f"Column {table}.{column} does not exist, run the migrations of the README to enable it")
+        return False
+
 
 def upload_file(
         file: BytesIO,
@@ -54,45 +75,113 @@ def upload_file(
         raise ValueError(f"Failed to upload file: {response.error_message}")
 
 
-def insert_file_metadata(wui_name: str, screenshot_url: str, html_url: str, metrics_to_evaluate: List[str]):
+def insert_file_metadata(wui_name: str, screenshot_url: str, html_url: str, metrics_to_evaluate: List[str],
+                         batch_id: Optional[str] = None):
     """
-    Insert the metadata of the WUI input to a Supabase postgreSQL DB.
+    Insert the metadata of the WUI input to a Supabase postgreSQL DB, along with the ID of its batch, if any.
     """
+    metadata = {
+        "wui_name": wui_name,
+        "screenshot_url": screenshot_url,
+        "html_url": html_url,
+        "metrics_to_evaluate": metrics_to_evaluate
+    }
+    if batch_id is not None and has_column('wui_input', 'batch_id'):
+        metadata["batch_id"] = batch_id
     try:
-        response = supabase.table('wui_input').insert(
-            {
-                "wui_name": wui_name,
-                "screenshot_url": screenshot_url,
-                "html_url": html_url,
-                "metrics_to_evaluate": metrics_to_evaluate
-            }
-        ).execute()
+        response = supabase.table('wui_input').insert(metadata).execute()
         return response.data[0]
     except Exception as e:
         print(f"An exception occurred: {e}")
         return None
 
 
-def insert_metric_result_metadata(wui_id: str, metric_id: str, results: List[str]):
+def update_file_metadata(wui_id: str, screenshot_url: str, html_url: str):
+    """
+    Update the URLs of the uploaded files of a WUI input (e.g. once the screenshot of a batch input is captured).
+    """
+    response = supabase.table('wui_input').update(
+        {
+            "screenshot_url": screenshot_url,
+            "html_url": html_url
+        }
+    ).eq('id', wui_id).execute()
+    return response.data[0]
+
+
+def insert_metric_result_metadata(wui_id: str, metric_id: str, results: List[str],
+                                  approximation: Optional[Dict] = None):
     """
-    Insert the metric evaluation result of a WUI to a Supabase postgreSQL DB.
+    Insert the metric evaluation result of a WUI to a Supabase postgreSQL DB, along with the fast profile settings it
+    was evaluated with, if it is approximate.
     """
+    result = {
+        "wui_id": wui_id,
+        "metric_id": metric_id,
+        "results": results
+    }
+    if approximation is not None and has_column('result', 'approximation'):
+        result["approximation"] = approximation
+    response = supabase.table('result').insert(result).execute()
+    return response.data[0]
+
+
+def insert_metric_failure_metadata(wui_id: str, metric_id: str, error: str):
+    """
+    Insert the error of a metric which could not be evaluated for a WUI (e.g. it failed or timed out), so that the
+    metric is known to be done. Not stored if the database has no column for the errors.
+    """
+    if not has_column('result', 'error'):
+        return None
     response = supabase.table('result').insert(
         {
             "wui_id": wui_id,
             "metric_id": metric_id,
-            "results": results
+            "results": [],
+            "error": error
         }
     ).execute()
     return response.data[0]
 
 
-def get_evaluation_results_by_wui_id(wui_id: str):
+def get_evaluation_results_by_wui_id(wui_id: str, include_failures: bool = False):
     """
-    Retrieve evaluation results of a WUI by its ID.
+    Retrieve evaluation results of a WUI by its ID, along with the errors of its failed metrics if requested.
     """
-    response = supabase.table('result').select('metric_id', 'results').eq('wui_id', uuid.UUID(wui_id)).execute()
-    return response.data
+    columns = ['metric_id', 'results']
+    columns += [column for column in ['approximation', 'error'] if has_column('result', column)]
+    query = supabase.table('result').select(*columns).eq('wui_id', uuid.UUID(wui_id))
+    if 'error' in columns and not include_failures:
+        query = query.is_('error', 'null')
+    return query.execute().data
+
+
+def get_batch_items(batch_id: str):
+    """
+    Retrieve the WUI inputs of a batch, along with the IDs of their evaluated and failed metrics. None if the
+    database has no column for the batches.
+    """
+    if not has_column('wui_input', 'batch_id'):
+        return None
+    items = supabase.table('wui_input').select(
+        'id', 'created_at', 'wui_name', 'screenshot_url', 'metrics_to_evaluate'
+    ).eq('batch_id', uuid.UUID(batch_id)).order('created_at').execute().data
+    if not items:
+        return items
+
+    columns = ['wui_id', 'metric_id', *(['error'] if has_column('result', 'error') else [])]
+    results = supabase.table('result').select(*columns).in_(
+        'wui_id', [item['id'] for item in items]
+    ).execute().data
+    for item in items:
+        item_results = [result for result in results if str(result['wui_id']) == str(item['id'])]
+        item['evaluated_metrics'] = sorted({
+            result['metric_id'] for result in item_results if result.get('error') is None
+        })
+        item['failed_metrics'] = sorted({
+            result['metric_id'] for result in item_results if result.get('error') is not None
+        } - set(item['evaluated_metrics']))
+    return items
 
 
 def get_wui_data_by_wui_id(wui_id: str):
@@ -1,14 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from bs4 import BeautifulSoup, Comment
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
 import time
-from commons.create_webdriver import create_webdriver
+from commons.browser_pool import get_browser_pool
+from dom_analyzer.DOMModel import DOMModel, DOMModelBuilder
+
+try:
+    from lxml import etree
+except ImportError:  # fall back to BeautifulSoup with Python's html.parser
+    etree = None
+
+# texts directly within these elements are not visible
+INVISIBLE_TEXT_PARENTS = {'style', 'script', 'head', 'title', 'meta'}
 
 
 class DOMAnalyzer:
     def __init__(self, url='', html=None):
-        self.driver = create_webdriver('DOMAnalyzer')
         self.url = url
         self.html = html
 
@@ -16,14 +24,15 @@ class DOMAnalyzer:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.driver.quit()
+        pass
 
     def analyze_url(self):
-        if not self.driver:
-            raise ValueError("Driver is not initialized.")
-        self.driver.get(self.url)
-        time.sleep(1)  # Allow time for the page to load completely
-        return self.analyze_html(self.driver.page_source)
+        # only URLs need to be rendered, the browser is leased for the navigation only
+        with get_browser_pool().lease('DOMAnalyzer') as driver:
+            driver.get(self.url)
+            time.sleep(1)  # Allow time for the page to load completely
+            page_source = driver.page_source
+        return self.analyze_html(page_source)
 
     # check if an element is visible
     def visible(self, element):
@@ -33,9 +42,11 @@ class DOMAnalyzer:
             return False
         return True
 
-    def analyze_html(self, html_content=None):
-        if not self.driver:
-            raise ValueError("Driver is not initialized.")
+    def analyze_html(self, html_content=None) -> DOMModel:
+        """
+        Extract the visible text and the elements (tag, attributes, parent) of an HTML document into a DOMModel.
+        The document is parsed with lxml if it is installed, with Python's html.parser otherwise.
+        """
         if html_content is None:
             if self.html:
                 html_content = self.html
@@ -43,20 +54,47 @@ class DOMAnalyzer:
                 raise ValueError("HTML content is not provided.")
         if isinstance(html_content, bytes):
             html_content = html_content.decode('utf-8')
+        if etree is not None:
+            return self._analyze_html_lxml(html_content)
+        return self._analyze_html_parser(html_content)
+
+    def _analyze_html_parser(self, html_content) -> DOMModel:
         soup = BeautifulSoup(html_content, 'html.parser')
-        elements = soup.find_all(True)
-        visible_texts = filter(self.visible, soup.find_all(text=True))
-        text_content = " ".join(t.strip() for t in visible_texts)
-        element_data = []
-        for element in elements:
-            el_data = {
-                'tag': element.name,
-                'attributes': element.attrs,
-                'children': [child.name for child in element.children if child.name is not None]
-            }
-            element_data.append(el_data)
-
-        return {
-            "text": text_content,
-            "elements": element_data
-        }
+        builder = DOMModelBuilder()
+        element_indices = {}
+        # collect the elements and the visible texts in a single walk of the tree
+        for node in soup.descendants:
+            parent = element_indices.get(id(node.parent), -1)
+            if isinstance(node, Tag):
+                element_indices[id(node)] = builder.add_element(node.name, node.attrs, parent)
+            elif isinstance(node, NavigableString) and self.visible(node):
+                builder.add_text(node, parent)
+        return builder.build()
+
+    @staticmethod
+    def _analyze_html_lxml(html_content) -> DOMModel:
+        root = etree.fromstring(html_content.encode('utf-8'), etree.HTMLParser(encoding='utf-8'))
+        builder = DOMModelBuilder()
+        if root is None:  # empty document
+            return builder.build()
+
+        # collect the elements and the visible texts in a single walk of the tree, in document order:
+        # the text of an element follows its start tag, its tail (text of its parent) follows its end tag
+        stack = [(root, -1, False)]
+        while stack:
+            node, parent, closed = stack.pop()
+            if closed:
+                parent_node = node.getparent()
+                if node.tail is not None and parent_node is not None and \
+                        parent_node.tag not in INVISIBLE_TEXT_PARENTS:
+                    builder.add_text(node.tail, parent)
+                continue
+            stack.append((node, parent, True))
+            if not isinstance(node.tag, str):  # comments and processing instructions
+                continue
+            index = builder.add_element(node.tag, dict(node.attrib), parent)
+            if node.text is not None and node.tag not in INVISIBLE_TEXT_PARENTS:
+                builder.add_text(node.text, index)
+            stack.extend((child, index, False) for child in reversed(node))
+
+        return builder.build()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+# attributes holding whitespace-separated lists of values (per tag, '*' for all tags), as split by BeautifulSoup
+MULTI_VALUED_ATTRIBUTES = {
+    '*': ['class', 'accesskey', 'dropzone'],
+    'a': ['rel', 'rev'],
+    'link': ['rel', 'rev'],
+    'td': ['headers'],
+    'th': ['headers'],
+    'form': ['accept-charset'],
+    'object': ['archive'],
+    'area': ['rel'],
+    'icon': ['sizes'],
+    'iframe': ['sandbox'],
+    'output': ['for'],
+}
+
+# words as counted by the word count metric
+WORD_PATTERN = re.compile(r'\b\S+\b')
+
+
+class DOMModel(Mapping):
+    """
+    Columnar representation of an analyzed HTML document.
+
+    Elements are stored in document order as integer columns: their tag ID, the index of their parent element (-1
+    for the root elements) and their depth. Their attributes are stored as (name ID, value ID) pairs, the attributes of
+    element i being in [attribute_offsets[i], attribute_offsets[i + 1]). Tag names, attribute names and attribute
+    values are IDs into a shared string table. The visible text is a single string, the visible text nodes being
+    spans into it (with the element they belong to).
+
+    For compatibility with the metrics reading the dictionary returned by the DOM analysis, the model can be read as
+    a mapping with the keys "text" and "elements" (the latter being materialized on first access).
+    """
+
+    def __init__(self, strings: List[str], tag_ids: np.ndarray, parents: np.ndarray, depths: np.ndarray,
+                 attribute_offsets: np.ndarray, attribute_names: np.ndarray, attribute_values: np.ndarray,
+                 text: str, text_spans: np.ndarray, text_elements: np.ndarray):
+        self.strings = strings
+        self.tag_ids = tag_ids
+        self.parents = parents
+        self.depths = depths
+        self.attribute_offsets = attribute_offsets
+        self.attribute_names = attribute_names
+        self.attribute_values = attribute_values
+        self.text = text
+        self.text_spans = text_spans
+        self.text_elements = text_elements
+
+        # aggregates shared by the DOM metrics
+        self.word_count = len(WORD_PATTERN.findall(text))
+        # number of nesting levels of the elements
+        self.max_depth = int(depths.max()) + 1 if len(depths) else 0
+        tag_counts = np.bincount(tag_ids, minlength=len(strings)) if len(tag_ids) else np.zeros(0, dtype=np.int64)
+        self.tag_histogram: Dict[str, int] = {
+            strings[tag_id]: int(tag_counts[tag_id]) for tag_id in np.flatnonzero(tag_counts)
+        }
+        self._elements: Optional[List[Dict[str, Any]]] = None
+
+    def __getstate__(self):
+        # the materialized elements are rebuilt on demand
+        state = self.__dict__.copy()
+        state['_elements'] = None
+        return state
+
+    # Mapping interface, compatible with the former dictionary result
+    def __getitem__(self, key):
+        if key == 'text':
+            return self.text
+        if key == 'elements':
+            return self.elements
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(('text', 'elements'))
+
+    def __len__(self) -> int:
+        return 2
+
+    @property
+    def n_elements(self) -> int:
+        return len(self.tag_ids)
+
+    def tag(self, index: int) -> str:
+        return self.strings[self.tag_ids[index]]
+
+    def attributes(self, index: int) -> Dict[str, Any]:
+        tag = self.tag(index)
+        multi_valued = MULTI_VALUED_ATTRIBUTES['*'] + MULTI_VALUED_ATTRIBUTES.get(tag, [])
+        attributes = {}
+        for position in range(self.attribute_offsets[index], self.attribute_offsets[index + 1]):
+            name = self.strings[self.attribute_names[position]]
+            value = self.strings[self.attribute_values[position]]
+            attributes[name] = value.split() if name in multi_valued else value
+        return attributes
+
+    def children(self, index: int) -> np.ndarray:
+        return np.flatnonzero(self.parents == index)
+
+    def element_indices(self, tag: str) -> np.ndarray:
+        """
+        Indices of the elements with a given tag, in document order.
+        """
+        try:
+            tag_id = self.strings.index(tag)
+        except ValueError:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.tag_ids == tag_id)
+
+    def texts(self) -> Iterator[str]:
+        """
+        Iterate over the (stripped) visible text nodes.
+        """
+        for start, end in self.text_spans:
+            yield self.text[start:end]
+
+    @property
+    def elements(self) -> List[Dict[str, Any]]:
+        """
+        The elements as a list of dictionaries (tag, attributes, tags of the child elements).
+        """
+        if self._elements is None:
+            children: List[List[str]] = [[] for _ in range(self.n_elements)]
+            for index, parent in enumerate(self.parents):
+                if parent >= 0:
+                    children[parent].append(self.tag(index))
+            self._elements = [
+                {'tag': self.tag(index), 'attributes': self.attributes(index), 'children': children[index]}
+                for index in range(self.n_elements)
+            ]
+        return self._elements
+
+
+class DOMModelBuilder:
+    """
+    Builds a DOMModel while walking a document tree in document order.
+    """
+
+    def __init__(self):
+        self._string_ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+        self._tag_ids: List[int] = []
+        self._parents: List[int] = []
+        self._depths: List[int] = []
+        self._attribute_offsets: List[int] = [0]
+        self._attribute_names: List[int] = []
+        self._attribute_values: List[int] = []
+        self._texts: List[str] = []
+        self._text_elements: List[int] = []
+
+    def _string_id(self, string: str) -> int:
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            string_id = self._string_ids[string] = len(self._strings)
+            self._strings.append(string)
+        return string_id
+
+    def add_element(self, tag: str, attributes: Dict[str, Any], parent: int = -1) -> int:
+        """
+        Add an element and return its index.
+
+        Args:
+            tag: the tag name of the element
+            attributes: the attributes of the element, multi-valued attributes as strings or lists of values
+            parent: the index of the parent element, -1 for a root element
+        """
+        index = len(self._tag_ids)
+        self._tag_ids.append(self._string_id(tag))
+        self._parents.append(parent)
+        self._depths.append(self._depths[parent] + 1 if parent >= 0 else 0)
+        for name, value in attributes.items():
+            if isinstance(value, list):
+                value = " ".join(value)
+            self._attribute_names.append(self._string_id(name))
+            self._attribute_values.append(self._string_id(value if value is not None else ""))
+        self._attribute_offsets.append(len(self._attribute_names))
+        return index
+
+    def add_text(self, text: str, element: int):
+        """
+        Add a visible text node, belonging to the element of the given index.
+        """
+        self._texts.append(text.strip())
+        self._text_elements.append(element)
+
+    def build(self) -> DOMModel:
+        # the text nodes are joined with single spaces
+        text_spans = np.zeros((len(self._texts), 2), dtype=np.int32)
+        position = 0
+        for i, text in enumerate(self._texts):
+            text_spans[i] = (position, position + len(text))
+            position += len(text) + 1
+
+        return DOMModel(
+            strings=self._strings,
+            tag_ids=np.array(self._tag_ids, dtype=np.int32),
+            parents=np.array(self._parents, dtype=np.int32),
+            depths=np.array(self._depths, dtype=np.int16),
+            attribute_offsets=np.array(self._attribute_offsets, dtype=np.int32),
+            attribute_names=np.array(self._attribute_names, dtype=np.int32),
+            attribute_values=np.array(self._attribute_values, dtype=np.int32),
+            text=" ".join(self._texts),
+            text_spans=text_spans,
+            text_elements=np.array(self._text_elements, dtype=np.int32)
+        )
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+# default size of the in-memory tier, the on-disk tier is disabled unless a directory is configured
+DEFAULT_ARTIFACT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+DEFAULT_ARTIFACT_CACHE_DISK_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+
+Artifact = Union[np.ndarray, bytes]
+
+
+class ArtifactCache:
+    """
+    Cache of preprocessing artifacts (e.g. grayscale, CIELab or JPEG conversions of a screenshot), keyed by the content
+    hash of the image and the conversion parameters, so that a screenshot evaluated again (e.g. with another selection
+    of metrics) is not converted again.
+
+    Artifacts are NumPy arrays (stored as .npy files on disk) or encoded images (bytes, e.g. stored as .jpg files).
+    The in-memory tier is an LRU bounded in bytes; the optional on-disk tier is bounded in bytes as well, its least
+    recently used files being evicted first. Cached arrays are read-only.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, cache_dir: Optional[str] = None,
+                 disk_max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES") or DEFAULT_ARTIFACT_CACHE_MAX_BYTES)
+        if disk_max_bytes is None:
+            disk_max_bytes = int(os.environ.get("ARTIFACT_CACHE_DISK_MAX_BYTES") or DEFAULT_ARTIFACT_CACHE_DISK_MAX_BYTES)
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir or os.environ.get("ARTIFACT_CACHE_DIR")
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_hash: str, conversion: str, **params) -> str:
+        """
+        Build the key of an artifact, e.g. make_key(image_hash, "jpeg", quality=80).
+        """
+        params_key = ",".join(f"{name}={value}" for name, value in sorted(params.items()))
+        return f"{image_hash}_{conversion}_{params_key}"
+
+    def get_or_compute(self, key: str, compute: Callable[[], Artifact], extension: str = ".npy") -> Artifact:
+        """
+        Retrieve an artifact, computing (and caching) it if it is not cached yet.
+
+        Args:
+            key: the key of the artifact
+            compute: computes the artifact, a NumPy array or bytes
+            extension: the extension of the artifact file in the on-disk tier, ".npy" for NumPy arrays
+        """
+        artifact = self._get_from_memory(key)
+        if artifact is None:
+            artifact = self._get_from_disk(key, extension)
+            if artifact is None:
+                artifact = compute()
+                self._put_to_disk(key, artifact, extension)
+            if isinstance(artifact, np.ndarray):
+                artifact.setflags(write=False)
+            self._put_to_memory(key, artifact)
+        return artifact
+
+    @staticmethod
+    def _size_of(artifact: Artifact) -> int:
+        return artifact.nbytes if isinstance(artifact, np.ndarray) else len(artifact)
+
+    def _get_from_memory(self, key: str) -> Optional[Artifact]:
+        with self._lock:
+            artifact = self._entries.get(key)
+            if artifact is not None:
+                self._entries.move_to_end(key)
+            return artifact
+
+    def _put_to_memory(self, key: str, artifact: Artifact):
+        size = self._size_of(artifact)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = artifact
+            self._size += size
+            # evict the least recently used artifacts until the cache fits its budget again
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= self._size_of(evicted)
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{extension}")
+
+    def _get_from_disk(self, key: str, extension: str) -> Optional[Artifact]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key, extension)
+        try:
+            if extension == ".npy":
+                artifact = np.load(path)
+            else:
+                with open(path, "rb") as f:
+                    artifact = f.read()
+            # mark the file as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return artifact
+
+    def _put_to_disk(self, key: str, artifact: Artifact, extension: str):
+        if not self.cache_dir or self._size_of(artifact) > self.disk_max_bytes:
+            return
+        # write to a temporary file first, so that readers never see a partial artifact
+        tmp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            if extension == ".npy":
+                np.save(f, artifact)
+            else:
+                f.write(artifact)
+        os.replace(tmp_path, self._path(key, extension))
+        self._evict_from_disk()
+
+    def _evict_from_disk(self):
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+_artifact_cache: Optional[ArtifactCache] = None
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """
+    Retrieve the preprocessing artifact cache of the current process.
+    """
+    global _artifact_cache
+    if _artifact_cache is None:
+        _artifact_cache = ArtifactCache()
+    return _artifact_cache
@@ -1,13 +1,31 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import hashlib
+
 import numpy as np
 from PIL import Image
 from io import BytesIO
 
-from skimage.color import rgb2lab
+from commons.color_conversion import srgb_to_lab
+from commons.tiled_image import TiledImage
 
 
 class ImagePreprocessing():
+    @staticmethod
+    def compute_image_hash(image: Image.Image) -> str:
+        # hash of the decoded pixels, independent of how the image was encoded
+        image_hash = hashlib.sha256(f"{image.mode}:{image.size}".encode("utf-8"))
+        image_hash.update(image.tobytes())
+        return image_hash.hexdigest()
+
+    @staticmethod
+    def compute_tiled_image_hash(tiles: TiledImage) -> str:
+        # the hash of the stitched image (see compute_image_hash), updated one tile at a time
+        image_hash = hashlib.sha256(f"RGB:{(tiles.width, tiles.height)}".encode("utf-8"))
+        for tile in tiles.tiles:
+            image_hash.update(np.ascontiguousarray(tile.open()).data)
+        return image_hash.hexdigest()
+
     @staticmethod
     def convert_pil_image_to_grayscale(image: Image.Image) -> Image.Image:
         return image.convert('L')
@@ -26,4 +44,5 @@ class ImagePreprocessing():
 
     @staticmethod
     def convert_pil_image_to_lab(image: Image.Image) -> np.ndarray:
-        return rgb2lab(np.array(image)).astype(np.float32)
+        # float32 throughout, without the float64 temporaries of skimage's rgb2lab
+        return srgb_to_lab(np.asarray(image))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from io import BytesIO
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def is_rgb24_png(data: bytes) -> bool:
+    """
+    Whether encoded image data is a PNG image with 8-bit RGB pixels (24 bits per pixel), read from its IHDR chunk.
+    """
+    # signature, then the IHDR chunk: length, type, width, height, bit depth, color type
+    return len(data) > 26 and data[:8] == PNG_SIGNATURE and data[12:16] == b'IHDR' and \
+        data[24] == 8 and data[25] == 2
+
+
+class InputImage:
+    """
+    The image of a WUI input, decoded once to RGB, along with its PNG encoding (24 bits per pixel, RGB) as uploaded
+    and measured by the file size metrics.
+
+    The original encoded bytes are kept when they already are such a PNG image (e.g. a browser screenshot or a PNG
+    upload), so that the image is not encoded again. Otherwise, the PNG encoding is computed once, on first use.
+    """
+
+    def __init__(self, pil_image: Optional[Image.Image], png_bytes: Optional[bytes] = None, tiles=None):
+        self._pil_image = pil_image
+        self._png_bytes = png_bytes
+        self._array: Optional[np.ndarray] = None
+        # full-page screenshots only, the image as vertical tiles (a TiledImage), stitched only if it is needed
+        self.tiles = tiles
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "InputImage":
+        """
+        Decode an encoded image (e.g. PNG bytes), keeping the bytes if they can be used as the PNG encoding.
+        """
+        pil_image = Image.open(BytesIO(data))
+        if pil_image.mode != "RGB":
+            pil_image = pil_image.convert("RGB")
+        else:
+            pil_image.load()
+        return cls(pil_image, data if is_rgb24_png(data) else None)
+
+    @classmethod
+    def from_pil_image(cls, pil_image: Image.Image) -> "InputImage":
+        return cls(pil_image if pil_image.mode == "RGB" else pil_image.convert("RGB"))
+
+    @classmethod
+    def from_tiles(cls, tiles) -> "InputImage":
+        """
+        The image of a full-page screenshot, stored as vertical tiles (a TiledImage). It is hashed and encoded one
+        tile at a time, and stitched into a single image only on first use of pil_image or array.
+        """
+        return cls(None, tiles=tiles)
+
+    @property
+    def pil_image(self) -> Image.Image:
+        if self._pil_image is None:
+            self._pil_image = self.tiles.to_image()
+        return self._pil_image
+
+    @property
+    def png_bytes(self) -> bytes:
+        if self._png_bytes is None:
+            if self.tiles is not None:
+                self._png_bytes = self.tiles.to_png()
+            else:
+                png_buf = BytesIO()
+                self.pil_image.save(png_buf, format="PNG")
+                self._png_bytes = png_buf.getvalue()
+        return self._png_bytes
+
+    @property
+    def png_size(self) -> int:
+        return len(self.png_bytes)
+
+    @property
+    def png_image(self) -> BytesIO:
+        """
+        A new in-memory PNG file, positioned at its end like a freshly written file (its size being read with tell()).
+        """
+        png_image = BytesIO(self.png_bytes)
+        png_image.seek(0, 2)
+        return png_image
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        The decoded pixels, as an uint8 array of shape (height, width, 3).
+        """
+        if self._array is None:
+            self._array = np.asarray(self.pil_image)
+        return self._array
@@ -0,0 +1,28 @@
+import threading
+from typing import Any, Callable, Dict
+
+
+class ArtifactContext:
+    """
+    Lazily computed inputs of the metrics of an evaluation (e.g. the CIELab image, the DOM analysis or the segments).
+
+    Every artifact is computed on first access and memoized, so that an artifact is computed once however many
+    metrics consume it, and never if no metric does. Artifacts can be accessed concurrently, and their computations
+    may access other artifacts.
+    """
+
+    def __init__(self, computations: Dict[str, Callable[[], Any]]):
+        self._computations = computations
+        self._values: Dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in computations}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._computations
+
+    def get(self, name: str) -> Any:
+        if name not in self._computations:
+            raise KeyError(f"Unknown artifact '{name}'.")
+        with self._locks[name]:
+            if name not in self._values:
+                self._values[name] = self._computations[name]()
+            return self._values[name]
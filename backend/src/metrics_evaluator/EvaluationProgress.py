@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+# number of finished evaluations whose events are kept, so that late subscribers can still replay them
+MAX_FINISHED_EVALUATIONS: int = 256
+
+# the terminal event of an evaluation
+EVALUATION_COMPLETE_EVENT: str = "complete"
+METRIC_EVENT: str = "metric"
+
+
+class _Evaluation:
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.finished = False
+        self.subscribers: List[tuple] = []
+
+
+class EvaluationProgress:
+    """
+    In-process broker of the progress events of the evaluations: an event is published as soon as a metric of a WUI
+    is evaluated, and a terminal event once the whole evaluation is done.
+
+    Events are published from the threads of the evaluation, and delivered to the subscribers (e.g. server-sent event
+    streams) on their event loops. Subscribers first receive the events published before they subscribed.
+    """
+
+    def __init__(self, max_finished_evaluations: int = MAX_FINISHED_EVALUATIONS):
+        self.max_finished_evaluations = max_finished_evaluations
+        self._evaluations: "OrderedDict[str, _Evaluation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, wui_id: str):
+        """
+        Register an evaluation, so that its progress can be subscribed to before its first event is published.
+        """
+        with self._lock:
+            if str(wui_id) not in self._evaluations:
+                self._evaluations[str(wui_id)] = _Evaluation()
+
+    def is_known(self, wui_id: str) -> bool:
+        with self._lock:
+            return str(wui_id) in self._evaluations
+
+    def publish_metric(self, wui_id: str, metric_id: str, results: Optional[List[Any]], duration: Optional[float],
+                       error: Optional[str] = None, approximation: Optional[Dict[str, Any]] = None):
+        # approximation: fast profile settings and calibrated deviation of approximate results, None if exact
+        self._publish(wui_id, {
+            "event": METRIC_EVENT,
+            "metric_id": metric_id,
+            "results": results,
+            "duration": duration,
+            "error": error,
+            "approximation": approximation
+        })
+
+    def publish_complete(self, wui_id: str):
+        self._publish(wui_id, {"event": EVALUATION_COMPLETE_EVENT}, finished=True)
+
+    def _publish(self, wui_id: str, event: Dict[str, Any], finished: bool = False):
+        with self._lock:
+            evaluation = self._evaluations.get(str(wui_id))
+            if evaluation is None:
+                evaluation = self._evaluations[str(wui_id)] = _Evaluation()
+            if evaluation.finished:
+                return
+            evaluation.events.append(event)
+            evaluation.finished = finished
+            subscribers = list(evaluation.subscribers)
+            if finished:
+                self._evict_finished()
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # the event loop of the subscriber is closed
+                pass
+
+    def _evict_finished(self):
+        finished = [wui_id for wui_id, evaluation in self._evaluations.items() if evaluation.finished]
+        for wui_id in finished[:max(len(finished) - self.max_finished_evaluations, 0)]:
+            del self._evaluations[wui_id]
+
+    async def subscribe(self, wui_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over the progress events of an evaluation, until its terminal event.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (loop, queue)
+
+        with self._lock:
+            evaluation = self._evaluations.get(str(wui_id))
+            if evaluation is None:
+                evaluation = self._evaluations[str(wui_id)] = _Evaluation()
+            for event in evaluation.events:
+                queue.put_nowait(event)
+            if not evaluation.finished:
+                evaluation.subscribers.append(subscriber)
+
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] == EVALUATION_COMPLETE_EVENT:
+                    break
+        finally:
+            with self._lock:
+                if subscriber in evaluation.subscribers:
+                    evaluation.subscribers.remove(subscriber)
+
+
+_evaluation_progress: Optional[EvaluationProgress] = None
+
+
+def get_evaluation_progress() -> EvaluationProgress:
+    """
+    Retrieve the progress broker of the current (server) process.
+    """
+    global _evaluation_progress
+    if _evaluation_progress is None:
+        _evaluation_progress = EvaluationProgress()
+    return _evaluation_progress
@@ -1,166 +1,368 @@
-from typing import List
+from typing import List, Optional, Union
+import inspect
 from io import BytesIO
-import re
-from pathlib import Path
-import importlib
-import sys
-from PIL import Image
+from functools import partial
+import hashlib
+import os
+import time
+import uuid
 
+import numpy as np
+from multiprocess import TimeoutError as WorkerTimeoutError
+
+import db_client
+from commons.approximation import EXACT_PROFILE, FAST_PROFILE, FastProfile, describe_approximation
+from commons.lab_pyramid import LabPyramid
+from commons.shared_memory_utils import SHARED_MEMORY_DIR, SharedArray, SharedArrayGroup
+from commons.stage_executors import run_in_stage
+from metrics_evaluator.ArtifactContext import ArtifactContext
+from metrics_evaluator.EvaluationProgress import get_evaluation_progress
+from image_preprocessing.ArtifactCache import ArtifactCache, get_artifact_cache
 from image_preprocessing.ImagePreprocessing import ImagePreprocessing
+from image_preprocessing.InputImage import InputImage
 from metrics_evaluator.MetricsEvaluator import MetricsEvaluator
+from metrics_evaluator.MetricsRegistry import get_metrics_registry
+from metrics_evaluator.ResultCache import ResultCache, get_result_cache
+from metrics_evaluator.TaskGraph import TaskGraph
 
-# constants for dynamic loading of metrics
-METRICS_DIR: str = "metrics_evaluator/metrics"
-METRICS_FILE_PATTERN: str = "*_*.py"
+# preprocessing flags (as in metrics.json) and the artifacts they produce, named after the metric arguments
+PREPROCESSING_ARTIFACTS = {
+    'grayscale_conversion_required': 'grayscale_image',
+    'jpeg_conversion_required': 'jpeg_image',
+    'lab_conversion_required': 'lab_image',
+    'dom_analysis_required': 'dom_analysis_result',
+    'segmentation_required': 'segments',
+    'accessibility_check_required': 'accessibility_results',
+}
+# inputs a metric can declare (see MetricInterface.required_inputs), named after the metric arguments
+METRIC_INPUTS = ['pil_image', 'image_url', 'png_image', *PREPROCESSING_ARTIFACTS.values(), 'lab_pyramid']
+# artifacts derived from the image, which metrics evaluated tile by tile compute per tile
+TILE_ARTIFACTS = {'pil_image', 'grayscale_image', 'jpeg_image', 'lab_image'}
+# default time a metric may run in its worker (seconds) before it is reported as failed, and a preprocessing step
+# before the metrics depending on it are
+DEFAULT_METRIC_EVALUATION_TIMEOUT: float = 600
+# time (seconds) after its timeout the server waits for a worker to return, if the metric is stuck in native code
+# (where it is not interrupted)
+WORKER_TIMEOUT_GRACE: float = 30
+# interval (seconds) between two checks of a queued or running metric
+WORKER_POLL_INTERVAL: float = 1
 
 imagePreprocessing = ImagePreprocessing()
+metrics_registry = get_metrics_registry()
+result_cache = get_result_cache()
+artifact_cache = get_artifact_cache()
+evaluation_progress = get_evaluation_progress()
 
 
 class MetricsDependencyManager:
-    def __init__(self, wui_id: str, pil_image: Image.Image, png_image: BytesIO, metrics_to_evaluate: List[str], url, html_content, available_metrics):
+    def __init__(self, wui_id: str, input_image: InputImage, metrics_to_evaluate: List[str], url, html_content, available_metrics, page_source=None, accessibility_results=None, tiles=None, profile: str = EXACT_PROFILE):
         self.wui_id = wui_id
-        self.pil_image = pil_image
-        self.png_image = png_image
-        self.metrics_to_evaluate = metrics_to_evaluate
+        self.input_image = input_image
+        # a metric requested twice is evaluated once
+        self.metrics_to_evaluate = list(dict.fromkeys(metrics_to_evaluate))
         self.url = url
         self.html_content = html_content
         self.available_metrics = available_metrics
+        # captured along with the screenshot, so that the page does not have to be loaded again
+        self.page_source = page_source
+        self.accessibility_results = accessibility_results
+        # full-page captures only, streamed to the metrics that can be evaluated tile by tile
+        self.tiles = tiles
+        # "fast" to approximate the metrics that support it (see commons/approximation), "exact" otherwise
+        self.profile = profile
+        self._shared_arrays: List[Union[SharedArray, SharedArrayGroup]] = []
+        self._pixel_hash: Optional[str] = None
+        # computed on first access by a metric, and only once
+        self.artifacts = ArtifactContext({name: getattr(self, f"_compute_{name}") for name in METRIC_INPUTS})
+        evaluation_progress.start(wui_id)
 
     async def identify_preprocessing_load_metrics_and_evaluate_metrics(self):
-        metric_modules = []
-        metric_modules_require_segmentation = []
-        metric_modules_require_dom_analysis = []
+        # the task graph blocks until every metric is evaluated, so keep it off the event loop
+        await run_in_stage("evaluation", self.evaluate)
+
+    def evaluate(self):
+        try:
+            results = self.build_task_graph().run()
+            for metric in self.metrics_to_evaluate:
+                # metrics that failed before reaching a worker, e.g. because a preprocessing step failed
+                result = results.get(metric)
+                if result is None or isinstance(result, Exception):
+                    error = str(result) if result is not None else f"Metric {metric} could not be loaded."
+                    self._store_failure(metric, error)
+                    evaluation_progress.publish_metric(self.wui_id, metric, results=None, duration=None, error=error)
+            return results
+        finally:
+            # every worker is done with the shared artifacts
+            for shared_array in self._shared_arrays:
+                shared_array.unlink()
+            self._shared_arrays = []
+            if self.tiles is not None:
+                self.tiles.unlink()
+            evaluation_progress.publish_complete(self.wui_id)
 
-        is_grayscale_conversion_required = False
-        is_segmentation_required = False
-        is_jpeg_conversion_required = False
-        is_dom_analysis_required = False
-        is_lab_conversion_required = False
+    def build_task_graph(self) -> TaskGraph:
+        """
+        Build the dependency graph of the evaluation: one node per required preprocessing artifact and one node per
+        metric, depending on the artifacts it requires. Metrics are evaluated as soon as their artifacts are ready.
+        """
+        graph = TaskGraph()
+        image_hash = self._compute_image_hash() if result_cache.enabled else None
 
         # Locate metric implementation and determine which preprocessing is required
         for metric in self.metrics_to_evaluate:
             metric_data = self.available_metrics["metrics"][metric]
-            # determine which preprocessing is required
-            if metric_data['preprocessing']['grayscale_conversion_required']:
-                is_grayscale_conversion_required = True
-            if metric_data['preprocessing']['segmentation_required']:
-                is_segmentation_required = True
-            if metric_data['preprocessing']['jpeg_conversion_required']:
-                is_jpeg_conversion_required = True
-            if metric_data['preprocessing']['dom_analysis_required']:
-                is_dom_analysis_required = True
-            if metric_data['preprocessing']['lab_conversion_required']:
-                is_lab_conversion_required = True
-
-            metric_files = [
-                metric_file for metric_file in list(Path(METRICS_DIR).glob(METRICS_FILE_PATTERN))
-                if metric_file.name.startswith(metric + "_")
-            ]
-
-            if metric_files:
-                module_name = re.sub(r"/|\\", ".", str(metric_files[0].parent))
-                metric_module_name = metric_files[0].stem  # 'stem' gives the filename without extension
-
-                # Construct the full module import path
-                full_module_name = f"{module_name}.{metric_module_name}"
-                try:
-                    if full_module_name in sys.modules:
-                        metric_module = importlib.reload(sys.modules[full_module_name])
-                    else:
-                        metric_module = importlib.import_module(full_module_name)
-                    if metric_data['preprocessing']['segmentation_required']:
-                        metric_modules_require_segmentation.append(metric_module)
-                    elif metric_data['preprocessing']['dom_analysis_required']:
-                        metric_modules_require_dom_analysis.append(metric_module)
-                    else:
-                        metric_modules.append(metric_module)
-                except ModuleNotFoundError as e:
-                    print(f"Failed to import {full_module_name}: {e}")
+
+            try:
+                metric_module = metrics_registry.get_module(metric)
+            except ModuleNotFoundError as e:
+                print(f"Failed to import {metric}: {e}")
+                continue
+
+            if metric_module is not None:
+                fast_profile = self._get_fast_profile(metric_module)
+                cache_key = None
+                if image_hash is not None:
+                    cache_key = ResultCache.make_key(
+                        image_hash=image_hash,
+                        metric_id=metric,
+                        metric_version=metrics_registry.get_version(metric),
+                        shared_code_version=metrics_registry.get_shared_code_version(),
+                        url=self.url,
+                        html_hash=self._compute_html_hash() if self._depends_on_html(metric_module, metric_data) else None,
+                        profile=f"{FAST_PROFILE}:{fast_profile.key}" if fast_profile is not None else None
+                    )
+                    cached_results = result_cache.get(cache_key)
+                    if cached_results is not None:
+                        # identical input evaluated before, store the results for this WUI without recomputing them
+                        approximation = describe_approximation(metric, fast_profile) if fast_profile else None
+                        graph.add_node(metric, partial(self._store_cached_results, metric, cached_results, approximation))
+                        continue
+
+                # only the inputs the metric consumes are computed and sent to its worker
+                dependencies = self._get_required_inputs(metric_module, metric_data, fast=fast_profile is not None)
+                unknown_inputs = [artifact for artifact in dependencies if artifact not in self.artifacts]
+                if unknown_inputs:
+                    print(f"Metric {metric} requires unknown inputs: {', '.join(unknown_inputs)}")
+                    continue
+                if self._is_evaluated_per_tile(metric_module):
+                    # the image artifacts are computed per tile by the metric itself
+                    dependencies = [artifact for artifact in dependencies if artifact not in TILE_ARTIFACTS]
+                for artifact in dependencies:
+                    if not graph.has_node(artifact):
+                        # e.g. a browser or the segmentation model hanging does not stall the evaluation
+                        graph.add_node(artifact, partial(self.artifacts.get, artifact), timeout=self._get_timeout())
+
+                graph.add_node(metric, partial(self._evaluate_metric, metric_module, cache_key), dependencies)
             else:
                 print('metric not found!')
 
-        # initialize
-        gui_segments = None
-        grayscale_image = None
-        jpeg_image = None
-        dom_analysis_result = None
-        lab_image = None
+        return graph
 
-        if is_grayscale_conversion_required:
-            grayscale_image = imagePreprocessing.convert_pil_image_to_grayscale(self.pil_image)
+    def _is_evaluated_per_tile(self, metric_module) -> bool:
+        return self.tiles is not None and hasattr(metric_module.Metric, 'execute_tiles')
 
-        if is_jpeg_conversion_required:
-            jpeg_image = imagePreprocessing.convert_pil_image_to_jpeg(self.pil_image)
+    def _get_fast_profile(self, metric_module) -> Optional[FastProfile]:
+        # settings of the fast profile if the metric is approximated, as in MetricsEvaluator.evaluate_metric
+        if self.profile != FAST_PROFILE or self._is_evaluated_per_tile(metric_module) or \
+                not hasattr(metric_module.Metric, 'execute_fast'):
+            return None
+        return FastProfile.from_env()
 
-        if is_lab_conversion_required:
-            lab_image = imagePreprocessing.convert_pil_image_to_lab(self.pil_image)
+    @staticmethod
+    def _get_required_inputs(metric_module, metric_data, fast: bool = False) -> List[str]:
+        required_inputs = getattr(metric_module.Metric, 'required_inputs', None)
+        fast_required_inputs = getattr(metric_module.Metric, 'fast_required_inputs', None)
+        if fast and fast_required_inputs is not None:
+            # the inputs of execute_fast, if they differ (e.g. the image to downscale rather than its pyramid)
+            required_inputs = fast_required_inputs
+        if required_inputs is not None:
+            return list(required_inputs)
+        # metrics not declaring their inputs get the image, the URL and the artifacts of their preprocessing flags
+        parameters = inspect.signature(metric_module.Metric.execute).parameters
+        return ['pil_image', 'image_url', 'png_image'] + [
+            artifact for preprocessing, artifact in PREPROCESSING_ARTIFACTS.items()
+            if metric_data['preprocessing'].get(preprocessing) and artifact in parameters
+        ]
 
-        metric_evaluator = MetricsEvaluator(
-            wui_id=self.wui_id,
-            metric_modules=metric_modules,
-            pil_image=self.pil_image,
-            lab_image=lab_image,
-            image_url=self.url,
-            grayscale_image=grayscale_image,
-            png_image=self.png_image,
-            jpeg_image=jpeg_image,
-            segments=gui_segments,
-            dom_analysis_result=dom_analysis_result
-        )
+    @classmethod
+    def _depends_on_html(cls, metric_module, metric_data) -> bool:
+        required_inputs = cls._get_required_inputs(metric_module, metric_data)
+        return 'dom_analysis_result' in required_inputs or 'accessibility_results' in required_inputs
 
-        # evaluate metrics which do not require either dom_analysis_result nor segmentation
-        metric_evaluator.evaluate_metrics_parallel()
+    @property
+    def pil_image(self):
+        # full-page screenshots are stitched only for the preprocessing steps that need the whole image
+        return self.input_image.pil_image
 
-        if is_dom_analysis_required:
-            from dom_analyzer.DOMAnalyzer import DOMAnalyzer
-            dom_analyzer = DOMAnalyzer(url=self.url, html=self.html_content)
-            if self.url is not None:
-                dom_analysis_result = dom_analyzer.analyze_url()
+    def _get_pixel_hash(self) -> str:
+        if self._pixel_hash is None:
+            if self.input_image.tiles is not None:
+                self._pixel_hash = imagePreprocessing.compute_tiled_image_hash(self.input_image.tiles)
             else:
-                dom_analysis_result = dom_analyzer.analyze_html()
+                self._pixel_hash = imagePreprocessing.compute_image_hash(self.pil_image)
+        return self._pixel_hash
 
-        metric_evaluator_require_dom_analysis = MetricsEvaluator(
-            wui_id=self.wui_id,
-            metric_modules=metric_modules_require_dom_analysis,
-            pil_image=self.pil_image,
-            lab_image=lab_image,
-            image_url=self.url,
-            grayscale_image=grayscale_image,
-            png_image=self.png_image,
-            jpeg_image=jpeg_image,
-            segments=gui_segments,
-            dom_analysis_result=dom_analysis_result
+    def _compute_image_hash(self) -> str:
+        # the decoded pixels, plus the size of the PNG input which is measured by the file size metrics
+        return f"{self._get_pixel_hash()}:{self.input_image.png_size}"
+
+    def _compute_html_hash(self) -> Optional[str]:
+        # the uploaded HTML, or the page rendered from the URL, which the DOM analysis and accessibility checks read
+        html_content = self.html_content if self.html_content is not None else self.page_source
+        if html_content is None:
+            return None
+        if isinstance(html_content, str):
+            html_content = html_content.encode('utf-8')
+        return hashlib.sha256(html_content).hexdigest()
+
+    def _store_cached_results(self, metric_id: str, results: List, approximation=None):
+        start_time = time.perf_counter()
+        stored_result = db_client.insert_metric_result_metadata(
+            wui_id=self.wui_id, metric_id=metric_id, results=results, approximation=approximation
         )
+        evaluation_progress.publish_metric(
+            self.wui_id, metric_id, results=results, duration=time.perf_counter() - start_time,
+            approximation=approximation
+        )
+        return stored_result
 
-        # evaluate metrics which require dom_analysis_result, but not segmentation
-        metric_evaluator_require_dom_analysis.evaluate_metrics_parallel()
+    def _store_failure(self, metric_id: str, error: str):
+        # stored along with the results, so that the readers of the stored results know the metric is done
+        try:
+            db_client.insert_metric_failure_metadata(wui_id=self.wui_id, metric_id=metric_id, error=error)
+        except Exception as e:
+            print(f"Failed to store the error of metric {metric_id}: {e}")
 
-        if is_segmentation_required:
-            from image_preprocessing.segmentation.model import Segmentation
-            gui_segments = Segmentation.execute(self.pil_image)
+    def _share(self, array: np.ndarray, as_image: bool = False) -> SharedArray:
+        shared_array = SharedArray.create(array, as_image=as_image)
+        self._shared_arrays.append(shared_array)
+        return shared_array
 
-        metric_evaluator_require_segmentation = MetricsEvaluator(
-            wui_id=self.wui_id,
-            metric_modules=metric_modules_require_segmentation,
-            pil_image=self.pil_image,
-            lab_image=lab_image,
-            image_url=self.url,
-            grayscale_image=grayscale_image,
-            png_image=self.png_image,
-            jpeg_image=jpeg_image,
-            segments=gui_segments,
-            dom_analysis_result=dom_analysis_result
+    def _compute_pil_image(self):
+        if self.input_image.tiles is not None:
+            # copied to the workers tile by tile, without stitching the image in the server
+            shared_image = self.input_image.tiles.share()
+            self._shared_arrays.append(shared_image)
+            return shared_image
+        return self._share(self.input_image.array, as_image=True)
+
+    def _compute_image_url(self):
+        return self.url
+
+    def _compute_png_image(self):
+        return self.input_image.png_image
+
+    def _get_cached_artifact(self, conversion: str, compute, extension: str = ".npy", **params):
+        # conversions of an image evaluated before (e.g. with other metrics) are reused
+        key = ArtifactCache.make_key(self._get_pixel_hash(), conversion, **params)
+        return artifact_cache.get_or_compute(key, compute, extension)
+
+    def _compute_grayscale_image(self):
+        grayscale_array = self._get_cached_artifact(
+            "grayscale", lambda: np.asarray(imagePreprocessing.convert_pil_image_to_grayscale(self.pil_image))
         )
+        return self._share(grayscale_array, as_image=True)
 
-        # metric_evaluator_require_segmentation.evaluate_metrics_parallel()
-        metric_evaluator_require_segmentation.evaluate_metrics_parallel()
+    def _compute_jpeg_image(self, quality: int = 80):
+        jpeg_bytes = self._get_cached_artifact(
+            "jpeg", lambda: imagePreprocessing.convert_pil_image_to_jpeg(self.pil_image, quality=quality).getvalue(),
+            extension=".jpg", quality=quality
+        )
+        # positioned at the end like a freshly written buffer, its size being read with tell() by the metrics
+        jpeg_image = BytesIO(jpeg_bytes)
+        jpeg_image.seek(0, 2)
+        return jpeg_image
+
+    def _get_lab_array(self) -> np.ndarray:
+        return self._get_cached_artifact("lab", lambda: imagePreprocessing.convert_pil_image_to_lab(self.pil_image))
 
-        # for performance testing, where f1, f2, and f3 are for the different MetricEvaluator classes
-        # results = f1 + f2 + f3
-        #
-        # for result in results:
-        #     result.get()
+    def _compute_lab_image(self):
+        return self._share(self._get_lab_array())
 
+    def _compute_lab_pyramid(self):
+        # shared by the clutter metrics, which attach it as a LabPyramid
+        lab_pyramid = SharedArrayGroup.create(LabPyramid.build(self._get_lab_array()).arrays, factory=LabPyramid)
+        self._shared_arrays.append(lab_pyramid)
+        return lab_pyramid
+
+    def _compute_dom_analysis_result(self):
+        from dom_analyzer.DOMAnalyzer import DOMAnalyzer
+        with DOMAnalyzer(url=self.url, html=self.html_content) as dom_analyzer:
+            if self.url is not None:
+                if self.page_source is not None:
+                    # the page was rendered for the screenshot already
+                    return dom_analyzer.analyze_html(self.page_source)
+                return dom_analyzer.analyze_url()
+            return dom_analyzer.analyze_html()
 
+    def _compute_accessibility_results(self):
+        if self.accessibility_results is not None:
+            return self.accessibility_results
+        if self.url is None:
+            raise ValueError("No page to run the accessibility checks on.")
+        from screenshot_capturer.ScreenshotCapturer import ScreenshotCapturer
+        return ScreenshotCapturer().check_accessibility(self.url)
 
+    def _compute_segments(self):
+        from image_preprocessing.segmentation.model import Segmentation
+        return Segmentation.execute(self.pil_image)
 
+    @staticmethod
+    def _get_timeout() -> float:
+        return float(os.environ.get("METRIC_EVALUATION_TIMEOUT") or DEFAULT_METRIC_EVALUATION_TIMEOUT)
+
+    def _evaluate_metric(self, metric_module, cache_key, **artifacts):
+        timeout = self._get_timeout()
+        start_marker = os.path.join(SHARED_MEMORY_DIR, f"wui_metric_started_{uuid.uuid4().hex}")
+        metric_evaluator = MetricsEvaluator(
+            wui_id=self.wui_id,
+            metric_modules=[metric_module],
+            artifacts=artifacts,
+            tiles=self.tiles if self._is_evaluated_per_tile(metric_module) else None,
+            cache_keys={MetricsEvaluator.extract_metric_id(metric_module.__name__): cache_key} if cache_key else None,
+            profile=self.profile,
+            timeout=timeout,
+            start_marker=start_marker
+        )
+
+        # wait for the worker pool, so that the node is done only once the metric is evaluated, or has timed out
+        outcomes = []
+        try:
+            for module, result in zip(metric_evaluator.metric_modules, metric_evaluator.evaluate_metrics_parallel()):
+                metric_id = MetricsEvaluator.extract_metric_id(module.__name__)
+                outcome = self._wait_for_worker(metric_id, result, start_marker, timeout)
+                if outcome['error'] is not None:
+                    # the worker stores the results of the evaluated metrics only
+                    self._store_failure(metric_id, outcome['error'])
+                outcomes.append(outcome)
+                evaluation_progress.publish_metric(self.wui_id, **outcome)
+        finally:
+            try:
+                os.remove(start_marker)
+            except FileNotFoundError:
+                pass
+        return outcomes
+
+    @staticmethod
+    def _wait_for_worker(metric_id: str, result, start_marker: str, timeout: float):
+        """
+        Wait for the outcome of a metric queued into the worker pool. The worker interrupts the metric once it has
+        run for the timeout (not counting the time it was queued), the server only gives up on a worker that does
+        not return even then.
+        """
+        while True:
+            try:
+                return result.get(timeout=WORKER_POLL_INTERVAL)
+            except WorkerTimeoutError:
+                try:
+                    started_at = os.path.getmtime(start_marker)
+                except OSError:
+                    # still queued behind other metrics
+                    continue
+                running_time = time.time() - started_at
+                if running_time > timeout + WORKER_TIMEOUT_GRACE:
+                    # the worker is stuck, it does not store the results of the metric if it ever returns
+                    print(f"Evaluation of {metric_id} timed out after {running_time:g} s")
+                    return MetricsEvaluator.failed_outcome(
+                        metric_id, f"The evaluation timed out after {timeout:g} s.", running_time
+                    )
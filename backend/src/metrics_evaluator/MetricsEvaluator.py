@@ -1,19 +1,32 @@
-from pathos.multiprocessing import ProcessPool
+import time
+from typing import Any, Dict, Optional
+
+from commons.approximation import EXACT_PROFILE, FAST_PROFILE, FastProfile, describe_approximation
+from commons.shared_memory_utils import open_shared
+from commons.time_limit import MetricTimeout, time_limit
+from metrics_evaluator.MetricsRegistry import get_metrics_registry
+from metrics_evaluator.ResultCache import get_result_cache
 from metrics_evaluator.ResultStorer import ResultStorer
+from metrics_evaluator.WorkerPool import get_worker_pool
 
 
 class MetricsEvaluator:
-    def __init__(self, wui_id, metric_modules, pil_image, lab_image, image_url, grayscale_image, png_image, jpeg_image, segments, dom_analysis_result):
+    def __init__(self, wui_id, metric_modules, artifacts: Dict[str, Any], tiles=None, cache_keys=None,
+                 profile: str = EXACT_PROFILE, timeout: Optional[float] = None, start_marker: Optional[str] = None):
         self.wui_id = wui_id
         self.metric_modules = metric_modules
-        self.pil_image = pil_image
-        self.lab_image = lab_image
-        self.image_url = image_url
-        self.grayscale_image = grayscale_image
-        self.png_image = png_image
-        self.jpeg_image = jpeg_image
-        self.segments = segments
-        self.dom_analysis_result = dom_analysis_result
+        # inputs of the metrics by argument name, only those they declare (see MetricInterface.required_inputs)
+        self.artifacts = artifacts
+        # tiled (full-page) image, for the metrics that can be evaluated tile by tile
+        self.tiles = tiles
+        # keys (by metric ID) under which the results of the metrics are cached
+        self.cache_keys = cache_keys or {}
+        # evaluation profile, "fast" approximating the metrics implementing execute_fast (see commons/approximation)
+        self.profile = profile
+        # time a metric may run in its worker (seconds), its results are not stored if it runs for longer
+        self.timeout = timeout
+        # file created when a worker starts evaluating the metrics, so that their timeout is measured from then on
+        self.start_marker = start_marker
 
     @staticmethod
     def extract_metric_id(module_name: str) -> str:
@@ -26,28 +39,76 @@ class MetricsEvaluator:
         return metric_id
 
     def evaluate_metric(self, module):
+        """
+        Evaluate and store a metric, and return its outcome: the metric ID, its (processed) results, the evaluation
+        duration in seconds, the error message if it failed and, for approximate results, the settings of the fast
+        profile they were evaluated with and their calibrated deviation from the exact results (None if exact).
+        """
+        start_time = time.perf_counter()
+        if self.start_marker is not None:
+            open(self.start_marker, "w").close()
+        metric_id = self.extract_metric_id(module.__name__)
+        approximation = None
         try:
+            # modules are sent to the workers by name, pick up the implementation if its file changed since
+            module = get_metrics_registry().get_module(metric_id) or module
             m = module.Metric()
-            result = m.execute(
-                pil_image=self.pil_image,
-                lab_image=self.lab_image,
-                image_url=self.image_url,
-                grayscale_image=self.grayscale_image,
-                png_image=self.png_image,
-                jpeg_image=self.jpeg_image,
-                segments=self.segments,
-                dom_analysis_result=self.dom_analysis_result
+            with time_limit(self.timeout):
+                if self.tiles is not None and hasattr(m, 'execute_tiles'):
+                    # the metric streams over the tiles of the full-page image
+                    result = m.execute_tiles(tiles=self.tiles)
+                elif self.profile == FAST_PROFILE and hasattr(m, 'execute_fast'):
+                    fast_profile = FastProfile.from_env()
+                    result = self._execute(m, fast_profile)
+                    approximation = describe_approximation(metric_id, fast_profile)
+                else:
+                    result = self._execute(m)
+            if self.timeout and time.perf_counter() - start_time > self.timeout:
+                # the time limit expired while the metric was in native code, and was not raised in time
+                raise MetricTimeout()
+            result_aggregator = ResultStorer(
+                wui_id=self.wui_id, metric_id=metric_id, results=result, approximation=approximation
+            )
+            processed_result = result_aggregator.store_result()
+            if metric_id in self.cache_keys:
+                get_result_cache().put(self.cache_keys[metric_id], processed_result)
+        except MetricTimeout:
+            print(f"Evaluation of {metric_id} timed out after {self.timeout:g} s")
+            return self.failed_outcome(
+                metric_id, f"The evaluation timed out after {self.timeout:g} s.", time.perf_counter() - start_time
             )
-            metric_id = self.extract_metric_id(module.__name__)
-            result_aggregator = ResultStorer(wui_id=self.wui_id, metric_id=metric_id, results=result)
-            result_aggregator.store_result()
         except Exception as e:
-            return module.__name__, str(e)
+            print(f"Failed to evaluate {module.__name__}: {e}")
+            return self.failed_outcome(metric_id, str(e), time.perf_counter() - start_time)
+        return {
+            "metric_id": metric_id,
+            "results": processed_result,
+            "duration": time.perf_counter() - start_time,
+            "error": None,
+            "approximation": approximation
+        }
+
+    @staticmethod
+    def failed_outcome(metric_id: str, error: str, duration: Optional[float]) -> Dict[str, Any]:
+        return {
+            "metric_id": metric_id,
+            "results": None,
+            "duration": duration,
+            "error": error,
+            "approximation": None
+        }
+
+    def _execute(self, m, fast_profile: Optional[FastProfile] = None):
+        # image artifacts may be shared through memory-mapped files, attach them in the worker
+        artifacts = {name: open_shared(artifact) for name, artifact in self.artifacts.items()}
+        if fast_profile is not None:
+            return m.execute_fast(profile=fast_profile, **artifacts)
+        return m.execute(**artifacts)
 
     def evaluate_metrics_parallel(self):
-        with ProcessPool() as pool:
-            [pool.apipe(self.evaluate_metric, module) for module in self.metric_modules]
+        # queue the metrics into the worker pool shared by all evaluations of this server process
+        pool = get_worker_pool()
+        return [pool.submit(self.evaluate_metric, module) for module in self.metric_modules]
 
     def evaluate_metrics_sequential(self):
-        for module in self.metric_modules:
-            self.evaluate_metric(module)
+        return [self.evaluate_metric(module) for module in self.metric_modules]
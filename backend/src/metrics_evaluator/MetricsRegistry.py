@@ -0,0 +1,135 @@
+import hashlib
+import importlib
+import re
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Optional
+
+# constants for dynamic loading of metrics
+METRICS_DIR: str = "metrics_evaluator/metrics"
+METRICS_FILE_PATTERN: str = "*_*.py"
+# code shared by the metric implementations (helpers, preprocessing), which their results depend on as well
+SHARED_CODE_DIRS = ("commons", "image_preprocessing", "dom_analyzer")
+SHARED_CODE_FILES = ("metrics_evaluator/metrics/metric_interface.py",)
+
+
+class _MetricEntry:
+    def __init__(self, path: Path):
+        self.path = path
+        package_name = re.sub(r"/|\\", ".", str(path.parent))
+        self.module_name = f"{package_name}.{path.stem}"
+        self.module: Optional[ModuleType] = None
+        self.mtime: Optional[float] = None
+        self.version: Optional[str] = None
+
+
+class MetricsRegistry:
+    """
+    Index of the metric implementations, built once from the metrics directory.
+
+    Imported metric modules stay resident, a module is only reloaded when its file changes (first its modification
+    time, then its content hash is compared), e.g. after an approved metric extension replaced it. Metric IDs that
+    are not indexed yet (new extensions) trigger a rescan of the metrics directory.
+    """
+
+    def __init__(self, metrics_dir: str = METRICS_DIR, file_pattern: str = METRICS_FILE_PATTERN):
+        self.metrics_dir = metrics_dir
+        self.file_pattern = file_pattern
+        self._entries: Dict[str, _MetricEntry] = {}
+        self._lock = threading.RLock()
+        self._shared_code_version: Optional[str] = None
+        self.scan()
+
+    @staticmethod
+    def extract_metric_id(path: Path) -> str:
+        # Split by the first underscore and take the first part as the ID
+        return path.stem.split('_', 1)[0]
+
+    def scan(self):
+        """
+        (Re-)index the metric files, keeping the modules that are already loaded.
+        """
+        with self._lock:
+            for metric_file in sorted(Path(self.metrics_dir).glob(self.file_pattern)):
+                metric_id = self.extract_metric_id(metric_file)
+                entry = self._entries.get(metric_id)
+                if entry is None or entry.path != metric_file:
+                    self._entries[metric_id] = _MetricEntry(metric_file)
+
+    def get_module(self, metric_id: str) -> Optional[ModuleType]:
+        """
+        Retrieve the module implementing a metric, importing or reloading it only if required.
+        """
+        with self._lock:
+            if metric_id not in self._entries:
+                self.scan()
+            entry = self._entries.get(metric_id)
+            if entry is None:
+                return None
+
+            mtime = entry.path.stat().st_mtime
+            if entry.module is not None and mtime == entry.mtime:
+                return entry.module
+
+            version = hashlib.sha256(entry.path.read_bytes()).hexdigest()
+            if entry.module is None:
+                entry.module = sys.modules.get(entry.module_name) or importlib.import_module(entry.module_name)
+            elif version != entry.version:
+                entry.module = importlib.reload(entry.module)
+            entry.mtime = mtime
+            entry.version = version
+            return entry.module
+
+    def get_version(self, metric_id: str) -> Optional[str]:
+        """
+        Retrieve the content hash of the implementation of a metric.
+        """
+        with self._lock:
+            if self.get_module(metric_id) is None:
+                return None
+            return self._entries[metric_id].version
+
+    def get_shared_code_version(self) -> str:
+        """
+        Retrieve the content hash of the code shared by the metric implementations. It is computed once per process,
+        as shared modules are not reloaded (unlike the metric implementations).
+        """
+        with self._lock:
+            if self._shared_code_version is None:
+                digest = hashlib.sha256()
+                paths = [path for directory in SHARED_CODE_DIRS for path in Path(directory).rglob("*.py")]
+                paths += [Path(path) for path in SHARED_CODE_FILES]
+                for path in sorted(paths):
+                    digest.update(str(path).encode("utf-8") + b"\0")
+                    digest.update(path.read_bytes())
+                self._shared_code_version = digest.hexdigest()
+            return self._shared_code_version
+
+    def preload(self):
+        """
+        Import every indexed metric implementation, and warm it up if it defines a warm_up() class method.
+        """
+        for metric_id in list(self._entries):
+            try:
+                module = self.get_module(metric_id)
+                # metrics may precompute their constants (e.g. filter banks) on a warm-up hook
+                warm_up = getattr(getattr(module, 'Metric', None), 'warm_up', None)
+                if warm_up is not None:
+                    warm_up()
+            except Exception as e:
+                print(f"Failed to preload {metric_id}: {e}")
+
+
+_metrics_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """
+    Retrieve the metrics registry of the current process (server or metric worker).
+    """
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
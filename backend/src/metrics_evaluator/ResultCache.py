@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from typing import Any, List, Optional
+
+# default location and size of the on-disk cache, shared by all server instances running on the same host
+DEFAULT_RESULT_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "wui_result_cache")
+DEFAULT_RESULT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+
+class ResultCache:
+    """
+    Content-addressed cache of metric evaluation results, stored as one JSON file per entry.
+
+    The cache is bounded in size: when it grows over its budget, the least recently used entries (by file
+    modification time, which is refreshed on every hit) are evicted. Writes are atomic, so several server processes
+    can share the same cache directory.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.environ.get("RESULT_CACHE_DIR") or DEFAULT_RESULT_CACHE_DIR
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("RESULT_CACHE_MAX_BYTES") or DEFAULT_RESULT_CACHE_MAX_BYTES)
+        self.max_bytes = max_bytes
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        # a budget of 0 bytes disables the cache
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(image_hash: str, metric_id: str, metric_version: str, url: Optional[str] = None,
+                 html_hash: Optional[str] = None, profile: Optional[str] = None,
+                 shared_code_version: Optional[str] = None) -> str:
+        """
+        Build the key of the results of a metric for an input.
+
+        Args:
+            image_hash: the hash of the decoded input image
+            metric_id: the ID of the metric
+            metric_version: the version (content hash) of the metric implementation
+            url: the URL of the input, if any
+            html_hash: the hash of the HTML content of the input, for metrics requiring DOM analysis
+            profile: the evaluation profile and its settings for approximate results, None for exact results
+            shared_code_version: the version (content hash) of the code shared by the metric implementations
+        """
+        key_parts = [image_hash, metric_id, metric_version, url or "", html_hash or "", shared_code_version or ""]
+        if profile:
+            key_parts.append(profile)
+        return hashlib.sha256("\0".join(key_parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[Any]]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                results = json.load(f)
+            # mark the entry as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return results
+
+    def put(self, key: str, results: List[Any]):
+        if not self.enabled:
+            return
+        try:
+            content = json.dumps(results)
+        except (TypeError, ValueError) as e:
+            print(f"Results of {key} cannot be cached: {e}")
+            return
+
+        # write to a temporary file first, so that readers never see a partial entry
+        tmp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        # remove the least recently used entries until the cache fits its budget again
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Retrieve the result cache of the current process.
+    """
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
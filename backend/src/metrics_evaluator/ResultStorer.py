@@ -4,10 +4,12 @@ import db_client
 
 
 class ResultStorer:
-    def __init__(self, wui_id, metric_id, results):
+    def __init__(self, wui_id, metric_id, results, approximation=None):
         self.wui_id = wui_id
         self.results = results
         self.metric_id = metric_id
+        # profile settings and calibrated deviation of approximate results (see commons/approximation), None if exact
+        self.approximation = approximation
 
     def store_result(self):
         processed_result = []
@@ -28,6 +30,9 @@ class ResultStorer:
         db_client.insert_metric_result_metadata(
             wui_id=self.wui_id,
             metric_id=self.metric_id,
-            results=processed_result
+            results=processed_result,
+            approximation=self.approximation
         )
 
+        return processed_result
+
@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class TaskGraph:
+    """
+    Dependency-graph executor for the preprocessing and metric evaluation of a WUI.
+
+    Every node is a callable that receives the results of the nodes it depends on as keyword arguments (named after
+    those nodes). A node is started as soon as all of its dependencies are done, so independent preprocessing steps
+    and metrics overlap instead of running in fixed phases. If a node fails (or times out), the nodes depending on it
+    are skipped.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self._nodes: Dict[str, Callable] = {}
+        self._dependencies: Dict[str, tuple] = {}
+        self._timeouts: Dict[str, float] = {}
+
+    def add_node(self, name: str, func: Callable, dependencies: Iterable[str] = (), timeout: Optional[float] = None):
+        """
+        Add a node, failing with a TimeoutError if it runs for longer than timeout seconds (its computation is then
+        left running in the background, as threads cannot be interrupted).
+        """
+        if name in self._nodes:
+            raise ValueError(f"Node '{name}' is already defined.")
+        self._nodes[name] = func
+        self._dependencies[name] = tuple(dependencies)
+        if timeout:
+            self._timeouts[name] = timeout
+
+    def has_node(self, name: str) -> bool:
+        return name in self._nodes
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Execute all nodes and return their results by node name. The result of a failed (or skipped) node is the
+        exception that caused it to fail.
+        """
+        for name, dependencies in self._dependencies.items():
+            missing = [dependency for dependency in dependencies if dependency not in self._nodes]
+            if missing:
+                raise ValueError(f"Node '{name}' depends on undefined node(s): {', '.join(missing)}")
+
+        results: Dict[str, Any] = {}
+        failed = set()
+        pending = dict(self._dependencies)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers or max(len(self._nodes), 1)) as executor:
+            while pending or running:
+                skipped = True
+                while skipped:
+                    skipped = False
+                    for name, dependencies in list(pending.items()):
+                        if any(dependency in failed for dependency in dependencies):
+                            del pending[name]
+                            failed.add(name)
+                            results[name] = RuntimeError(f"Skipped '{name}', a dependency failed.")
+                            skipped = True
+                        elif all(dependency in results for dependency in dependencies):
+                            del pending[name]
+                            kwargs = {dependency: results[dependency] for dependency in dependencies}
+                            running[executor.submit(self._call, name, kwargs)] = name
+
+                if not running:
+                    # every remaining node was skipped, or the graph contains a cycle
+                    if pending:
+                        raise ValueError(f"Cyclic dependencies between nodes: {', '.join(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        print(f"Task '{name}' failed: {e}")
+                        failed.add(name)
+                        results[name] = e
+
+        return results
+
+    def _call(self, name: str, kwargs: Dict[str, Any]) -> Any:
+        timeout = self._timeouts.get(name)
+        if timeout is None:
+            return self._nodes[name](**kwargs)
+
+        future = Future()
+
+        def call():
+            try:
+                future.set_result(self._nodes[name](**kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        # a daemon thread of its own, so that a node that never returns holds neither the pool nor the process
+        threading.Thread(target=call, name=f"task_{name}", daemon=True).start()
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            raise TimeoutError(f"Task '{name}' timed out after {timeout:g} s.") from None
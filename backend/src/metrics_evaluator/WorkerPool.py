@@ -0,0 +1,64 @@
+import os
+from typing import Optional
+
+from pathos.multiprocessing import ProcessPool
+
+from metrics_evaluator.MetricsRegistry import get_metrics_registry
+
+
+def preload_metric_modules():
+    """
+    Import every metric implementation once, so that the heavy module-level work (e.g. loading model weights)
+    is done when a worker is spawned rather than when it receives its first task.
+    """
+    get_metrics_registry().preload()
+
+
+class WorkerPool:
+    """
+    Long-lived, bounded pool of metric worker processes shared by all evaluations of the server process.
+    Tasks from concurrent evaluations are queued into the same pool instead of each evaluation spawning its own.
+    """
+
+    def __init__(self, nodes: Optional[int] = None):
+        # number of worker processes, configurable per server instance, defaults to the number of CPUs
+        self.nodes = nodes or int(os.environ.get("METRICS_WORKER_POOL_SIZE") or 0) or os.cpu_count()
+        self._pool: Optional[ProcessPool] = None
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ProcessPool(nodes=self.nodes, id='metrics_worker_pool', initializer=preload_metric_modules)
+        return self
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue a task into the pool and return its asynchronous result.
+        """
+        if self._pool is None:
+            self.start()
+        return self._pool.apipe(func, *args, **kwargs)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.clear()
+            self._pool = None
+
+
+_worker_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool() -> WorkerPool:
+    """
+    Retrieve the worker pool of the current process, starting it on first use.
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = WorkerPool().start()
+    return _worker_pool
+
+
+def shutdown_worker_pool():
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.close()
+        _worker_pool = None
@@ -26,6 +26,9 @@ References:
     DOI: https://doi.org/10.1145/3266037.3266087
 """
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from typing import Optional, Dict, Any, Union, List
 
@@ -33,12 +36,16 @@ import numpy as np
 from PIL import Image
 
 from metrics_evaluator.metrics.metric_interface import MetricInterface
+from commons.approximation import FastProfile, evaluate_fast
+from commons.lab_pyramid import LAB_CHANNELS, LabPyramid
 from commons.visual_clutter_utils import (
     conv2,
     RRoverlapconv,
     RRgaussfilter1D,
-    RRcontrast1channel,
+    RRcontrast1level,
+    DoG1filter,
     orient_filtnew,
+    orientation_filters,
     poolnew,
     sumorients,
     HV,
@@ -49,12 +56,83 @@ from pydantic import HttpUrl
 from pyrtools import pyramids, upConv
 
 
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def get_clutter_threads() -> int:
+    """
+    Number of threads computing the clutter maps of the metric in a metric worker, read from the
+    FEATURE_CONGESTION_THREADS environment variable. It defaults to the CPUs left to each worker of the pool (see
+    WorkerPool), and to at least 2 on a multi-core host: the pool has a worker per CPU by default, but few of them run
+    this metric at once, so the second thread mostly runs on a CPU left idle, and oversubscribes it by a thread at
+    worst.
+    """
+    threads = int(os.environ.get("FEATURE_CONGESTION_THREADS") or 0)
+    if threads:
+        return threads
+    cpu_count = os.cpu_count() or 1
+    worker_pool_size = int(os.environ.get("METRICS_WORKER_POOL_SIZE") or 0) or cpu_count
+    return min(max(cpu_count // worker_pool_size, 2), cpu_count)
+
+
+def get_clutter_executor(max_workers: int) -> Optional[ThreadPoolExecutor]:
+    """
+    Retrieve the thread pool computing the clutter maps of the metric, None to compute them serially (a single thread,
+    or a single work item).
+
+    The pool is created lazily in each process (metric workers are forked, and the threads of a pool are not), and
+    replaced if the number of threads is changed, the previous one being shut down once its work is done.
+    """
+    global _executor, _executor_pid
+    threads = get_clutter_threads()
+    if min(threads, max_workers) <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid() or _executor._max_workers != threads:
+            if _executor is not None and _executor_pid == os.getpid():
+                _executor.shutdown(wait=False)
+            # threads are started on demand, up to the number of work items submitted at once
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="feature_congestion")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+class PyramidContext:
+    """
+    State of a single evaluation of the metric: the Gaussian pyramids of the luminance (lum) and chrominance (a,b)
+    channels, so that concurrent evaluations (e.g. in threads) never share them.
+    """
+
+    def __init__(self, lum_pyr: Dict, a_pyr: Dict, b_pyr: Dict):
+        self.lum_pyr = lum_pyr
+        self.a_pyr = a_pyr
+        self.b_pyr = b_pyr
+
+    @classmethod
+    def from_lab_image(cls, lab_image: np.ndarray, levels: int) -> "PyramidContext":
+        return cls(*[pyramids.GaussianPyramid(lab_image[:, :, channel], height=levels).pyr_coeffs
+                     for channel in range(3)])
+
+    @classmethod
+    def from_lab_pyramid(cls, lab_pyramid: LabPyramid, levels: int) -> "PyramidContext":
+        # the pyramids built by the preprocessing, shared with the other clutter metrics
+        if lab_pyramid.levels < levels:
+            raise ValueError(f"The Lab pyramid has {lab_pyramid.levels} levels, {levels} are required.")
+        return cls(*[lab_pyramid.gaussian_pyramid(channel) for channel in LAB_CHANNELS])
+
+
 class Metric(MetricInterface):
     """
         Mostly based on the AIM's python implementation on the metric (available at: https://github.com/aalto-ui/aim),
         which is based on the MATLAB implementation by Rosenholtz et al, available at: http://hdl.handle.net/1721.1/37593
     """
 
+    required_inputs = ("lab_pyramid",)
+    # the fast profile downscales the image rather than its pyramid
+    fast_required_inputs = ("lab_image",)
+
     # private constants
     _LEVELS: int = 3  # number of levels (scales)
     _COLOR_POOL_SIGMA: float = 3  # std dev. of the Gaussian window for color clutter
@@ -81,10 +159,17 @@ class Metric(MetricInterface):
         1.0  # a parameter when combining local clutter over space
     )
 
-    # empty luminance (lum) and chrominance (a,b) channels
-    _lum_pyr: Dict = {}
-    _a_pyr: Dict = {}
-    _b_pyr: Dict = {}
+    @classmethod
+    def warm_up(cls):
+        """
+        Build the filter bank of the metric (cached per process), e.g. when a metric worker starts.
+        """
+        RRgaussfilter1D(round(2 * cls._COLOR_POOL_SIGMA), cls._COLOR_POOL_SIGMA)
+        RRgaussfilter1D(round(6), 3)
+        DoG1filter(round(cls._CONTRAST_FILT_SIGMA * 3), cls._CONTRAST_FILT_SIGMA)
+        orientation_filters(cls._OPP_ENERGY_FILTER_SCALE)
+        RRgaussfilter1D(round(2 * cls._OPP_ENERGY_POOL_SCALE), cls._OPP_ENERGY_POOL_SCALE)
+        RRgaussfilter1D(round(8 * cls._ORIENTATION_POOL_SIGMA), 4 * cls._ORIENTATION_POOL_SIGMA)
 
     # private methods
     @staticmethod
@@ -122,18 +207,15 @@ class Metric(MetricInterface):
             common_sz = min(clutter_map.shape[0], clutter_here.shape[0]), min(
                 clutter_map.shape[1], clutter_here.shape[1]
             )
-            for i in range(0, common_sz[0]):
-                for j in range(0, common_sz[1]):
-                    clutter_map[i][j] = max(
-                        clutter_map[i][j], clutter_here[i][j]
-                    )
+            common_region = clutter_map[:common_sz[0], :common_sz[1]]
+            np.maximum(common_region, clutter_here[:common_sz[0], :common_sz[1]], out=common_region)
 
         return clutter_map
 
     @classmethod
-    def _color_clutter(cls) -> np.ndarray:
+    def _color_clutter_level(cls, context: PyramidContext, i: int) -> np.ndarray:
         """
-        Compute the color clutter map of an image.
+        Compute the color clutter map of an image at a scale.
 
         Color clutter is computed as the "volume" of a color distribution
         ellipsoid, which is the determinant of covariance matrix. Covariance
@@ -141,13 +223,16 @@ class Metric(MetricInterface):
         specifically, cov(X,Y) = E(XY)-E(X)E(Y), where E (expectation value)
         can be approximated by filtering with a Gaussian window.
 
+        Args:
+            context: the pyramids of the image
+            i: the scale (pyramid level)
+
         Returns:
             Results
-            - color_clutter_map (ndarray): an array of the same size as inputImage
+            - color clutter map (ndarray): an array of the size of the pyramid level
         """
         # Initialization
         covMx: Dict = {}
-        color_clutter_levels = [0] * cls._LEVELS
         DL: list = [0] * cls._LEVELS
         Da: list = [0] * cls._LEVELS
         Db: list = [0] * cls._LEVELS
@@ -165,182 +250,162 @@ class Metric(MetricInterface):
             round(2 * cls._COLOR_POOL_SIGMA), cls._COLOR_POOL_SIGMA
         )
 
-        for i in range(0, cls._LEVELS):
-            # Get E(X) by filtering X with a one-dimensional Gaussian window separably in x and y directions:
-            DL[i] = RRoverlapconv(bigG, cls._lum_pyr[(i, 0)])
-            DL[i] = RRoverlapconv(bigG.T, DL[i])  # E(L)
-            Da[i] = RRoverlapconv(bigG, cls._a_pyr[(i, 0)])
-            Da[i] = RRoverlapconv(bigG.T, Da[i])  # E(a)
-            Db[i] = RRoverlapconv(bigG, cls._b_pyr[(i, 0)])
-            Db[i] = RRoverlapconv(bigG.T, Db[i])  # E(b)
-
-            # Covariance matrix
-            # covMx(L,a,b) = | cov(L,L)  cov(L,a)  cov(L,b) |
-            #                | cov(a,L)  cov(a,a)  cov(a,b) |
-            #                | cov(b,L)  cov(b,a)  cov(b,b) |
-            # where cov(X,Y) = E(XY) - E(X)E(Y)
-            #   and if X is the same as Y, then it's the variance var(X) =
-            #   E(X.^2)-E(X).^2
-            # and as cov(X,Y) = cov(Y,X), covMx is symmetric
-
-            # covariance matrix elements:
-            covMx[(i, 0, 0)] = RRoverlapconv(bigG, cls._lum_pyr[(i, 0)] ** 2)
-            covMx[(i, 0, 0)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 0, 0)]) - DL[i] ** 2 + deltaL2
-            )  # cov(L,L) + deltaL2
-            covMx[(i, 0, 1)] = RRoverlapconv(
-                bigG, cls._lum_pyr[(i, 0)] * cls._a_pyr[(i, 0)]
-            )
-            covMx[(i, 0, 1)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 0, 1)]) - DL[i] * Da[i]
-            )  # cov(L,a)
-            covMx[(i, 0, 2)] = RRoverlapconv(
-                bigG, cls._lum_pyr[(i, 0)] * cls._b_pyr[(i, 0)]
-            )
-            covMx[(i, 0, 2)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 0, 2)]) - DL[i] * Db[i]
-            )  # cov(L,b)
-            covMx[(i, 1, 1)] = RRoverlapconv(bigG, cls._a_pyr[(i, 0)] ** 2)
-            covMx[(i, 1, 1)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 1, 1)]) - Da[i] ** 2 + deltaa2
-            )  # cov(a,a) + deltaa2
-            covMx[(i, 1, 2)] = RRoverlapconv(
-                bigG, cls._a_pyr[(i, 0)] * cls._b_pyr[(i, 0)]
-            )
-            covMx[(i, 1, 2)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 1, 2)]) - Da[i] * Db[i]
-            )  # cov(a,b)
-            covMx[(i, 2, 2)] = RRoverlapconv(bigG, cls._b_pyr[(i, 0)] ** 2)
-            covMx[(i, 2, 2)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 2, 2)]) - Db[i] ** 2 + deltab2
-            )
-            # cov(b,b) + deltab2
-
-            # Get the determinant of covariance matrix
-            # which is the "volume" of the covariance ellipsoid
-            detIm = (
-                    covMx[(i, 0, 0)]
-                    * (
-                            covMx[(i, 1, 1)] * covMx[(i, 2, 2)]
-                            - covMx[(i, 1, 2)] * covMx[(i, 1, 2)]
-                    )
-                    - covMx[(i, 0, 1)]
-                    * (
-                            covMx[(i, 0, 1)] * covMx[(i, 2, 2)]
-                            - covMx[(i, 1, 2)] * covMx[(i, 0, 2)]
-                    )
-                    + covMx[(i, 0, 2)]
-                    * (
-                            covMx[(i, 0, 1)] * covMx[(i, 1, 2)]
-                            - covMx[(i, 1, 1)] * covMx[(i, 0, 2)]
-                    )
-            )
-
-            # Take the square root considering variance is squared, and the cube
-            # root, since this is the volume and the contrast measure is a "length"
-            color_clutter_levels[i] = np.sqrt(detIm) ** (1 / 3)
-
-        # Compute color clutter map
-        color_clutter_map = cls._collapse(color_clutter_levels)
+        # Get E(X) by filtering X with a one-dimensional Gaussian window separably in x and y directions:
+        DL[i] = RRoverlapconv(bigG, context.lum_pyr[(i, 0)])
+        DL[i] = RRoverlapconv(bigG.T, DL[i])  # E(L)
+        Da[i] = RRoverlapconv(bigG, context.a_pyr[(i, 0)])
+        Da[i] = RRoverlapconv(bigG.T, Da[i])  # E(a)
+        Db[i] = RRoverlapconv(bigG, context.b_pyr[(i, 0)])
+        Db[i] = RRoverlapconv(bigG.T, Db[i])  # E(b)
+
+        # Covariance matrix
+        # covMx(L,a,b) = | cov(L,L)  cov(L,a)  cov(L,b) |
+        #                | cov(a,L)  cov(a,a)  cov(a,b) |
+        #                | cov(b,L)  cov(b,a)  cov(b,b) |
+        # where cov(X,Y) = E(XY) - E(X)E(Y)
+        #   and if X is the same as Y, then it's the variance var(X) =
+        #   E(X.^2)-E(X).^2
+        # and as cov(X,Y) = cov(Y,X), covMx is symmetric
+
+        # covariance matrix elements:
+        covMx[(i, 0, 0)] = RRoverlapconv(bigG, context.lum_pyr[(i, 0)] ** 2)
+        covMx[(i, 0, 0)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 0, 0)]) - DL[i] ** 2 + deltaL2
+        )  # cov(L,L) + deltaL2
+        covMx[(i, 0, 1)] = RRoverlapconv(
+            bigG, context.lum_pyr[(i, 0)] * context.a_pyr[(i, 0)]
+        )
+        covMx[(i, 0, 1)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 0, 1)]) - DL[i] * Da[i]
+        )  # cov(L,a)
+        covMx[(i, 0, 2)] = RRoverlapconv(
+            bigG, context.lum_pyr[(i, 0)] * context.b_pyr[(i, 0)]
+        )
+        covMx[(i, 0, 2)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 0, 2)]) - DL[i] * Db[i]
+        )  # cov(L,b)
+        covMx[(i, 1, 1)] = RRoverlapconv(bigG, context.a_pyr[(i, 0)] ** 2)
+        covMx[(i, 1, 1)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 1, 1)]) - Da[i] ** 2 + deltaa2
+        )  # cov(a,a) + deltaa2
+        covMx[(i, 1, 2)] = RRoverlapconv(
+            bigG, context.a_pyr[(i, 0)] * context.b_pyr[(i, 0)]
+        )
+        covMx[(i, 1, 2)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 1, 2)]) - Da[i] * Db[i]
+        )  # cov(a,b)
+        covMx[(i, 2, 2)] = RRoverlapconv(bigG, context.b_pyr[(i, 0)] ** 2)
+        covMx[(i, 2, 2)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 2, 2)]) - Db[i] ** 2 + deltab2
+        )
+        # cov(b,b) + deltab2
+
+        # Get the determinant of covariance matrix
+        # which is the "volume" of the covariance ellipsoid
+        detIm = (
+                covMx[(i, 0, 0)]
+                * (
+                        covMx[(i, 1, 1)] * covMx[(i, 2, 2)]
+                        - covMx[(i, 1, 2)] * covMx[(i, 1, 2)]
+                )
+                - covMx[(i, 0, 1)]
+                * (
+                        covMx[(i, 0, 1)] * covMx[(i, 2, 2)]
+                        - covMx[(i, 1, 2)] * covMx[(i, 0, 2)]
+                )
+                + covMx[(i, 0, 2)]
+                * (
+                        covMx[(i, 0, 1)] * covMx[(i, 1, 2)]
+                        - covMx[(i, 1, 1)] * covMx[(i, 0, 2)]
+                )
+        )
 
-        return color_clutter_map
+        # Take the square root considering variance is squared, and the cube
+        # root, since this is the volume and the contrast measure is a "length"
+        return np.sqrt(detIm) ** (1 / 3)
 
     @classmethod
-    def _contrast_clutter(cls) -> np.ndarray:
+    def _contrast_clutter_level(cls, context: PyramidContext, scale: int) -> np.ndarray:
         """
-        Computes the contrast clutter map of an image.
+        Computes the contrast clutter map of an image at a scale.
+
+        Args:
+            context: the pyramids of the image
+            scale: the scale (pyramid level)
 
-         Returns:
+        Returns:
             Results
-            - contrast_clutter_map (ndarray): an array of the same size as inputImage
+            - contrast clutter map (ndarray): an array of the size of the pyramid level
         """
         # Compute a form of "contrast-energy" by filtering the luminance
         # channel L by a center-surround filter and squaring (or taking the absolute
         # values of) the filter outputs. The center-surround filter is a DoG1 filter
         # with std '_CONTRAST_FILT_SIGMA'.
-        contrast = RRcontrast1channel(cls._lum_pyr, 1)
-
-        # Initiate clutter_map and clutter_levels
-        contrast_clutter_levels = [0] * cls._LEVELS
+        contrast = RRcontrast1level(context.lum_pyr[(scale, 0)], 1)
 
         # Get a Gaussian filter for computing the variance of contrast.
         # Since we used a Gaussian pyramid to find contrast features, these filters
         # have the same size regardless of the scale of processing.
         bigG = RRgaussfilter1D(round(6), 3)
 
-        for scale in range(0, cls._LEVELS):
-            # var(X) = E(X.^2) - E(X).^2
-            # Get E(X) by filtering X with a one-dimensional Gaussian window separably in x and y directions
-            meanD = RRoverlapconv(bigG, contrast[scale])
-            meanD = RRoverlapconv(bigG.T, meanD)
-
-            # Get E(X.^2) by filtering X.^2 with a one-dimensional Gaussian window separably in x and y directions
-            meanD2 = RRoverlapconv(bigG, contrast[scale] ** 2)
-            meanD2 = RRoverlapconv(bigG.T, meanD2)
+        # var(X) = E(X.^2) - E(X).^2
+        # Get E(X) by filtering X with a one-dimensional Gaussian window separably in x and y directions
+        meanD = RRoverlapconv(bigG, contrast)
+        meanD = RRoverlapconv(bigG.T, meanD)
 
-            # Get variance by var(X) = E(X.^2) - E(X).^2
-            stddevD = np.sqrt(abs(meanD2 - meanD ** 2))
-            contrast_clutter_levels[scale] = stddevD
+        # Get E(X.^2) by filtering X.^2 with a one-dimensional Gaussian window separably in x and y directions
+        meanD2 = RRoverlapconv(bigG, contrast ** 2)
+        meanD2 = RRoverlapconv(bigG.T, meanD2)
 
-        contrast_clutter_map = cls._collapse(contrast_clutter_levels)
-
-        return contrast_clutter_map
+        # Get variance by var(X) = E(X.^2) - E(X).^2
+        stddevD = np.sqrt(abs(meanD2 - meanD ** 2))
+        return stddevD
 
     @classmethod
-    def _rr_orientation_opp_energy(cls) -> list:
+    def _rr_orientation_opp_energy(cls, context: PyramidContext, scale: int) -> tuple:
         """
         OPP_ENERGY: This runs the oriented opponent energy calculation that
         serves as the first stages in Bergen & Landy's (1990) texture segmentor,
         except it uses DOOG filters (which actually don't work as well, but at
-        least we can more easily control the scale).
+        least we can more easily control the scale). At a single scale.
         """
-        hvdd: list = [0] * cls._LEVELS
-        hv: list = [0] * cls._LEVELS
-        dd: list = [0] * cls._LEVELS
-        out: list = [0] * cls._LEVELS
-        total: list = [0] * cls._LEVELS
-
-        for scale in range(0, cls._LEVELS):
-            # Check this is the right order for Landy/Bergen. RRR
-            hvdd[scale] = orient_filtnew(
-                cls._lum_pyr[(scale, 0)], cls._OPP_ENERGY_FILTER_SCALE
-            )
+        # Check this is the right order for Landy/Bergen. RRR
+        hvdd = orient_filtnew(
+            context.lum_pyr[(scale, 0)], cls._OPP_ENERGY_FILTER_SCALE
+        )
 
-            # Filter with 4 oriented filters 0, 45, 90, 135. Was sigma = 16/14, orient_filtnew,
-            # then 16/14*1.75 to match contrast and other scales.
-            # Eventually make this sigma a variable that's passed to this routine.
-            # hvdd[scale] is the 4 output images concatenated together,
-            # in the order horizontal, vertical, up-left, and down-right.
-            hvdd[scale] = [x ** 2 for x in hvdd[scale]]  # local energy
-            hvdd[scale] = poolnew(
-                hvdd[scale], cls._OPP_ENERGY_POOL_SCALE
-            )  # Pools with a gaussian filter. Was effectively sigma=1, then 1.75 to match 1.75 above.
-
-            # RRR Should look at these results and see if this is the right amount of pooling for the new filters.
-            hv[scale] = HV(hvdd[scale])  # get the difference image between horizontal and vertical: H-V (0-90)
-            dd[scale] = DD(hvdd[scale])  # get the difference image between right and left: R-L (45-135)
-
-            # Normalize by the total response at this scale, assuming the total
-            # response is high enough. If it's too low, we'll never see this
-            # orientation. I'm not sure what to do here -- set it to zeros and
-            # it's like that's the orientation. Maybe output the total response
-            # and decide what to do later. RRR
-            total[scale] = (
-                    sumorients(hvdd[scale]) + cls._OPP_ENERGY_NOISE
-            )  # add noise based upon sumorients at visibility threshold
-            hv[scale] = (hv[scale] / total[scale])  # normalize the hv and dd image
-            dd[scale] = dd[scale] / total[scale]
-            out[scale] = (
-                hv[scale],
-                dd[scale],
-            )  # out is the 2 output images concatenated together, in the order of hv, dd
-
-        return out
+        # Filter with 4 oriented filters 0, 45, 90, 135. Was sigma = 16/14, orient_filtnew,
+        # then 16/14*1.75 to match contrast and other scales.
+        # Eventually make this sigma a variable that's passed to this routine.
+        # hvdd is the 4 output images concatenated together,
+        # in the order horizontal, vertical, up-left, and down-right.
+        hvdd = [x ** 2 for x in hvdd]  # local energy
+        hvdd = poolnew(
+            hvdd, cls._OPP_ENERGY_POOL_SCALE
+        )  # Pools with a gaussian filter. Was effectively sigma=1, then 1.75 to match 1.75 above.
+
+        # RRR Should look at these results and see if this is the right amount of pooling for the new filters.
+        hv = HV(hvdd)  # get the difference image between horizontal and vertical: H-V (0-90)
+        dd = DD(hvdd)  # get the difference image between right and left: R-L (45-135)
+
+        # Normalize by the total response at this scale, assuming the total
+        # response is high enough. If it's too low, we'll never see this
+        # orientation. I'm not sure what to do here -- set it to zeros and
+        # it's like that's the orientation. Maybe output the total response
+        # and decide what to do later. RRR
+        total = (
+                sumorients(hvdd) + cls._OPP_ENERGY_NOISE
+        )  # add noise based upon sumorients at visibility threshold
+        hv = (hv / total)  # normalize the hv and dd image
+        dd = dd / total
+
+        # out is the 2 output images concatenated together, in the order of hv, dd
+        return hv, dd
 
     @classmethod
-    def _orientation_clutter(cls) -> np.ndarray:
+    def _orientation_clutter_level(cls, context: PyramidContext, i: int) -> np.ndarray:
         """
-        Compute the orientation clutter map of an image.
+        Compute the orientation clutter map of an image at a scale.
 
         Orientation clutter is computed as the "volume" of an orientation distribution
         ellipsoid, which is the determinant of covariance matrix. Treats cos(2 theta)
@@ -353,16 +418,20 @@ class Metric(MetricInterface):
         This currently seems far too dependent on luminance contrast. Check into
         why this is so -- I thought we were normalizing by local contrast.
 
+        Args:
+            context: the pyramids of the image
+            i: the scale (pyramid level)
+
         Returns:
             Results
-            - orientation_clutter_map (ndarray): an array of the same size as inputImage
+            - orientation clutter map (ndarray): an array of the size of the pyramid level
         """
         Dc: list = [0] * cls._LEVELS  # mean "cos 2 theta" at distractor scale
         Ds: list = [0] * cls._LEVELS  # mean "sin 2 theta" at distractor scale
 
         # Get approximations to cos(2theta) and sin(2theta) from oriented opponent
-        # energy, at each of the numlevels of the pyramid
-        angles = cls._rr_orientation_opp_energy()
+        # energy, at this level of the pyramid
+        angles = cls._rr_orientation_opp_energy(context, i)
 
         # Compute the two-vector [meancos, meansin] at each scale, as well as the
         # things we need to compute the mean and covariance of this two-vector at
@@ -370,54 +439,48 @@ class Metric(MetricInterface):
         bigG = RRgaussfilter1D(round(8 * cls._ORIENTATION_POOL_SIGMA), 4 * cls._ORIENTATION_POOL_SIGMA)
 
         covMx: Dict = {}
-        orientation_clutter_levels = [0] * cls._LEVELS
-
-        for i in range(0, cls._LEVELS):
-            cmx = angles[i][0]
-            smx = angles[i][1]
-
-            # Pool to get means at distractor scale. In pooling, don't pool
-            # over the target region (implement this by pooling with a big
-            # Gaussian, then subtracting the pooling over the target region
-            # computed above. Note, however, that we first need to scale the
-            # target region pooling so that its peak is the same height as
-            # this much broader Gaussian used to pool over the distractor
-            # region.
-            Dc[i] = RRoverlapconv(bigG, cmx)
-            Dc[i] = RRoverlapconv(bigG.T, Dc[i])
-            Ds[i] = RRoverlapconv(bigG, smx)
-            Ds[i] = RRoverlapconv(bigG.T, Ds[i])
-
-            # Covariance matrix elements. Compare with computations in
-            # RRStatisticalSaliency. I tried to match computeColorClutter, but I
-            # don't remember the meaning of some of the terms I removed.  XXX
-            covMx[(i, 0, 0)] = RRoverlapconv(bigG, cmx ** 2)
-            covMx[(i, 0, 0)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 0, 0)])
-                    - Dc[i] ** 2
-                    + cls._ORIENTATION_NOISE
-            )
-            covMx[(i, 0, 1)] = RRoverlapconv(bigG, cmx * smx)
-            covMx[(i, 0, 1)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 0, 1)]) - Dc[i] * Ds[i]
-            )
-            covMx[(i, 1, 1)] = RRoverlapconv(bigG, smx ** 2)
-            covMx[(i, 1, 1)] = (
-                    RRoverlapconv(bigG.T, covMx[(i, 1, 1)])
-                    - Ds[i] ** 2
-                    + cls._ORIENTATION_NOISE
-            )
 
-            # Get determinant of covariance matrix, which is the volume of the
-            # covariance ellipse
-            detIm = covMx[(i, 0, 0)] * covMx[(i, 1, 1)] - covMx[(i, 0, 1)] ** 2
-            # Take the square root considering variance is squared, and the square
-            # root again, since this is the area and the contrast measure is a "length"
-            orientation_clutter_levels[i] = detIm ** (1 / 4)
+        cmx = angles[0]
+        smx = angles[1]
+
+        # Pool to get means at distractor scale. In pooling, don't pool
+        # over the target region (implement this by pooling with a big
+        # Gaussian, then subtracting the pooling over the target region
+        # computed above. Note, however, that we first need to scale the
+        # target region pooling so that its peak is the same height as
+        # this much broader Gaussian used to pool over the distractor
+        # region.
+        Dc[i] = RRoverlapconv(bigG, cmx)
+        Dc[i] = RRoverlapconv(bigG.T, Dc[i])
+        Ds[i] = RRoverlapconv(bigG, smx)
+        Ds[i] = RRoverlapconv(bigG.T, Ds[i])
+
+        # Covariance matrix elements. Compare with computations in
+        # RRStatisticalSaliency. I tried to match computeColorClutter, but I
+        # don't remember the meaning of some of the terms I removed.  XXX
+        covMx[(i, 0, 0)] = RRoverlapconv(bigG, cmx ** 2)
+        covMx[(i, 0, 0)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 0, 0)])
+                - Dc[i] ** 2
+                + cls._ORIENTATION_NOISE
+        )
+        covMx[(i, 0, 1)] = RRoverlapconv(bigG, cmx * smx)
+        covMx[(i, 0, 1)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 0, 1)]) - Dc[i] * Ds[i]
+        )
+        covMx[(i, 1, 1)] = RRoverlapconv(bigG, smx ** 2)
+        covMx[(i, 1, 1)] = (
+                RRoverlapconv(bigG.T, covMx[(i, 1, 1)])
+                - Ds[i] ** 2
+                + cls._ORIENTATION_NOISE
+        )
 
-        # Compute orientation clutter map
-        orientation_clutter_map = cls._collapse(orientation_clutter_levels)
-        return orientation_clutter_map
+        # Get determinant of covariance matrix, which is the volume of the
+        # covariance ellipse
+        detIm = covMx[(i, 0, 0)] * covMx[(i, 1, 1)] - covMx[(i, 0, 1)] ** 2
+        # Take the square root considering variance is squared, and the square
+        # root again, since this is the area and the contrast measure is a "length"
+        return detIm ** (1 / 4)
 
     @classmethod
     def execute(
@@ -430,28 +493,39 @@ class Metric(MetricInterface):
             jpeg_image: Optional[BytesIO] = None,
             segments: Optional[Dict[str, Any]] = None,
             dom_analysis_result: Optional[Dict[str, Any]] = None,
+            lab_pyramid: Optional[LabPyramid] = None,
     ) -> Optional[List[Union[int, str, float, Image.Image]]]:
 
-        # Split CIELab color space image to the luminance (lum) and chrominance (a,b) channels
-        lum: np.ndarray = lab_image[:, :, 0]
-        a: np.ndarray = lab_image[:, :, 1]
-        b: np.ndarray = lab_image[:, :, 2]
-
-        # Get Gaussian pyramids (one for each of L,a,b)
-        pyr = pyramids.GaussianPyramid(lum, height=cls._LEVELS)
-        cls._lum_pyr = pyr.pyr_coeffs
-        pyr = pyramids.GaussianPyramid(a, height=cls._LEVELS)
-        cls._a_pyr = pyr.pyr_coeffs
-        pyr = pyramids.GaussianPyramid(b, height=cls._LEVELS)
-        cls._b_pyr = pyr.pyr_coeffs
-
-        # Compute the clutters: color, contrast, and orientation
-        color_clutter_map: np.ndarray = cls._color_clutter()
-        print("color clutter map completed")
-        orientation_clutter_map: np.ndarray = cls._orientation_clutter()
-        print("orientation clutter map completed")
-        contrast_clutter_map: np.ndarray = cls._contrast_clutter()
-        print("contrast clutter map completed")
+        # Get Gaussian pyramids (one for each of the luminance L and the chrominance a,b channels), from the shared
+        # Lab pyramid if given, otherwise from the CIELab image, kept for this evaluation only
+        if lab_pyramid is not None:
+            context = PyramidContext.from_lab_pyramid(lab_pyramid, cls._LEVELS)
+        else:
+            context = PyramidContext.from_lab_image(lab_image, cls._LEVELS)
+
+        # Compute the clutters: color, orientation, and contrast, each feature at each scale being an independent work
+        # item (the filters release the GIL), then collapse the scales of each feature in a fixed order
+        features = {
+            "color": cls._color_clutter_level,
+            "orientation": cls._orientation_clutter_level,
+            "contrast": cls._contrast_clutter_level,
+        }
+        work_items = [(feature, scale) for feature in features for scale in range(cls._LEVELS)]
+        executor = get_clutter_executor(len(work_items))
+        levels = (executor.map if executor is not None else map)(
+            lambda item: features[item[0]](context, item[1]), work_items
+        )
+        clutter_levels: Dict[str, List[np.ndarray]] = {feature: [] for feature in features}
+        for (feature, _), level in zip(work_items, levels):
+            clutter_levels[feature].append(level)
+
+        clutter_maps: Dict[str, np.ndarray] = {}
+        for feature in features:
+            clutter_maps[feature] = cls._collapse(clutter_levels[feature])
+            print(f"{feature} clutter map completed")
+        color_clutter_map: np.ndarray = clutter_maps["color"]
+        orientation_clutter_map: np.ndarray = clutter_maps["orientation"]
+        contrast_clutter_map: np.ndarray = clutter_maps["contrast"]
 
         # Compute the feature congestion measure of visual clutter
         # Combine color, contrast, and orientation clutters
@@ -481,3 +555,19 @@ class Metric(MetricInterface):
             clutter_scalar_fc,
             buf,
         ]
+
+    @classmethod
+    def execute_fast(
+            cls,
+            profile: FastProfile,
+            lab_image: Optional[np.ndarray] = None,
+            lab_pyramid: Optional[LabPyramid] = None,
+            **kwargs
+    ) -> Optional[List[Union[int, str, float, Image.Image]]]:
+        """
+        Execute the metric with the fast evaluation profile, on the downscaled image. The whole downscaled image is
+        evaluated (never a sample of its tiles), as the clutter map of the image is one of the results.
+        """
+        if lab_image is None:
+            lab_image = lab_pyramid.lab_image
+        return evaluate_fast(lambda image: cls.execute(lab_image=image), lab_image, profile, sample=False)
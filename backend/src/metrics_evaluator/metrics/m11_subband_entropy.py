@@ -31,9 +31,10 @@ import numpy as np
 from PIL import Image
 
 from metrics_evaluator.metrics.metric_interface import MetricInterface
-from commons.visual_clutter_utils import entropy
+from commons.approximation import FastProfile, evaluate_fast
+from commons.lab_pyramid import LAB_CHANNELS, LabPyramid
+from commons.visual_clutter_utils import SteerableFreqBasis, band_entropies, centered_dft
 from pydantic import HttpUrl
-from pyrtools import pyramids
 
 
 class Metric(MetricInterface):
@@ -42,6 +43,10 @@ class Metric(MetricInterface):
         which is based on the MATLAB implementation by Rosenholtz et al, available at: http://hdl.handle.net/1721.1/37593
     """
 
+    required_inputs = ("lab_pyramid",)
+    # the fast profile downscales the image rather than its pyramid
+    fast_required_inputs = ("lab_image",)
+
     # private constants
     _SCALES: int = 3  # the number of spatial scales for the subband decomposition
     _WGHT_CHROM: float = 0.0625  # the weight on chrominance
@@ -49,19 +54,12 @@ class Metric(MetricInterface):
     _ZERO_THRESHOLD: float = 0.008  # threshold to consider an array as a zeros array
 
     @classmethod
-    def _band_entropy(cls, image_map):
-        # Decompose the image into subbands
-        SFpyr = pyramids.SteerablePyramidFreq(
-            image_map, height=cls._SCALES, order=cls._ORIENTATION - 1
-        )
-
-        S = SFpyr.pyr_coeffs
-
-        en_band = []
-        for ind in S.keys():
-            en_band.append(entropy(S[ind].ravel()))
+    def _band_entropy(cls, basis: SteerableFreqBasis, image_dft: np.ndarray):
+        # Decompose the image into subbands (steerable frequency pyramid), from its DFT
+        S = basis.decompose(image_dft)
 
-        return en_band
+        # entropies of all the subbands at once
+        return band_entropies(S.values())
 
     @classmethod
     def execute(
@@ -74,23 +72,33 @@ class Metric(MetricInterface):
             jpeg_image: Optional[BytesIO] = None,
             segments: Optional[Dict[str, Any]] = None,
             dom_analysis_result: Optional[Dict[str, Any]] = None,
+            lab_pyramid: Optional[LabPyramid] = None,
     ) -> Optional[List[Union[int, str, float, Image.Image]]]:
 
-        # Split image to the luminance (lum) and chrominance (a,b) channels
-        lum = lab_image[:, :, 0]
-        a = lab_image[:, :, 1]
-        b = lab_image[:, :, 2]
+        # Split image to the luminance (lum) and chrominance (a,b) channels, along with their DFTs, from the shared Lab
+        # pyramid if given
+        if lab_pyramid is not None:
+            channels = [(lab_pyramid.channel(channel), lab_pyramid.dft(channel)) for channel in LAB_CHANNELS]
+        else:
+            channels = [(lab_image[:, :, k], None) for k in range(3)]
+
+        # the Fourier masks of the subbands, the same for the three channels
+        basis = SteerableFreqBasis(channels[0][0].shape, cls._SCALES, cls._ORIENTATION - 1)
 
         # Compute subband entropy for the luminance channel
-        en_band = cls._band_entropy(lum)
+        lum, lum_dft = channels[0]
+        en_band = cls._band_entropy(basis, lum_dft if lum_dft is not None else centered_dft(lum))
         clutter_se = float(np.mean(en_band))
 
         # Compute subband entropy for the chrominance channels
-        for jj in [a, b]:
+        for jj, jj_dft in channels[1:]:
             if np.max(jj) - np.min(jj) < cls._ZERO_THRESHOLD:
-                jj = np.zeros_like(jj)
+                # the DFT of a zeros array
+                jj_dft = np.zeros(jj.shape, dtype=complex)
+            elif jj_dft is None:
+                jj_dft = centered_dft(jj)
 
-            en_band = cls._band_entropy(jj)
+            en_band = cls._band_entropy(basis, jj_dft)
             clutter_se = float(clutter_se + cls._WGHT_CHROM * np.mean(en_band))
 
         clutter_se = clutter_se / (1 + 2 * cls._WGHT_CHROM)
@@ -98,3 +106,18 @@ class Metric(MetricInterface):
         return [
             clutter_se
         ]
+
+    @classmethod
+    def execute_fast(
+            cls,
+            profile: FastProfile,
+            lab_image: Optional[np.ndarray] = None,
+            lab_pyramid: Optional[LabPyramid] = None,
+            **kwargs
+    ) -> Optional[List[Union[int, str, float, Image.Image]]]:
+        """
+        Execute the metric with the fast evaluation profile, on the downscaled image or a sample of its tiles.
+        """
+        if lab_image is None:
+            lab_image = lab_pyramid.lab_image
+        return evaluate_fast(lambda image: cls.execute(lab_image=image), lab_image, profile)
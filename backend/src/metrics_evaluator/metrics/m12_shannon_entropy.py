@@ -20,12 +20,15 @@ from typing import Optional, Dict, Any, Union, List
 import numpy as np
 from PIL import Image
 
+from commons.tiled_image import TiledImage
 from metrics_evaluator.metrics.metric_interface import MetricInterface
 from pydantic import HttpUrl
 from skimage.measure import shannon_entropy
 
 
 class Metric(MetricInterface):
+    required_inputs = ("grayscale_image",)
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -44,5 +47,21 @@ class Metric(MetricInterface):
             entropy
         ]
 
+    def execute_tiles(self, tiles: TiledImage) -> List[float]:
+        """
+        Compute the entropy of a tiled (full-page) image from the gray level histogram, accumulated per tile.
+        """
+        histogram = np.zeros(256, dtype=np.int64)
+        for tile in tiles.iter_tiles():
+            histogram += np.bincount(np.asarray(tile.grayscale_image).ravel(), minlength=256)
+
+        # same as skimage's shannon_entropy: base 2 entropy of the frequencies of the gray levels
+        probabilities = histogram[histogram > 0] / histogram.sum()
+        entropy = float(-np.sum(probabilities * np.log2(probabilities)))
+
+        return [
+            entropy
+        ]
+
 
 
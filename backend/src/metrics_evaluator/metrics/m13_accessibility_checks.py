@@ -23,12 +23,14 @@ import numpy as np
 from PIL import Image
 
 from axe_selenium_python import Axe
-from commons.create_webdriver import create_webdriver
+from commons.browser_pool import get_browser_pool
 from metrics_evaluator.metrics.metric_interface import MetricInterface
 from pydantic import HttpUrl
 
 
 class Metric(MetricInterface):
+    required_inputs = ("image_url", "accessibility_results")
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -39,14 +41,18 @@ class Metric(MetricInterface):
             jpeg_image: Optional[BytesIO] = None,
             segments: Optional[Dict[str, Any]] = None,
             dom_analysis_result: Optional[Dict[str, Any]] = None,
+            accessibility_results: Optional[Dict[str, Any]] = None,
     ) -> Optional[List[Union[int, str, float, Image.Image]]]:
-        with create_webdriver('') as driver:
-            driver.get(image_url)
-            axe = Axe(driver)
-            # Inject axe-core javascript into page.
-            axe.inject()
-            # Run axe accessibility checks.
-            results = axe.run()
+        # the checks are normally run on the page loaded for the screenshot
+        results = accessibility_results
+        if results is None:
+            with get_browser_pool().lease() as driver:
+                driver.get(image_url)
+                axe = Axe(driver)
+                # Inject axe-core javascript into page.
+                axe.inject()
+                # Run axe accessibility checks.
+                results = axe.run()
 
         return [
             json.dumps(results["violations"]),
@@ -42,6 +42,8 @@ from metrics_evaluator.metrics.metric_interface import MetricInterface
 
 
 class Metric(MetricInterface):
+    required_inputs = ("pil_image",)
+
     # The original model can be downloaded from here: https://github.com/delldu/ImageNima/tree/master/models
     _MODEL_PATH: Path = Path(
         "./metrics_evaluator/dense121_all.pt"
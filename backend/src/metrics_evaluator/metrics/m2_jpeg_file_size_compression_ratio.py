@@ -31,6 +31,8 @@ from pydantic import HttpUrl
 
 
 class Metric(MetricInterface):
+    required_inputs = ("png_image", "jpeg_image")
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
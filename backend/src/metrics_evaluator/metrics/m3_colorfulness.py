@@ -23,11 +23,16 @@ from io import BytesIO
 import numpy as np
 from PIL import Image
 
+from commons.tiled_image import RunningMoments, TiledImage
 from metrics_evaluator.metrics.metric_interface import MetricInterface
 from pydantic import HttpUrl
 
 
 class Metric(MetricInterface):
+    required_inputs = ("pil_image",)
+
+    colorfulness_coefficient = 0.3
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -40,7 +45,7 @@ class Metric(MetricInterface):
             dom_analysis_result: Optional[Dict[str, Any]] = None,
     ) -> Optional[List[Union[int, str, float, Image.Image]]]:
 
-        colorfulness_coefficient = 0.3
+        colorfulness_coefficient = self.colorfulness_coefficient
         np_image_float = np.array(pil_image).astype(float)
 
         # extract RGB channels
@@ -57,6 +62,28 @@ class Metric(MetricInterface):
         rgyb_std: float = float(np.sqrt(np.std(rg) ** 2 + np.std(yb) ** 2))
         colorfulness: float = float(rgyb_std + colorfulness_coefficient * rgyb_avg)
 
+        return [
+            colorfulness
+        ]
+
+    def execute_tiles(self, tiles: TiledImage) -> List[float]:
+        """
+        Compute the colorfulness of a tiled (full-page) image, one tile at a time.
+        """
+        rg_moments = RunningMoments()
+        yb_moments = RunningMoments()
+        for tile in tiles.iter_tiles():
+            np_image_float = tile.array.astype(float)
+            red = np_image_float[:, :, 0]
+            green = np_image_float[:, :, 1]
+            blue = np_image_float[:, :, 2]
+            rg_moments.update(red - green)
+            yb_moments.update(0.5 * (red + green) - blue)
+
+        rgyb_avg: float = float(np.sqrt(rg_moments.mean ** 2 + yb_moments.mean ** 2))
+        rgyb_std: float = float(np.sqrt(rg_moments.std ** 2 + yb_moments.std ** 2))
+        colorfulness: float = float(rgyb_std + self.colorfulness_coefficient * rgyb_avg)
+
         return [
             colorfulness
         ]
\ No newline at end of file
@@ -21,10 +21,13 @@ import numpy as np
 from PIL import Image
 from pydantic import HttpUrl
 
+from commons.tiled_image import RunningMoments, TiledImage
 from metrics_evaluator.metrics.metric_interface import MetricInterface
 
 
 class Metric(MetricInterface):
+    required_inputs = ("lab_image",)
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -57,4 +60,24 @@ class Metric(MetricInterface):
             A_std,
             B_avg,
             B_std,
+        ]
+
+    def execute_tiles(self, tiles: TiledImage) -> List[float]:
+        """
+        Compute the averages and standard deviations of a tiled (full-page) image, one tile at a time.
+        """
+        moments = [RunningMoments(), RunningMoments(), RunningMoments()]
+        for tile in tiles.iter_tiles():
+            lab_image = tile.lab_image
+            for channel, channel_moments in enumerate(moments):
+                channel_moments.update(lab_image[:, :, channel])
+
+        L_moments, A_moments, B_moments = moments
+        return [
+            L_moments.mean,
+            L_moments.std,
+            A_moments.mean,
+            A_moments.std,
+            B_moments.mean,
+            B_moments.std,
         ]
\ No newline at end of file
@@ -30,6 +30,11 @@ from metrics_evaluator.metrics.metric_interface import MetricInterface
 
 
 class Metric(MetricInterface):
+    required_inputs = ("segments",)
+
+    # number of rows of the white space mask processed at once
+    band_height = 1024
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -43,19 +48,26 @@ class Metric(MetricInterface):
     ) -> Optional[List[Union[int, str, float, Image.Image]]]:
 
         if segments is not None:
-            # Create a binary array (default = 1) with the same size of image
             height, width, _ = segments["img_shape"]
             segments: List = segments["segments"]
-            img_binary = np.ones((height, width), dtype=int)
 
-            # Fill the binary array with 0 for the elements
-            for element in segments:
-                position = element["position"]
-                img_binary[position["row_min"]: position["row_max"], position["column_min"]: position["column_max"], ] \
-                    = 0
+            # Mark the pixels covered by the elements, one band of rows at a time, so that the memory usage of the
+            # mask does not grow with the height of (full-page) images
+            covered_pixels = 0
+            for band_top in range(0, height, self.band_height):
+                band_bottom = min(band_top + self.band_height, height)
+                band_covered = np.zeros((band_bottom - band_top, width), dtype=bool)
+                for element in segments:
+                    position = element["position"]
+                    row_min = max(position["row_min"], band_top)
+                    row_max = min(position["row_max"], band_bottom)
+                    if row_min < row_max:
+                        band_covered[row_min - band_top: row_max - band_top,
+                                     position["column_min"]: position["column_max"]] = True
+                covered_pixels += int(np.count_nonzero(band_covered))
 
             # Compute white space (percentage)
-            white_space: float = float(np.mean(img_binary))
+            white_space: float = float((height * width - covered_pixels) / (height * width))
         else:
             raise ValueError("The value of 'segments' cannot be 'None'.")
 
@@ -32,6 +32,8 @@ from metrics_evaluator.metrics.metric_interface import MetricInterface
 
 
 class Metric(MetricInterface):
+    required_inputs = ("segments",)
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -37,6 +37,8 @@ class Metric(MetricInterface):
         Based on Fosco et al.'s implementation available at https://github.com/diviz-mit/predimportance-public
         """
 
+    required_inputs = ("pil_image",)
+
     # Private constants
     _SHAPE_R: int = 240  # input shape (rows) of the model
     _SHAPE_C: int = 320  # input shape (columns) of the model
@@ -23,6 +23,8 @@ from pydantic import HttpUrl
 
 
 class Metric(MetricInterface):
+    required_inputs = ("dom_analysis_result",)
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -38,6 +40,11 @@ class Metric(MetricInterface):
         # reference for the used regex to find all words:
         # https://stackoverflow.com/questions/14138199/python-regex-find-all-words-in-text
 
+        # the DOM model counts the words of the visible text once, when it is built
+        word_count = getattr(dom_analysis_result, 'word_count', None)
+        if word_count is None:
+            word_count = len(re.findall(r'\b\S+\b', dom_analysis_result['text']))
+
         return [
-            len(re.findall(r'\b\S+\b', dom_analysis_result['text']))
+            word_count
         ]
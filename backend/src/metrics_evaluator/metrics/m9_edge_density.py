@@ -23,12 +23,18 @@ from typing import Optional, Dict, Any, Union, List
 from PIL import Image
 import numpy as np
 
+from commons.tiled_image import TiledImage
 from metrics_evaluator.metrics.metric_interface import MetricInterface
 from pydantic import HttpUrl
 from skimage import feature
 
 
 class Metric(MetricInterface):
+    required_inputs = ("grayscale_image",)
+
+    # rows of the neighbouring tiles used to detect the edges along the tile borders
+    tile_overlap = 16
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
@@ -59,5 +65,32 @@ class Metric(MetricInterface):
             buf
         ]
 
+    def execute_tiles(self, tiles: TiledImage) -> List[Union[str, BytesIO]]:
+        """
+        Compute the edge density of a tiled (full-page) image, one tile at a time. Each tile is processed with rows of
+        its neighbours, the edge hysteresis can still differ from a single pass right along the tile borders.
+        """
+        edge_count = 0
+        # 1-bit edge map of the whole page
+        edges_image = Image.new("1", (tiles.width, tiles.height))
+        for tile in tiles.iter_tiles(overlap=self.tile_overlap):
+            edges = feature.canny(
+                np.asarray(tile.grayscale_image), sigma=1.0, low_threshold=0.11, high_threshold=0.37
+            )[tile.core]
+            edge_count += int(np.sum(edges))
+            edges_image.paste(Image.fromarray(edges), (0, tile.top))
+
+        edge_density = edge_count / (tiles.width * tiles.height)
+
+        # convert the PIL edge image to PNG
+        buf = BytesIO()
+
+        edges_image.save(buf, format="PNG")
+
+        return [
+            ("%.5f" % edge_density),
+            buf
+        ]
+
 
 
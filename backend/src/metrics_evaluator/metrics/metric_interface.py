@@ -3,7 +3,7 @@
 
 import abc
 from io import BytesIO
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 from PIL import Image
@@ -11,6 +11,15 @@ from pydantic import HttpUrl
 
 
 class MetricInterface(metaclass=abc.ABCMeta):
+    # Arguments of execute() the metric consumes (e.g. ("lab_image",)): only those are computed and passed to it,
+    # the other arguments are left to None. Among pil_image, image_url, png_image, grayscale_image, jpeg_image,
+    # lab_image, lab_pyramid (see commons/lab_pyramid.py), segments, dom_analysis_result and accessibility_results.
+    # Metrics not declaring their inputs get the image, the URL and the artifacts of their preprocessing flags in
+    # metrics.json.
+    required_inputs: Optional[Tuple[str, ...]] = None
+    # Arguments of execute_fast() (fast evaluation profile, see commons/approximation.py), if they differ
+    fast_required_inputs: Optional[Tuple[str, ...]] = None
+
     @classmethod
     def __subclasshook__(cls, subclass):
         return (
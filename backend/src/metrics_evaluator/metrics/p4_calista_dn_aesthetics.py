@@ -30,6 +30,8 @@ from commons.calista_utils import LRN, rmse, euclidean_distance_loss
 
 
 class Metric(MetricInterface):
+    required_inputs = ("pil_image",)
+
     def execute(
             self,
             pil_image: Optional[Image.Image] = None,
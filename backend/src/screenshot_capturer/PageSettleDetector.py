@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+# network events (from the DevTools performance log) starting and ending a request
+REQUEST_STARTED_EVENTS = {'Network.requestWillBeSent'}
+REQUEST_ENDED_EVENTS = {'Network.loadingFinished', 'Network.loadingFailed'}
+# long-lived connections never finish loading, they do not keep the page from settling
+LONG_LIVED_REQUEST_TYPES = {'WebSocket', 'EventSource'}
+
+# installs a MutationObserver on the first call, and reports the readiness of the page. Lazy images are only loaded
+# once they get near the viewport, the ones outside of it are not waited for
+SETTLE_STATE_SCRIPT = """
+if (!window.__wuiSettle) {
+    window.__wuiSettle = {lastMutation: performance.now()};
+    new MutationObserver(function () {
+        window.__wuiSettle.lastMutation = performance.now();
+    }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+function isInViewport(element) {
+    var rect = element.getBoundingClientRect();
+    return rect.bottom > 0 && rect.right > 0 && rect.top < window.innerHeight && rect.left < window.innerWidth;
+}
+return {
+    readyState: document.readyState,
+    fontsLoaded: !document.fonts || document.fonts.status === 'loaded',
+    imagesLoaded: Array.from(document.images).every(function (img) {
+        return img.complete || (img.loading === 'lazy' && !isInViewport(img));
+    }),
+    quietFor: (performance.now() - window.__wuiSettle.lastMutation) / 1000
+};
+"""
+
+
+class PageSettleDetector:
+    """
+    Waits until a page is settled: loaded, without network requests in flight, without DOM mutations, and with its
+    fonts and images loaded (but the lazy images outside of the viewport), for a quiet window. Gives up once the time
+    budget is spent.
+
+    Network activity is read from the DevTools performance log of the browser, call prepare() right before the
+    navigation to drop the events of the previous pages.
+    """
+
+    def __init__(self, driver, time_budget: float = None, quiet_window: float = None, poll_interval: float = 0.1):
+        self.driver = driver
+        # upper bound of the wait in seconds
+        self.time_budget = time_budget or float(os.environ.get("PAGE_SETTLE_TIMEOUT") or 10)
+        # how long the network and the DOM must stay quiet in seconds
+        self.quiet_window = quiet_window or float(os.environ.get("PAGE_SETTLE_QUIET_WINDOW") or 0.5)
+        self.poll_interval = poll_interval
+        self._pending_requests = set()
+        self._last_network_activity = time.perf_counter()
+
+    def prepare(self):
+        self._read_network_events()
+        self._pending_requests.clear()
+        self._last_network_activity = time.perf_counter()
+
+    def _read_network_events(self):
+        try:
+            entries = self.driver.get_log('performance')
+        except WebDriverException:
+            # performance logging is not enabled, rely on the DOM only
+            return
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method = message.get('method')
+            if method in REQUEST_STARTED_EVENTS:
+                if message['params'].get('type') not in LONG_LIVED_REQUEST_TYPES:
+                    self._pending_requests.add(message['params']['requestId'])
+                    self._last_network_activity = time.perf_counter()
+            elif method in REQUEST_ENDED_EVENTS:
+                self._pending_requests.discard(message['params']['requestId'])
+                self._last_network_activity = time.perf_counter()
+
+    def _is_settled(self) -> bool:
+        try:
+            # polled from the start, so that DOM mutations are observed while the network is still busy
+            state = self.driver.execute_script(SETTLE_STATE_SCRIPT)
+        except WebDriverException:
+            # e.g. the page is being replaced by a redirect
+            return False
+
+        self._read_network_events()
+        network_idle = not self._pending_requests and \
+            time.perf_counter() - self._last_network_activity >= self.quiet_window
+        return network_idle and state['readyState'] == 'complete' and state['fontsLoaded'] and \
+            state['imagesLoaded'] and state['quietFor'] >= self.quiet_window
+
+    def wait(self) -> float:
+        """
+        Wait for the page to settle and return how long it took in seconds (the time budget if it did not settle).
+        """
+        start_time = time.perf_counter()
+        while not self._is_settled():
+            if time.perf_counter() - start_time >= self.time_budget:
+                print(f"Page did not settle within {self.time_budget}s. Proceeding with the actions.")
+                break
+            time.sleep(self.poll_interval)
+        return time.perf_counter() - start_time
@@ -1,58 +1,158 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import base64
 import io
+import math
+import os
 import time
 
-from commons.create_webdriver import create_webdriver
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.support.ui import WebDriverWait
+import numpy as np
+
+from axe_selenium_python import Axe
+from commons.browser_pool import get_browser_pool
+from commons.tiled_image import TiledImage
+from image_preprocessing.InputImage import InputImage
+from screenshot_capturer.PageSettleDetector import PageSettleDetector
 
 from PIL import Image
 
 
+class PageCapture:
+    """
+    Everything captured from a single page load: the screenshot, the rendered (post-JavaScript) HTML and, if
+    requested, the accessibility violations found by axe-core.
+    """
+
+    def __init__(self, image: InputImage, page_source: str, accessibility_results=None, settle_time=None,
+                 tiles: TiledImage = None):
+        # the decoded screenshot along with its PNG encoding
+        self.image = image
+        self.page_source = page_source
+        self.accessibility_results = accessibility_results
+        self.settle_time = settle_time
+        # full-page captures only, the screenshot as vertical tiles
+        self.tiles = tiles
+
+    @property
+    def screenshot(self) -> Image.Image:
+        return self.image.pil_image
+
+
 class ScreenshotCapturer:
-    def __init__(self):
-        self.driver = create_webdriver('ScreenshotCapturer')
+    """
+    Captures screenshots with browsers leased from the browser pool, so that concurrent captures never share a page.
+    """
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.driver.quit()
+        pass
 
-    def capture_screenshot_url(self, url):
-        if not self.driver:
-            raise ValueError("Driver is not initialized.")
+    def capture_page(self, url, accessibility_check=False, full_page=False) -> PageCapture:
+        """
+        Load a page once and capture its screenshot, its rendered HTML and optionally its accessibility violations.
 
+        Args:
+            url: the URL of the page, file:// URLs for local HTML files
+            accessibility_check: whether to run the axe-core accessibility checks on the page
+            full_page: whether to capture the whole page (as vertical tiles) rather than the viewport
+        """
         if not url:
             raise ValueError("No URL provided.")
 
-        self.driver.get(url)
-        try:
-            # Wait for the document.readyState to be complete
-            WebDriverWait(self.driver, 5).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-            # wait 5 seconds for dynamic page content to load
-            time.sleep(5)
-        except TimeoutException:
-            # If the complete state is not reached within 5 seconds, this block is executed
-            print("Timed out waiting for page to load completely. Proceeding with the actions.")
-
-        screenshot_as_png = self.driver.get_screenshot_as_png()
-        image = Image.open(io.BytesIO(screenshot_as_png)).convert("RGB")
-        return image
+        tiles = None
+        with get_browser_pool().lease('ScreenshotCapturer') as driver:
+            settle_time = self._navigate(driver, url)
+            if full_page:
+                tiles = self._capture_tiles(driver)
+            else:
+                screenshot_as_png = driver.get_screenshot_as_png()
+            # read before axe-core is injected into the page
+            page_source = driver.page_source
+            accessibility_results = self._run_accessibility_checks(driver) if accessibility_check else None
+
+        if tiles is not None:
+            print(f"Page {url} settled in {settle_time:.2f}s")
+            # hashed, encoded and shared with the workers tile by tile, the settle time being kept by the capture
+            image = InputImage.from_tiles(tiles)
+        else:
+            image = self._to_image(screenshot_as_png, url, settle_time)
+
+        return PageCapture(
+            image=image,
+            page_source=page_source,
+            accessibility_results=accessibility_results,
+            settle_time=settle_time,
+            tiles=tiles
+        )
+
+    @staticmethod
+    def _capture_tiles(driver) -> TiledImage:
+        """
+        Capture the whole page as vertical tiles through the DevTools protocol, one tile at a time.
+        """
+        tile_height = int(os.environ.get("FULL_PAGE_TILE_HEIGHT") or 1200)
+        max_height = int(os.environ.get("FULL_PAGE_MAX_HEIGHT") or 20000)
+
+        layout_metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+        content_size = layout_metrics.get('cssContentSize') or layout_metrics['contentSize']
+        width = int(layout_metrics['cssLayoutViewport']['clientWidth'])
+        height = min(int(math.ceil(content_size['height'])), max_height)
+
+        def capture_tile(top):
+            clip_height = min(tile_height, height - top)
+            screenshot = driver.execute_cdp_cmd('Page.captureScreenshot', {
+                'format': 'png',
+                'captureBeyondViewport': True,
+                'clip': {'x': 0, 'y': top, 'width': width, 'height': clip_height, 'scale': 1}
+            })
+            tile = Image.open(io.BytesIO(base64.b64decode(screenshot['data']))).convert("RGB")
+            if tile.size != (width, clip_height):  # e.g. with a device pixel ratio other than 1
+                tile = tile.resize((width, clip_height))
+            return np.asarray(tile)
+
+        return TiledImage.create(capture_tile(top) for top in range(0, height, tile_height))
+
+    def check_accessibility(self, url):
+        """
+        Load a page and run the axe-core accessibility checks on it, without capturing it (e.g. when the checks were
+        not run along with the screenshot).
+
+        Args:
+            url: the URL of the page, file:// URLs for local HTML files
+        """
+        if not url:
+            raise ValueError("No URL provided.")
+
+        with get_browser_pool().lease('ScreenshotCapturer') as driver:
+            settle_time = self._navigate(driver, url)
+            print(f"Page {url} settled in {settle_time:.2f}s")
+            return self._run_accessibility_checks(driver)
+
+    @staticmethod
+    def _run_accessibility_checks(driver):
+        axe = Axe(driver)
+        axe.inject()
+        return axe.run()
+
+    @staticmethod
+    def _navigate(driver, url) -> float:
+        # wait for the page (and its dynamic content) to settle rather than for a fixed time
+        page_settle_detector = PageSettleDetector(driver)
+        page_settle_detector.prepare()
+        start_time = time.perf_counter()
+        driver.get(url)
+        page_settle_detector.wait()
+        return time.perf_counter() - start_time
 
-    def capture_screenshot_html(self, html_path):
-        if not self.driver:
-            raise ValueError("Driver is not initialized.")
-        if not html_path:
-            raise ValueError("No HTML path provided.")
-        self.driver.get(f'file://{html_path}')
-        # Wait for the page to fully load
-        self.driver.implicitly_wait(5)
-        screenshot_as_png = self.driver.get_screenshot_as_png()
-        image = Image.open(io.BytesIO(screenshot_as_png)).convert("RGB")
+    @staticmethod
+    def _to_image(screenshot_as_png, page, settle_time) -> InputImage:
+        print(f"Page {page} settled in {settle_time:.2f}s")
+        # the PNG screenshot is decoded once, and kept as the PNG encoding of the input if it can be
+        image = InputImage.from_bytes(screenshot_as_png)
+        # keep the settle time with the screenshot, e.g. for performance tests
+        image.pil_image.info['settle_time'] = settle_time
         return image
 
@@ -1,22 +1,29 @@
 from enum import Enum
 from io import BytesIO
-from typing import List, Optional, Dict, Union
+from typing import Any, List, Optional, Dict, Union, Literal
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from image_preprocessing.ImagePreprocessing import ImagePreprocessing
+from image_preprocessing.InputImage import InputImage
 from screenshot_capturer.ScreenshotCapturer import ScreenshotCapturer
 from metrics_evaluator.MetricsDependencyManager import MetricsDependencyManager
+from metrics_evaluator.WorkerPool import get_worker_pool, shutdown_worker_pool
+from metrics_evaluator.EvaluationProgress import get_evaluation_progress
+from commons.stage_executors import run_in_stage, shutdown_stage_executors
+from commons.browser_pool import get_browser_pool, shutdown_browser_pool
 import db_client
 from email_utils import send_email, create_email_content
 from metric_extension_utils import process_approved_metric
 
+import asyncio
 import os
 import json
 import tempfile
+import time
+import uuid
 import zipfile
 
-from PIL import Image
 from dotenv import load_dotenv
 
 # load env
@@ -27,7 +34,6 @@ METRICS_DIR: str = "metrics_evaluator/metrics"
 METRICS_FILE_PATTERN: str = "*_*.py"
 
 app = FastAPI()
-imagePreprocessing = ImagePreprocessing()
 capturer = ScreenshotCapturer()
 
 available_metrics = {}
@@ -77,6 +83,7 @@ class Preprocessing(BaseModel):
     segmentation_required: bool
     dom_analysis_required: bool
     lab_conversion_required: bool
+    accessibility_check_required: bool = False
 
 
 class Metric(BaseModel):
@@ -95,6 +102,10 @@ class Metrics(BaseModel):
 class UrlInput(BaseModel):
     url: str
     metrics: List[str]
+    # capture the whole page rather than the 1200x1200 viewport
+    full_page: bool = False
+    # "fast" approximates the clutter metrics (m10, m11) on a downscaled image, see commons/approximation.py
+    profile: Literal["exact", "fast"] = "exact"
 
 
 class FileInput(BaseModel):
@@ -104,6 +115,7 @@ class FileInput(BaseModel):
 
 class MetricKeys(BaseModel):
     metrics: List[str]
+    profile: Literal["exact", "fast"] = "exact"
 
 
 # Load metrics.json
@@ -114,12 +126,31 @@ with open('../metrics.json', 'r') as metrics_json:
 @app.on_event("startup")
 async def check_approved_metrics():
     config_data = {}
-    approved_metrics = db_client.get_approved_metrics()
+    approved_metrics = await run_in_stage("storage", db_client.get_approved_metrics)
     for metric in approved_metrics:
         config_data.update(await process_approved_metric(metric))
     available_metrics["metrics"].update(config_data)
 
 
+@app.on_event("startup")
+async def start_worker_pool():
+    # spawn the metric workers once approved metric extensions are in place, so that they get preloaded as well
+    get_worker_pool()
+
+
+@app.on_event("startup")
+async def start_browser_pool():
+    # start the browsers after the metric workers were forked, so that they are not inherited by the workers
+    await run_in_stage("capture", get_browser_pool().start)
+
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    shutdown_worker_pool()
+    shutdown_stage_executors()
+    shutdown_browser_pool()
+
+
 # retrieve all available metrics
 @app.get('/api/metrics', summary="List all available metrics",
          description="Retrieve a list of all available metrics with their details.")
@@ -144,18 +175,149 @@ class EvaluateInputReturnType(BaseModel):
     wui_type: str
 
 
+class PreparedInput:
+    """
+    A WUI input ready to be evaluated: its screenshot as well as its HTML content, if any. Rendered inputs also keep
+    the rendered HTML and the accessibility check results captured along with the screenshot.
+    """
+
+    def __init__(self, wui_type: str, image: InputImage, html_content=None, html_file=None,
+                 page_source=None, accessibility_results=None, tiles=None):
+        self.wui_type = wui_type
+        self.image = image
+        self.html_content = html_content
+        self.html_file = html_file
+        self.page_source = page_source
+        self.accessibility_results = accessibility_results
+        self.tiles = tiles
+
+
+def is_accessibility_check_required(metrics_to_evaluate: List[str]) -> bool:
+    # the accessibility checks are run on the page loaded for the screenshot, only if a metric needs them
+    return any(
+        available_metrics["metrics"].get(metric, {}).get("preprocessing", {}).get("accessibility_check_required")
+        for metric in metrics_to_evaluate
+    )
+
+
+def get_file_input_type(content_type: str) -> str:
+    if content_type == 'application/zip':
+        return "zip"
+    elif content_type == 'text/html':
+        return "html"
+    return "png"
+
+
+def get_file_input_stage(content_type: str) -> str:
+    # HTML inputs are rendered by the browser, PNG inputs only need to be decoded
+    return "decoding" if get_file_input_type(content_type) == "png" else "capture"
+
+
+def prepare_url_input(url: str, metrics_to_evaluate: List[str], full_page: bool = False) -> PreparedInput:
+    page_capture = capturer.capture_page(
+        url=url, accessibility_check=is_accessibility_check_required(metrics_to_evaluate), full_page=full_page
+    )
+    return PreparedInput(
+        wui_type="url",
+        image=page_capture.image,
+        page_source=page_capture.page_source,
+        accessibility_results=page_capture.accessibility_results,
+        tiles=page_capture.tiles
+    )
+
+
+def prepare_file_input(filename: str, content_type: str, file_content: bytes,
+                       metrics_to_evaluate: List[str]) -> PreparedInput:
+    wui_type = get_file_input_type(content_type)
+    if wui_type == "zip":
+        # Create a temporary directory to extract the zip file
+        temp_dir = f"/tmp/{filename}"
+        os.makedirs(temp_dir, exist_ok=True)
+
+        # Extract the zip file
+        with zipfile.ZipFile(BytesIO(file_content), 'r') as zip_ref:
+            zip_ref.extractall(temp_dir)
+
+        # Identify the index.html file
+        index_html_path = os.path.join(temp_dir, 'index.html')
+        if not os.path.exists(index_html_path):
+            raise HTTPException(status_code=400, detail="index.html not found in the ZIP file")
+
+        # Read the HTML content
+        with open(index_html_path, 'r') as f:
+            html_content = f.read()
+        with open(index_html_path, 'rb') as f:
+            html_bytes = f.read()
+
+        # Render the HTML content and capture a screenshot
+        page_capture = capturer.capture_page(
+            url=f'file://{index_html_path}', accessibility_check=is_accessibility_check_required(metrics_to_evaluate)
+        )
+        return PreparedInput(
+            wui_type, page_capture.image, html_content, BytesIO(html_bytes),
+            accessibility_results=page_capture.accessibility_results
+        )
+
+    elif wui_type == "html":  # require screenshot to be captured
+        # Create a temporary file to save the HTML content
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp:
+            tmp.write(file_content)
+            tmp_html_path = tmp.name
+
+        page_capture = capturer.capture_page(
+            url=f'file://{tmp_html_path}', accessibility_check=is_accessibility_check_required(metrics_to_evaluate)
+        )
+        return PreparedInput(
+            wui_type, page_capture.image, file_content, BytesIO(file_content),
+            accessibility_results=page_capture.accessibility_results
+        )
+
+    else:  # input is PNG
+        # decoded once, the uploaded file being kept as the PNG encoding of the input if it is a 24-bit RGB PNG
+        return PreparedInput(wui_type, InputImage.from_bytes(file_content))
+
+
+def upload_prepared_input(prepared_input: PreparedInput):
+    """
+    Upload the screenshot (and HTML file) of an input and retrieve their public URLs.
+    """
+    screenshot_url = db_client.upload_file(file=prepared_input.image.png_image, file_extension=".png")
+    html_url = None
+    if prepared_input.html_file is not None:
+        html_url = db_client.upload_file(
+            file=prepared_input.html_file, file_extension=".html", content_type='text/html'
+        )
+    return screenshot_url, html_url
+
+
+def create_metrics_dependency_manager(wui_id: str, prepared_input: PreparedInput, metrics_to_evaluate: List[str],
+                                      url: Optional[str], metrics, profile: str = "exact") -> MetricsDependencyManager:
+    return MetricsDependencyManager(
+        wui_id=wui_id,
+        input_image=prepared_input.image,
+        metrics_to_evaluate=metrics_to_evaluate,
+        url=url,
+        html_content=prepared_input.html_content,
+        available_metrics=metrics,
+        page_source=prepared_input.page_source,
+        accessibility_results=prepared_input.accessibility_results,
+        tiles=prepared_input.tiles,
+        profile=profile
+    )
+
+
 @app.post('/api/evaluate_url_input', summary="Evaluate WUI (URL string)", description="Evaluate WUI in a form of file (binary data). Accepts text/html or image/png")
 async def evaluate_url_input(url_input: UrlInput, background_tasks: BackgroundTasks) -> EvaluateInputReturnType:
-    with capturer.capture_screenshot_url(url=url_input.url) as screenshot_image:
-        png_image = imagePreprocessing.convert_pil_image_to_png(image=screenshot_image)
-    # upload screenshot image and retrieve its public URL
-    screenshot_url = db_client.upload_file(
-        file=png_image,
-        file_extension=".png"
+    prepared_input = await run_in_stage(
+        "capture", prepare_url_input, url_input.url, url_input.metrics, url_input.full_page
     )
+    # upload screenshot image and retrieve its public URL
+    screenshot_url, _ = await run_in_stage("storage", upload_prepared_input, prepared_input)
 
     # upload file metadata to PostGreSQL DB
-    data = db_client.insert_file_metadata(
+    data = await run_in_stage(
+        "storage",
+        db_client.insert_file_metadata,
         wui_name=url_input.url,
         screenshot_url=screenshot_url,
         html_url=None,
@@ -164,14 +326,13 @@ async def evaluate_url_input(url_input: UrlInput, background_tasks: BackgroundTa
 
     metrics = await get_metrics()
 
-    metricsEvaluatorHandler = MetricsDependencyManager(
+    metricsEvaluatorHandler = create_metrics_dependency_manager(
         wui_id=data['id'],
-        pil_image=screenshot_image,
-        png_image=png_image,
+        prepared_input=prepared_input,
         metrics_to_evaluate=url_input.metrics,
         url=url_input.url,
-        html_content=None,
-        available_metrics=metrics
+        metrics=metrics,
+        profile=url_input.profile
     )
 
     # uncomment for system performance test
@@ -194,142 +355,243 @@ async def evaluate_url_input(url_input: UrlInput, background_tasks: BackgroundTa
 async def evaluate_file_input(background_tasks: BackgroundTasks, file: UploadFile = File(...), metrics: str = Form(...)) -> EvaluateInputReturnType:
     metrics_dict = json.loads(metrics)  # Deserialize JSON string to Python dict
     metrics_data = MetricKeys(**metrics_dict)  # Convert dict to Pydantic model
-    if file.content_type == 'application/zip':
-        wui_type = "zip"
-        # Create a temporary directory to extract the zip file
-        temp_dir = f"/tmp/{file.filename}"
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Extract the zip file
-        with zipfile.ZipFile(BytesIO(await file.read()), 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-
-        # Identify the index.html file
-        index_html_path = os.path.join(temp_dir, 'index.html')
-        if not os.path.exists(index_html_path):
-            raise HTTPException(status_code=400, detail="index.html not found in the ZIP file")
-
-        # Read the HTML content
-        with open(index_html_path, 'r') as f:
-            html_content = f.read()
 
-        # Render the HTML content and capture a screenshot
-        screenshot_image = capturer.capture_screenshot_html(html_path=index_html_path)
-        png_image = imagePreprocessing.convert_pil_image_to_png(image=screenshot_image)
+    prepared_input = await run_in_stage(
+        get_file_input_stage(file.content_type),
+        prepare_file_input,
+        file.filename,
+        file.content_type,
+        await file.read(),
+        metrics_data.metrics
+    )
 
-        # Upload screenshot image and retrieve its public URL
-        image_url = db_client.upload_file(file=png_image, file_extension=".png")
+    # upload screenshot image (and HTML file) and retrieve their public URLs
+    screenshot_url, html_url = await run_in_stage("storage", upload_prepared_input, prepared_input)
 
-        # Upload HTML file and retrieve its public URL
-        with open(index_html_path, 'rb') as f:
-            html_bytes = f.read()
-        html_url = db_client.upload_file(file=BytesIO(html_bytes), file_extension=".html", content_type='text/html')
-
-        # Upload file metadata to PostGreSQL DB
-        data = db_client.insert_file_metadata(
-            wui_name=file.filename,
-            screenshot_url=image_url,
-            html_url=html_url,
-            metrics_to_evaluate=metrics_data.metrics
-        )
-
-        metrics = await get_metrics()
+    # upload file metadata to PostGreSQL DB
+    data = await run_in_stage(
+        "storage",
+        db_client.insert_file_metadata,
+        wui_name=file.filename,
+        screenshot_url=screenshot_url,
+        html_url=html_url,
+        metrics_to_evaluate=metrics_data.metrics
+    )
 
-        metricsEvaluatorHandler = MetricsDependencyManager(
-            wui_id=data['id'],
-            pil_image=screenshot_image,
-            png_image=png_image,
-            metrics_to_evaluate=metrics_data.metrics,
-            url=None,
-            html_content=html_content,
-            available_metrics=metrics
-        )
+    metrics = await get_metrics()
 
-        # Add a background task (evaluating the metrics) to run after the response is sent
-        background_tasks.add_task(
-            metricsEvaluatorHandler.identify_preprocessing_load_metrics_and_evaluate_metrics
-        )
+    metricsEvaluatorHandler = create_metrics_dependency_manager(
+        wui_id=data['id'],
+        prepared_input=prepared_input,
+        metrics_to_evaluate=metrics_data.metrics,
+        url=None,
+        metrics=metrics,
+        profile=metrics_data.profile
+    )
 
-    elif file.content_type == 'text/html':  # require screenshot to be captured
-        wui_type = "html"
-        html_content = await file.read()
+    # Add a background task (evaluating the metrics) to run after the response is sent
+    background_tasks.add_task(
+        metricsEvaluatorHandler.identify_preprocessing_load_metrics_and_evaluate_metrics
+    )
 
-        # Create a temporary file to save the HTML content
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp:
-            tmp.write(html_content)
-            tmp_html_path = tmp.name
+    # return the input name as well as result_id which will be used to construct the unique URL for the result page
+    return {
+        "wui_name": data['wui_name'],
+        "result_id": str(data['id']),
+        "wui_type": prepared_input.wui_type
+    }
 
-        screenshot_image = capturer.capture_screenshot_html(html_path=tmp_html_path)
-        png_image = imagePreprocessing.convert_pil_image_to_png(image=screenshot_image)
 
-        # upload screenshot image and retrieve its public URL
-        image_url = db_client.upload_file(file=png_image, file_extension=".png")
-        # upload html file and retrieve its public URL
-        html_url = db_client.upload_file(file=file.file, file_extension=".html", content_type='text/html')
+class EvaluateBatchReturnType(BaseModel):
+    batch_id: str
+    items: List[EvaluateInputReturnType]
+
+
+# capacity shared by all batches of this server process: number of inputs captured and evaluated at once
+batch_capture_semaphore = asyncio.Semaphore(int(os.environ.get("BATCH_CAPTURE_CONCURRENCY") or 1))
+batch_evaluation_semaphore = asyncio.Semaphore(int(os.environ.get("BATCH_EVALUATION_CONCURRENCY") or 2))
+
+
+async def evaluate_batch_item(wui_id: str, url: Optional[str], file_input: Optional[tuple], metrics_to_evaluate: List[str],
+                              metrics, profile: str = "exact"):
+    try:
+        async with batch_capture_semaphore:
+            if url is not None:
+                prepared_input = await run_in_stage("capture", prepare_url_input, url, metrics_to_evaluate)
+            else:
+                filename, content_type, file_content = file_input
+                prepared_input = await run_in_stage(
+                    get_file_input_stage(content_type),
+                    prepare_file_input,
+                    filename,
+                    content_type,
+                    file_content,
+                    metrics_to_evaluate
+                )
+            screenshot_url, html_url = await run_in_stage("storage", upload_prepared_input, prepared_input)
+            await run_in_stage(
+                "storage", db_client.update_file_metadata, wui_id=wui_id, screenshot_url=screenshot_url, html_url=html_url
+            )
 
-        # upload file metadata to PostGreSQL DB
-        data = db_client.insert_file_metadata(
-            wui_name=file.filename,
-            screenshot_url=image_url,
-            html_url=html_url,
-            metrics_to_evaluate=metrics_data.metrics
+        async with batch_evaluation_semaphore:
+            metricsEvaluatorHandler = create_metrics_dependency_manager(
+                wui_id=wui_id,
+                prepared_input=prepared_input,
+                metrics_to_evaluate=metrics_to_evaluate,
+                url=url,
+                metrics=metrics,
+                profile=profile
+            )
+            await metricsEvaluatorHandler.identify_preprocessing_load_metrics_and_evaluate_metrics()
+    except Exception as e:
+        print(f"Failed to evaluate batch item {wui_id}: {e}")
+        await store_batch_item_failure(wui_id, metrics_to_evaluate, str(e))
+        get_evaluation_progress().publish_complete(wui_id)
+
+
+async def store_batch_item_failure(wui_id: str, metrics_to_evaluate: List[str], error: str):
+    # e.g. the input could not be captured: the metrics that are not stored yet are done, with the error of the item
+    try:
+        stored_results = await run_in_stage(
+            "storage", db_client.get_evaluation_results_by_wui_id, wui_id, include_failures=True
         )
+        stored_metrics = {stored_result['metric_id'] for stored_result in stored_results}
+        for metric_id in metrics_to_evaluate:
+            if metric_id not in stored_metrics:
+                await run_in_stage(
+                    "storage", db_client.insert_metric_failure_metadata, wui_id=wui_id, metric_id=metric_id,
+                    error=error
+                )
+                get_evaluation_progress().publish_metric(wui_id, metric_id, results=None, duration=None, error=error)
+    except Exception as e:
+        print(f"Failed to store the error of batch item {wui_id}: {e}")
+
+
+async def evaluate_batch_items(batch_items: List[tuple], metrics_to_evaluate: List[str], profile: str = "exact"):
+    # the metric definitions are shared by all items of the batch
+    metrics = await get_metrics()
+    await asyncio.gather(*[
+        evaluate_batch_item(wui_id, url, file_input, metrics_to_evaluate, metrics, profile)
+        for wui_id, url, file_input in batch_items
+    ])
 
-        metrics = await get_metrics()
 
-        metricsEvaluatorHandler = MetricsDependencyManager(
-            wui_id=data['id'],
-            pil_image=screenshot_image,
-            png_image=png_image,
+@app.post('/api/evaluate_batch', summary="Evaluate multiple WUIs (URLs and/or HTML, ZIP or PNG files)",
+          description="Evaluate a batch of WUIs. The IDs of the results are returned immediately, "
+                      "the inputs are captured and evaluated in the background.")
+async def evaluate_batch(
+        background_tasks: BackgroundTasks,
+        metrics: str = Form(...),
+        urls: Optional[str] = Form(None),
+        files: Optional[List[UploadFile]] = File(None)
+) -> EvaluateBatchReturnType:
+    metrics_dict = json.loads(metrics)  # Deserialize JSON string to Python dict
+    metrics_data = MetricKeys(**metrics_dict)  # Convert dict to Pydantic model
+    input_urls: List[str] = json.loads(urls) if urls else []
+    files = files or []
+
+    if not input_urls and not files:
+        raise HTTPException(status_code=400, detail="No URL or file provided")
+
+    # stored with every input of the batch, so that the progress of the batch can be looked up
+    batch_id = str(uuid.uuid4())
+    items = []
+    batch_items = []
+
+    for url in input_urls:
+        # register the input first, its screenshot is uploaded once it is captured
+        data = await run_in_stage(
+            "storage",
+            db_client.insert_file_metadata,
+            wui_name=url,
+            screenshot_url=None,
+            html_url=None,
             metrics_to_evaluate=metrics_data.metrics,
-            url=None,
-            html_content=html_content,
-            available_metrics=metrics
+            batch_id=batch_id
         )
+        get_evaluation_progress().start(data['id'])
+        items.append({"wui_name": data['wui_name'], "result_id": str(data['id']), "wui_type": "url"})
+        batch_items.append((data['id'], url, None))
 
-        # Add a background task (evaluating the metrics) to run after the response is sent
-        background_tasks.add_task(
-            metricsEvaluatorHandler.identify_preprocessing_load_metrics_and_evaluate_metrics
-        )
-
-    else:  # input is PNG
-        wui_type = "png"
-        file_content = await file.read()
-        # Reset the stream position of the in-memory file
-        image_stream = BytesIO(file_content)
-        image_stream.seek(0)
-        pil_image = Image.open(image_stream).convert("RGB")
-        image_url = db_client.upload_file(file=image_stream, file_extension=".png")
-        # upload file metadata to PostGreSQL DB
-        data = db_client.insert_file_metadata(
+    for file in files:
+        # uploaded files are only readable during the request
+        file_input = (file.filename, file.content_type, await file.read())
+        data = await run_in_stage(
+            "storage",
+            db_client.insert_file_metadata,
             wui_name=file.filename,
-            screenshot_url=image_url,
+            screenshot_url=None,
             html_url=None,
-            metrics_to_evaluate=metrics_data.metrics
+            metrics_to_evaluate=metrics_data.metrics,
+            batch_id=batch_id
         )
+        get_evaluation_progress().start(data['id'])
+        items.append({
+            "wui_name": data['wui_name'],
+            "result_id": str(data['id']),
+            "wui_type": get_file_input_type(file.content_type)
+        })
+        batch_items.append((data['id'], None, file_input))
 
-        metrics = await get_metrics()
+    background_tasks.add_task(evaluate_batch_items, batch_items, metrics_data.metrics, metrics_data.profile)
 
-        metricsEvaluatorHandler = MetricsDependencyManager(
-            wui_id=data['id'],
-            pil_image=pil_image.convert("RGB"),
-            png_image=image_stream,
-            metrics_to_evaluate=metrics_data.metrics,
-            url=None,
-            html_content=None,
-            available_metrics=metrics
-        )
+    return {
+        "batch_id": batch_id,
+        "items": items
+    }
 
-        # Add a background task (evaluating the metrics) to run after the response is sent
-        background_tasks.add_task(
-            metricsEvaluatorHandler.identify_preprocessing_load_metrics_and_evaluate_metrics
-        )
 
-    # return the input name as well as result_id which will be used to construct the unique URL for the result page
+class BatchItemStatusType(BaseModel):
+    result_id: str
+    wui_name: str
+    screenshot_url: Optional[str] = None
+    metrics_to_evaluate: List[str]
+    evaluated_metrics: List[str]
+    # metrics that failed or timed out, or could not be evaluated because the input could not be captured
+    failed: List[str]
+    # every requested metric has a stored result, or failed
+    complete: bool
+
+
+class BatchStatusType(BaseModel):
+    batch_id: str
+    items: List[BatchItemStatusType]
+    complete: bool
+
+
+@app.get('/api/batch/{batch_id}', summary="Get the status of a batch evaluation",
+         description="Get the inputs of a batch, with the metrics evaluated so far for each of them")
+async def get_batch_status(batch_id: str) -> BatchStatusType:
+    try:
+        uuid.UUID(batch_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch_items = await run_in_stage("storage", db_client.get_batch_items, batch_id)
+    if batch_items is None:
+        raise HTTPException(
+            status_code=501, detail="The batches are not stored by this database, see the migrations of the README"
+        )
+    if not batch_items:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    items = [
+        {
+            "result_id": str(batch_item['id']),
+            "wui_name": batch_item['wui_name'],
+            "screenshot_url": batch_item['screenshot_url'],
+            "metrics_to_evaluate": batch_item['metrics_to_evaluate'],
+            "evaluated_metrics": batch_item['evaluated_metrics'],
+            "failed": batch_item['failed_metrics'],
+            "complete": set(batch_item['metrics_to_evaluate']) <= {
+                *batch_item['evaluated_metrics'], *batch_item['failed_metrics']
+            }
+        }
+        for batch_item in batch_items
+    ]
     return {
-        "wui_name": data['wui_name'],
-        "result_id": str(data['id']),
-        "wui_type": wui_type
+        "batch_id": batch_id,
+        "items": items,
+        "complete": all(item["complete"] for item in items)
     }
 
 
@@ -344,21 +606,97 @@ class WuiDataType(BaseModel):
 
 @app.get('/api/data/{wui_id}', summary="Get metadata of a WUI", description="Get metadata of a WUI based on its ID")
 async def get_wui_data_by_wui_id(wui_id: str) -> WuiDataType:
-    data = db_client.get_wui_data_by_wui_id(wui_id)
+    data = await run_in_stage("storage", db_client.get_wui_data_by_wui_id, wui_id)
     return data
 
 
 class ResultType(BaseModel):
     metric_id: str
     results: List[str]
+    # fast profile settings and calibrated deviation of approximate results, None for exact results
+    approximation: Optional[Dict[str, Any]] = None
 
 
 @app.get('/api/result/{wui_id}', summary="Get evaluation results of a WUI", description="Get evaluation results for a specific WUI")
 async def get_result_by_wui_id(wui_id: str) -> List[ResultType]:
-    data = db_client.get_evaluation_results_by_wui_id(wui_id)
+    data = await run_in_stage("storage", db_client.get_evaluation_results_by_wui_id, wui_id)
     return data
 
 
+def format_server_sent_event(event: Dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+# default interval (seconds) between two reads of the stored results of an evaluation this process is not running
+DEFAULT_RESULT_STREAM_POLL_INTERVAL: float = 2
+# default time (seconds) after which the stored results are no longer read, e.g. when the instance evaluating them
+# went down
+DEFAULT_RESULT_STREAM_TIMEOUT: float = 900
+
+
+async def stream_stored_results(wui_id: str):
+    # the evaluation is not running in this server process: it runs in another instance behind the load balancer, or
+    # it is done. Stream its stored results (and errors) as they are inserted, until every requested metric is stored
+    poll_interval = float(os.environ.get("RESULT_STREAM_POLL_INTERVAL") or DEFAULT_RESULT_STREAM_POLL_INTERVAL)
+    deadline = time.monotonic() + float(os.environ.get("RESULT_STREAM_TIMEOUT") or DEFAULT_RESULT_STREAM_TIMEOUT)
+    try:
+        wui_data = await run_in_stage("storage", db_client.get_wui_data_by_wui_id, wui_id)
+        metrics_to_evaluate = set(wui_data['metrics_to_evaluate'])
+    except IndexError:  # unknown WUI
+        metrics_to_evaluate = set()
+
+    streamed_metrics = set()
+    while True:
+        stored_results = [
+            stored_result
+            for stored_result in await run_in_stage(
+                "storage", db_client.get_evaluation_results_by_wui_id, wui_id, include_failures=True
+            )
+            if stored_result['metric_id'] not in streamed_metrics
+        ]
+        for stored_result in stored_results:
+            streamed_metrics.add(stored_result['metric_id'])
+            yield format_server_sent_event({
+                "event": "metric",
+                "metric_id": stored_result['metric_id'],
+                "results": stored_result['results'] if stored_result.get('error') is None else None,
+                "duration": None,
+                "error": stored_result.get('error'),
+                "approximation": stored_result.get('approximation')
+            })
+        if metrics_to_evaluate <= streamed_metrics or time.monotonic() >= deadline:
+            break
+        if not stored_results:
+            # a comment line, ignored by the client, so that proxies do not close an idle connection
+            yield ": waiting for results\n\n"
+        await asyncio.sleep(poll_interval)
+    yield format_server_sent_event({"event": "complete"})
+
+
+async def stream_evaluation_progress(wui_id: str):
+    async for event in get_evaluation_progress().subscribe(wui_id):
+        yield format_server_sent_event(event)
+
+
+@app.get(
+    '/api/result/{wui_id}/stream',
+    summary="Stream evaluation results of a WUI",
+    description="Server-sent events: a 'metric' event (metric ID, results, duration, error and fast profile settings, "
+                "if any) as soon as each metric is evaluated, then a 'complete' event once the whole evaluation is done. "
+                "Evaluations running in another server instance are followed through their stored results"
+)
+async def stream_result_by_wui_id(wui_id: str):
+    if get_evaluation_progress().is_known(wui_id):
+        events = stream_evaluation_progress(wui_id)
+    else:
+        events = stream_stored_results(wui_id)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 class MetricExtensionRequestMetadata(BaseModel):
     download_links: List[str]
     email_address: str
@@ -386,21 +724,27 @@ async def insert_new_metric_data(
         # Do something with each file
 
         if file.filename == 'requirements.txt':
-            requirements_file_url = db_client.upload_file(
+            requirements_file_url = await run_in_stage(
+                "storage",
+                db_client.upload_file,
                 file=file.file,
                 file_extension=ext,
                 bucket_path='metric_extension',
                 content_type=file.content_type
             )
         elif file.filename == 'metric.json':
-            metric_config_file_url = db_client.upload_file(
+            metric_config_file_url = await run_in_stage(
+                "storage",
+                db_client.upload_file,
                 file=file.file,
                 file_extension=ext,
                 bucket_path='metric_extension',
                 content_type=file.content_type
             )
         else:
-            metric_implementation_file_url = db_client.upload_file(
+            metric_implementation_file_url = await run_in_stage(
+                "storage",
+                db_client.upload_file,
                 file=file.file,
                 file_extension=ext,
                 bucket_path='metric_extension',
@@ -411,7 +755,9 @@ async def insert_new_metric_data(
         raise HTTPException(status_code=500, detail="Failed to upload file(s)!")
 
     # upload metric extension metadata to PostGreSQL DB
-    data = db_client.insert_metric_extension_request_metadata(
+    data = await run_in_stage(
+        "storage",
+        db_client.insert_metric_extension_request_metadata,
         metric_implementation_file_url=metric_implementation_file_url,
         metric_config_file_url=metric_config_file_url,
         requirements_file_url=requirements_file_url,
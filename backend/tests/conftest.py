@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the backend modules are imported from backend/src, the working directory of the server
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
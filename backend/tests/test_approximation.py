@@ -0,0 +1,36 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from commons.approximation import FAST_PROFILE, FastProfile, describe_approximation
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+
+@pytest.fixture(autouse=True)
+def src_working_directory(monkeypatch):
+    # the calibration file is read relative to backend/src, the working directory of the server
+    monkeypatch.chdir(SRC_DIR)
+    monkeypatch.delenv("FAST_PROFILE_CALIBRATION", raising=False)
+
+
+@pytest.mark.parametrize("metric_id", ["m10", "m11"])
+def test_default_settings_are_calibrated(metric_id):
+    approximation = describe_approximation(metric_id, FastProfile())
+    assert approximation["profile"] == FAST_PROFILE
+    assert approximation["settings"] == "scale=0.5"
+    deviation = approximation["expected_deviation"]
+    assert deviation["samples"] > 0
+    assert 0 <= deviation["mean"] <= deviation["p95"] <= deviation["max"]
+    assert abs(deviation["bias"]) <= deviation["mean"]
+
+
+def test_uncalibrated_settings_report_no_deviation():
+    assert describe_approximation("m10", FastProfile(scale=0.3))["expected_deviation"] is None
+    assert describe_approximation("m1", FastProfile())["expected_deviation"] is None
+
+
+def test_missing_calibration_file_reports_no_deviation(monkeypatch, tmp_path):
+    monkeypatch.setenv("FAST_PROFILE_CALIBRATION", os.fspath(tmp_path / "missing.json"))
+    assert describe_approximation("m10", FastProfile())["expected_deviation"] is None
@@ -0,0 +1,111 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_handle = handle
+
+
+class FakeDriver:
+    """
+    WebDriver double recording the CDP commands, which rejects the invalid wildcard origin as Chrome does.
+    """
+
+    def __init__(self, pages):
+        # URL and subframe origins per window handle
+        self.pages = dict(pages)
+        self.current_handle = next(iter(self.pages))
+        self.switch_to = FakeSwitchTo(self)
+        self.cdp_commands = []
+        self.quit_count = 0
+
+    @property
+    def window_handles(self):
+        return list(self.pages)
+
+    @property
+    def current_url(self):
+        return self.pages[self.current_handle][0]
+
+    def get(self, url):
+        self.pages[self.current_handle] = (url, [])
+
+    def close(self):
+        del self.pages[self.current_handle]
+
+    def set_window_size(self, width, height):
+        pass
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_count += 1
+
+    def execute_cdp_cmd(self, command, params):
+        self.cdp_commands.append((command, params))
+        if command == 'Page.getFrameTree':
+            url, subframe_origins = self.pages[self.current_handle]
+            origin = '/'.join(url.split('/')[:3]) if '://' in url else '://'
+            return {'frameTree': {
+                'frame': {'url': url, 'securityOrigin': origin},
+                'childFrames': [{'frame': {'securityOrigin': o}} for o in subframe_origins]
+            }}
+        if command == 'Storage.clearDataForOrigin' and not params['origin'].startswith(('http://', 'https://')):
+            raise Exception(f"invalid origin: {params['origin']}")
+        return {}
+
+
+@pytest.fixture
+def browser_pool(monkeypatch):
+    # the pool is tested without Chrome, its browsers drive fake WebDrivers
+    create_webdriver = types.ModuleType('commons.create_webdriver')
+    create_webdriver.create_webdriver = lambda component_name: FakeDriver({'main': ('about:blank', [])})
+    monkeypatch.setitem(sys.modules, 'commons.create_webdriver', create_webdriver)
+    monkeypatch.delitem(sys.modules, 'commons.browser_pool', raising=False)
+    return importlib.import_module('commons.browser_pool')
+
+
+def test_reset_clears_the_visited_origins_without_recycling(browser_pool):
+    pool = browser_pool.BrowserPool(size=1, max_pages=0, max_memory_bytes=0)
+    with pool.lease('ScreenshotCapturer') as driver:
+        driver.pages['main'] = ('https://example.com/page?query', ['https://ads.example.net', '://'])
+        driver.pages['popup'] = ('http://popup.example.org:8080/', [])
+
+    assert pool._idle.qsize() == 1
+    browser = pool._idle.get_nowait()
+    assert browser.driver is driver
+    assert driver.quit_count == 0
+    assert driver.window_handles == ['main']
+    assert driver.current_url == 'about:blank'
+    cleared_origins = {params['origin'] for command, params in driver.cdp_commands
+                       if command == 'Storage.clearDataForOrigin'}
+    assert cleared_origins == {'https://example.com', 'https://ads.example.net', 'http://popup.example.org:8080'}
+    assert ('Network.clearBrowserCookies', {}) in driver.cdp_commands
+
+
+def test_browser_is_reused_across_leases(browser_pool):
+    pool = browser_pool.BrowserPool(size=1, max_pages=0, max_memory_bytes=0)
+    with pool.lease() as first_driver:
+        first_driver.get('https://example.com/')
+    with pool.lease() as second_driver:
+        pass
+
+    assert second_driver is first_driver
+    assert first_driver.quit_count == 0
+
+
+def test_failed_reset_recycles_the_browser(browser_pool, monkeypatch):
+    pool = browser_pool.BrowserPool(size=1, max_pages=0, max_memory_bytes=0)
+    with pool.lease() as driver:
+        monkeypatch.setattr(driver, 'delete_all_cookies', lambda: (_ for _ in ()).throw(Exception('crashed')))
+
+    assert pool._idle.qsize() == 0
+    assert driver.quit_count == 1
@@ -0,0 +1,42 @@
+import itertools
+
+import numpy as np
+import pytest
+from skimage.color import rgb2lab
+
+from commons.color_conversion import srgb_to_lab
+
+# absolute tolerance on L, a and b (L in [0, 100], a and b in about [-128, 128]): the conversion is computed in
+# float32, skimage's in float64, so the results differ by float32 rounding only (about 1e-4 observed)
+LAB_TOLERANCE = 1e-3
+
+
+def edge_value_image() -> np.ndarray:
+    # every combination of the extreme and middle channel values (black, white, primaries, secondaries, grays), plus
+    # the values around the linear segment of the sRGB gamma (10 / 255 = 0.039) and the whole gray ramp
+    levels = [0, 1, 9, 10, 11, 127, 128, 254, 255]
+    colors = np.array(list(itertools.product(levels, repeat=3)), dtype=np.uint8)
+    grays = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+    return np.concatenate([colors, grays])[None]
+
+
+def random_image(seed: int, shape=(97, 131)) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, shape + (3,), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("image", [edge_value_image(), random_image(0), random_image(1, (600, 7))],
+                         ids=["edge_values", "random", "random_tall"])
+def test_matches_skimage_rgb2lab(image):
+    lab = srgb_to_lab(image)
+    assert lab.dtype == np.float32
+    np.testing.assert_allclose(lab, rgb2lab(image), rtol=0, atol=LAB_TOLERANCE)
+
+
+def test_float_input_matches_skimage_rgb2lab():
+    image = random_image(2)
+    np.testing.assert_allclose(srgb_to_lab(image.astype(np.float64)), rgb2lab(image), rtol=0, atol=LAB_TOLERANCE)
+
+
+def test_conversion_does_not_depend_on_the_chunks():
+    image = random_image(3, (300, 40))
+    np.testing.assert_array_equal(srgb_to_lab(image, chunk_rows=7), srgb_to_lab(image, chunk_rows=None))
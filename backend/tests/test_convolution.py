@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from commons.convolution import BACKENDS, convolve2d, select_backend
+from commons.visual_clutter_utils import conv2
+
+# the backends agree with the direct convolution up to floating point rounding, relative to the magnitude of the
+# results (the sum of the absolute products of the image and the kernel)
+RELATIVE_TOLERANCE = 1e-10
+
+
+def matlab_conv2(image: np.ndarray, kernel: np.ndarray, mode: str = "full") -> np.ndarray:
+    """
+    MATLAB's conv2: the "same" part of the full convolution starts at row (column) floor(kernel size / 2), i.e.
+    ceil((kernel size - 1) / 2) + 1 in MATLAB's 1-based indexing.
+    """
+    full = signal.convolve2d(image, kernel, mode="full")
+    if mode == "full":
+        return full
+    ky, kx = kernel.shape
+    return full[ky // 2:ky // 2 + image.shape[0], kx // 2:kx // 2 + image.shape[1]]
+
+
+def assert_convolution_close(actual, image, kernel, mode):
+    expected = matlab_conv2(image, kernel, mode)
+    assert actual.shape == expected.shape
+    scale = signal.convolve2d(np.abs(image), np.abs(kernel)).max()
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=RELATIVE_TOLERANCE * scale)
+
+
+def rank1_kernel(rng, ky, kx):
+    return np.outer(rng.standard_normal(ky), rng.standard_normal(kx))
+
+
+KERNEL_SHAPES = {
+    "odd": (5, 5),
+    "even": (4, 6),
+    "odd_even": (3, 8),
+    "row": (1, 7),
+    "even_row": (1, 4),
+    "column": (9, 1),
+    "single": (1, 1),
+    "larger_than_image": (40, 33),
+    "taller_than_image": (35, 3),
+}
+IMAGE_SHAPES = [(23, 31), (32, 17)]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("mode", ["full", "same"])
+@pytest.mark.parametrize("kernel_shape", KERNEL_SHAPES.values(), ids=KERNEL_SHAPES.keys())
+@pytest.mark.parametrize("image_shape", IMAGE_SHAPES, ids=["odd_image", "even_image"])
+def test_backends_match_matlab_conv2(backend, mode, kernel_shape, image_shape):
+    rng = np.random.default_rng(0)
+    image = rng.standard_normal(image_shape)
+    # the separable backend only takes rank 1 kernels
+    kernel = rank1_kernel(rng, *kernel_shape) if backend == "separable" else rng.standard_normal(kernel_shape)
+    assert_convolution_close(convolve2d(image, kernel, mode=mode, backend=backend), image, kernel, mode)
+
+
+@pytest.mark.parametrize("mode", ["full", "same"])
+@pytest.mark.parametrize("kernel_shape", KERNEL_SHAPES.values(), ids=KERNEL_SHAPES.keys())
+def test_selected_backend_matches_matlab_conv2(mode, kernel_shape):
+    rng = np.random.default_rng(1)
+    for image_shape in [(8, 9), (120, 130)]:
+        image = rng.uniform(0, 255, image_shape)
+        for kernel in [rng.standard_normal(kernel_shape), rank1_kernel(rng, *kernel_shape)]:
+            assert_convolution_close(convolve2d(image, kernel, mode=mode), image, kernel, mode)
+            assert_convolution_close(conv2(image, kernel, mode if mode == "same" else None), image, kernel, mode)
+
+
+def test_same_mode_is_centered_as_matlab():
+    # conv2([1 2; 3 4], [1 1], 'same') in MATLAB, scipy's "same" mode would give [1 3; 3 7]
+    image = np.array([[1.0, 2.0], [3.0, 4.0]])
+    for backend in BACKENDS:
+        np.testing.assert_allclose(
+            convolve2d(image, np.array([[1.0, 1.0]]), mode="same", backend=backend), [[3, 2], [7, 4]], atol=1e-12
+        )
+
+
+def test_backend_selection():
+    rng = np.random.default_rng(2)
+    assert select_backend((8, 8), rng.standard_normal((3, 3))) == "direct"
+    assert select_backend((500, 500), rank1_kernel(rng, 9, 9)) == "separable"
+    assert select_backend((500, 500), rng.standard_normal((1, 15))) == "separable"
+    assert select_backend((500, 500), rng.standard_normal((5, 5))) == "filter2d"
+    assert select_backend((500, 500), rng.standard_normal((31, 31))) == "fft"
+
+
+def test_separable_backend_rejects_non_separable_kernels():
+    with pytest.raises(ValueError):
+        convolve2d(np.ones((10, 10)), np.eye(3), backend="separable")
+
+
+def test_unsupported_mode():
+    with pytest.raises(ValueError):
+        convolve2d(np.ones((10, 10)), np.ones((3, 3)), mode="valid")
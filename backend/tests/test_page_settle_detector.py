@@ -0,0 +1,89 @@
+import importlib
+import json
+import shutil
+import subprocess
+import sys
+import types
+
+import pytest
+
+# the settle script is run by Node.js against a minimal document, instead of a browser
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason="Node.js is not installed")
+
+VIEWPORT = {'width': 1280, 'height': 800}
+
+
+class FakeDriver:
+    """
+    WebDriver double running the scripts with Node.js, on a loaded and quiet page with the given images.
+    """
+
+    def __init__(self, images):
+        # complete, loading attribute and bounding rectangle (top, left, width, height) of every image
+        self.images = images
+
+    def execute_script(self, script):
+        program = f"""
+        const images = {json.dumps(self.images)}.map(image => ({{
+            complete: image.complete,
+            loading: image.loading,
+            getBoundingClientRect: () => {{
+                const [top, left, width, height] = image.rect;
+                return {{top: top, left: left, bottom: top + height, right: left + width}};
+            }}
+        }}));
+        // the DOM has not changed for a minute
+        global.window = {{
+            innerWidth: {VIEWPORT['width']}, innerHeight: {VIEWPORT['height']}, __wuiSettle: {{lastMutation: -60000}}
+        }};
+        global.document = {{readyState: 'complete', fonts: {{status: 'loaded'}}, images: images}};
+        global.MutationObserver = class {{ observe() {{}} }};
+        console.log(JSON.stringify((function () {{ {script} }})()));
+        """
+        return json.loads(subprocess.run(
+            ['node', '-e', program], check=True, capture_output=True, text=True
+        ).stdout)
+
+    def get_log(self, log_type):
+        return []
+
+
+@pytest.fixture
+def page_settle_detector(monkeypatch):
+    # only the exception type of selenium is used
+    exceptions = types.ModuleType('selenium.common.exceptions')
+    exceptions.WebDriverException = type('WebDriverException', (Exception,), {})
+    monkeypatch.setitem(sys.modules, 'selenium', types.ModuleType('selenium'))
+    monkeypatch.setitem(sys.modules, 'selenium.common', types.ModuleType('selenium.common'))
+    monkeypatch.setitem(sys.modules, 'selenium.common.exceptions', exceptions)
+    monkeypatch.delitem(sys.modules, 'screenshot_capturer.PageSettleDetector', raising=False)
+    return importlib.import_module('screenshot_capturer.PageSettleDetector')
+
+
+def images_loaded(page_settle_detector, images):
+    return FakeDriver(images).execute_script(page_settle_detector.SETTLE_STATE_SCRIPT)['imagesLoaded']
+
+
+def test_lazy_images_below_the_fold_are_not_waited_for(page_settle_detector):
+    assert images_loaded(page_settle_detector, [
+        {'complete': True, 'loading': 'eager', 'rect': [0, 0, 400, 300]},
+        {'complete': False, 'loading': 'lazy', 'rect': [3000, 0, 400, 300]},
+    ])
+
+
+def test_lazy_images_in_the_viewport_are_waited_for(page_settle_detector):
+    assert not images_loaded(page_settle_detector, [
+        {'complete': False, 'loading': 'lazy', 'rect': [600, 0, 400, 300]},
+    ])
+
+
+def test_eager_images_are_waited_for_even_offscreen(page_settle_detector):
+    assert not images_loaded(page_settle_detector, [
+        {'complete': False, 'loading': 'eager', 'rect': [3000, 0, 400, 300]},
+    ])
+
+
+def test_page_with_lazy_images_settles_without_spending_the_time_budget(page_settle_detector):
+    driver = FakeDriver([{'complete': False, 'loading': 'lazy', 'rect': [3000, 0, 400, 300]}])
+    detector = page_settle_detector.PageSettleDetector(driver, time_budget=5, quiet_window=0.01)
+    assert detector.wait() < 5
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from metrics_evaluator.TaskGraph import TaskGraph
+
+
+def test_nodes_receive_the_results_of_their_dependencies():
+    graph = TaskGraph()
+    graph.add_node("image", lambda: 2)
+    graph.add_node("metric", lambda image: image * 10, ["image"])
+    assert graph.run() == {"image": 2, "metric": 20}
+
+
+def test_hanging_node_times_out_and_its_dependents_are_skipped():
+    release = threading.Event()
+    graph = TaskGraph()
+    graph.add_node("browser", lambda: release.wait(), timeout=0.2)
+    graph.add_node("dom_metric", lambda browser: "dom", ["browser"])
+    graph.add_node("image_metric", lambda: "image")
+
+    start_time = time.perf_counter()
+    results = graph.run()
+    release.set()
+
+    assert time.perf_counter() - start_time < 5
+    assert isinstance(results["browser"], TimeoutError)
+    assert "timed out" in str(results["browser"])
+    assert isinstance(results["dom_metric"], RuntimeError)
+    assert results["image_metric"] == "image"
+
+
+def test_node_within_its_timeout_succeeds():
+    graph = TaskGraph()
+    graph.add_node("segments", lambda: "segments", timeout=5)
+    graph.add_node("failing", lambda: 1 / 0, timeout=5)
+    results = graph.run()
+    assert results["segments"] == "segments"
+    assert isinstance(results["failing"], ZeroDivisionError)
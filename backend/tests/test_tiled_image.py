@@ -0,0 +1,67 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from commons.tiled_image import TiledImage
+from image_preprocessing.ImagePreprocessing import ImagePreprocessing
+from image_preprocessing.InputImage import InputImage
+
+
+def read_png_data(png_bytes: bytes) -> bytes:
+    # the filtered rows of a PNG file, i.e. its decompressed IDAT chunks
+    position, idat = 8, b""
+    while position < len(png_bytes):
+        length, = struct.unpack(">I", png_bytes[position:position + 4])
+        if png_bytes[position + 4:position + 8] == b"IDAT":
+            idat += png_bytes[position + 8:position + 8 + length]
+        position += 12 + length
+    return zlib.decompress(idat)
+
+
+@pytest.fixture
+def page():
+    # noise, flat areas and repeated columns, so that every PNG row filter is picked
+    rng = np.random.default_rng(0)
+    page = rng.integers(0, 256, (530, 97, 3), dtype=np.uint8)
+    page[100:250] = 240
+    page[300:400] //= 16
+    page[:, 20:40] = page[:, 20:21]
+    return page
+
+
+@pytest.fixture
+def tiles(page):
+    tiles = TiledImage.create(page[top:top + 128] for top in range(0, len(page), 128))
+    yield tiles
+    tiles.unlink()
+
+
+def test_hash_is_the_hash_of_the_stitched_image(page, tiles):
+    assert ImagePreprocessing.compute_tiled_image_hash(tiles) == \
+        ImagePreprocessing.compute_image_hash(Image.fromarray(page))
+
+
+def test_png_is_encoded_as_pillow_does(page, tiles):
+    png_bytes = tiles.to_png()
+    np.testing.assert_array_equal(np.asarray(Image.open(io.BytesIO(png_bytes))), page)
+
+    pillow_png = io.BytesIO()
+    Image.fromarray(page).save(pillow_png, format="PNG")
+    assert read_png_data(png_bytes) == read_png_data(pillow_png.getvalue())
+
+
+def test_input_image_is_not_stitched_for_hashing_encoding_and_sharing(page, tiles):
+    input_image = InputImage.from_tiles(tiles)
+    assert input_image.png_size == len(tiles.to_png())
+    shared_image = tiles.share()
+    try:
+        np.testing.assert_array_equal(np.asarray(shared_image.open()), page)
+    finally:
+        shared_image.unlink()
+    assert input_image._pil_image is None
+
+    np.testing.assert_array_equal(input_image.array, page)
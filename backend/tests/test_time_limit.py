@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from commons.time_limit import MetricTimeout, time_limit
+
+
+def test_interrupts_code_running_for_too_long():
+    start_time = time.perf_counter()
+    with pytest.raises(MetricTimeout):
+        with time_limit(0.1):
+            while True:
+                time.sleep(0.01)
+    assert time.perf_counter() - start_time < 2
+
+
+def test_is_not_swallowed_by_code_catching_exceptions():
+    with pytest.raises(MetricTimeout):
+        with time_limit(0.1):
+            try:
+                time.sleep(5)
+            except Exception:
+                pass
+
+
+def test_does_not_fire_once_the_code_is_done():
+    with time_limit(0.1):
+        pass
+    time.sleep(0.2)
+
+
+def test_no_limit_outside_the_main_thread():
+    outcome = []
+
+    def run():
+        with time_limit(0.05):
+            time.sleep(0.2)
+        outcome.append("done")
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert outcome == ["done"]
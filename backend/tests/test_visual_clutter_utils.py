@@ -0,0 +1,199 @@
+import numpy as np
+import pytest
+from pyrtools import pyramids
+
+from commons.lab_pyramid import LabPyramid
+from commons.visual_clutter_utils import SteerableFreqBasis, band_entropies, centered_dft, entropy, histc, rgb2lab
+
+# the pyramids agree with pyrtools up to floating point rounding
+TOLERANCE = 1e-10
+
+# even and odd sizes, the masks being cropped differently at every level
+SHAPES = [(64, 96), (61, 83)]
+
+# pyrtools warns about odd sizes, which only its reconstruction (unused) is affected by
+pytestmark = pytest.mark.filterwarnings("ignore:Reconstruction will not be perfect")
+
+
+def legacy_histc(x, bins):
+    # histc of visual_clutter_utils before it was built on bincount, counting the values one by one
+    res = np.zeros(bins.shape)
+    for el in np.digitize(x, bins):
+        res[el - 1] += 1
+    return res
+
+
+def legacy_entropy(x, nbins=None):
+    # entropy of visual_clutter_utils before it was built on bincount
+    nsamples = x.shape[0]
+    if nbins is None:
+        nbins = int(np.ceil(np.sqrt(nsamples)))
+    elif nbins == 1:
+        return 0
+    edges = np.histogram(x, bins=nbins - 1)[1]
+    ref_hist = legacy_histc(x, edges)
+    ref_hist = ref_hist / float(np.sum(ref_hist))
+    ref_hist = ref_hist[np.nonzero(ref_hist)]
+    return -np.sum(ref_hist * np.log(ref_hist))
+
+
+def legacy_subband_entropy(lab_image):
+    # m11 before it decomposed the channels with SteerableFreqBasis: pyrtools' pyramid of every channel
+    def band_entropy(image_map):
+        bands = pyramids.SteerablePyramidFreq(image_map, height=3, order=3).pyr_coeffs
+        return [legacy_entropy(band.ravel()) for band in bands.values()]
+
+    clutter_se = float(np.mean(band_entropy(lab_image[:, :, 0])))
+    for jj in [lab_image[:, :, 1], lab_image[:, :, 2]]:
+        if np.max(jj) - np.min(jj) < 0.008:
+            jj = np.zeros_like(jj)
+        clutter_se = float(clutter_se + 0.0625 * np.mean(band_entropy(jj)))
+    return clutter_se / (1 + 2 * 0.0625)
+
+
+def ui_image(shape, seed=0):
+    """
+    A fixed RGB image looking like a user interface: flat colored boxes over a white background, with some noise.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((*shape, 3), 255.0)
+    for _ in range(12):
+        top, left = rng.integers(0, shape[0] - 8), rng.integers(0, shape[1] - 8)
+        height, width = rng.integers(4, shape[0] // 2), rng.integers(4, shape[1] // 2)
+        image[top:top + height, left:left + width] = rng.integers(0, 256, 3)
+    image += rng.normal(0, 4, image.shape)
+    return np.clip(image, 0, 255)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_steerable_basis_matches_pyrtools(shape):
+    image = rgb2lab(ui_image(shape))[:, :, 0]
+    expected = pyramids.SteerablePyramidFreq(image, height=3, order=3).pyr_coeffs
+
+    actual = SteerableFreqBasis(shape, 3, 3).decompose(centered_dft(image))
+
+    assert list(actual) == list(expected)
+    for key, band in expected.items():
+        assert actual[key].shape == band.shape
+        np.testing.assert_allclose(actual[key], band, rtol=0, atol=TOLERANCE * np.abs(band).max())
+
+
+def test_steerable_basis_decomposes_several_images():
+    # the masks are built once for the shape, and reused for every channel
+    lab_image = rgb2lab(ui_image(SHAPES[0]))
+    basis = SteerableFreqBasis(SHAPES[0], 3, 3)
+
+    for channel in range(3):
+        expected = pyramids.SteerablePyramidFreq(lab_image[:, :, channel], height=3, order=3).pyr_coeffs
+        actual = basis.decompose(centered_dft(lab_image[:, :, channel]))
+        for key, band in expected.items():
+            np.testing.assert_allclose(actual[key], band, rtol=0, atol=TOLERANCE * max(np.abs(band).max(), 1))
+
+
+@pytest.fixture
+def subband_entropy():
+    # the metrics read the image URL type of pydantic
+    pytest.importorskip("pydantic")
+    from metrics_evaluator.metrics import m11_subband_entropy
+    return m11_subband_entropy.Metric
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_subband_entropy_matches_pyrtools_baseline(subband_entropy, shape):
+    lab_image = rgb2lab(ui_image(shape))
+    expected = legacy_subband_entropy(lab_image)
+
+    assert subband_entropy.execute(lab_image=lab_image)[0] == pytest.approx(expected, rel=1e-9)
+    assert subband_entropy.execute(lab_pyramid=LabPyramid.build(lab_image))[0] == pytest.approx(expected, rel=1e-9)
+
+
+def test_subband_entropy_of_a_grayscale_image_matches_pyrtools_baseline(subband_entropy):
+    # the chrominance channels are flat, and decomposed as zeros arrays
+    lab_image = rgb2lab(np.repeat(ui_image(SHAPES[1]).mean(axis=2, keepdims=True), 3, axis=2))
+
+    assert subband_entropy.execute(lab_image=lab_image)[0] == \
+        pytest.approx(legacy_subband_entropy(lab_image), rel=1e-9)
+
+
+def random_signals():
+    rng = np.random.default_rng(1)
+    return {
+        "normal": rng.standard_normal(1000),
+        "uniform": rng.uniform(-5, 5, 257),
+        "integers": rng.integers(0, 8, 500).astype(float),
+        "constant": np.full(100, 3.0),
+        "two_samples": np.array([0.0, 1.0]),
+    }
+
+
+@pytest.mark.parametrize("name", list(random_signals()))
+def test_histc_matches_legacy(name):
+    x = random_signals()[name]
+    bins = np.histogram_bin_edges(x, bins=9)
+    np.testing.assert_array_equal(histc(x, bins), legacy_histc(x, bins))
+
+
+def test_histc_counts_values_at_the_bin_edges():
+    # as MATLAB's histc: values at an edge fall in the bin starting there, those outside of the edges (and at the
+    # last edge) in the last bin
+    bins = np.array([0.0, 1.0, 2.0, 3.0])
+    x = np.array([-1.0, 0.0, 1.0, 1.0, 2.0, 2.5, 3.0, 4.0])
+
+    np.testing.assert_array_equal(histc(x, bins), legacy_histc(x, bins))
+    np.testing.assert_array_equal(histc(x, bins), [1, 2, 2, 3])
+
+
+def test_histc_of_an_empty_input():
+    bins = np.array([0.0, 1.0, 2.0])
+    np.testing.assert_array_equal(histc(np.array([]), bins), legacy_histc(np.array([]), bins))
+
+
+def test_histc_counts_nan_in_the_last_bin():
+    bins = np.array([0.0, 1.0, 2.0])
+    x = np.array([np.nan, 0.5, 1.5, np.nan])
+    np.testing.assert_array_equal(histc(x, bins), legacy_histc(x, bins))
+
+
+@pytest.mark.parametrize("name", list(random_signals()))
+@pytest.mark.parametrize("nbins", [None, 1, 2, 16])
+def test_entropy_matches_legacy(name, nbins):
+    x = random_signals()[name]
+    assert entropy(x, nbins) == pytest.approx(legacy_entropy(x, nbins), rel=1e-12, abs=1e-15)
+
+
+def test_entropy_of_values_at_the_bin_edges_matches_legacy():
+    # the edges are the minimum, the maximum and evenly spaced values in between, all of them taken by the signal
+    x = np.repeat(np.linspace(0, 1, 5), [1, 2, 3, 4, 5])
+    assert entropy(x, 5) == pytest.approx(legacy_entropy(x, 5), rel=1e-12)
+
+
+@pytest.mark.parametrize("x", [np.array([]), np.array([0.0, np.nan, 1.0])], ids=["empty", "nan"])
+def test_entropy_raises_as_legacy(x):
+    with pytest.raises(ValueError):
+        legacy_entropy(x)
+    with pytest.raises(ValueError):
+        entropy(x)
+
+
+def test_band_entropies_match_legacy():
+    rng = np.random.default_rng(2)
+    bands = [rng.standard_normal(shape) for shape in [(64, 96), (32, 48), (16, 24), (8, 12), (3, 5)]]
+    bands.append(np.zeros((10, 10)))
+
+    expected = [legacy_entropy(band.ravel()) for band in bands]
+
+    np.testing.assert_allclose(band_entropies(bands), expected, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(band_entropies(iter(bands)), expected, rtol=1e-12, atol=1e-15)
+
+
+def test_band_entropies_of_no_bands():
+    assert band_entropies([]).shape == (0,)
+
+
+@pytest.mark.parametrize("band", [np.array([]), np.array([0.0, np.nan, 1.0])], ids=["empty", "nan"])
+def test_band_entropies_raise_as_legacy(band):
+    rng = np.random.default_rng(3)
+    with pytest.raises(ValueError):
+        legacy_entropy(band)
+    with pytest.raises(ValueError):
+        band_entropies([rng.standard_normal(100), band])
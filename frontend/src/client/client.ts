@@ -28,6 +28,10 @@ export function getEvaluationResults(
   return '';
 }
 
+export function getEvaluationResultsStreamUrl(wui_id: string): string {
+  return `${prefixUrl.replace(/\/$/, '')}/result/${wui_id}/stream`;
+}
+
 export function getInputData(
   wui_id: string
 ): Promise<InputDataType> | '' {
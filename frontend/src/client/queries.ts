@@ -1,6 +1,8 @@
-import {useQuery} from '@tanstack/react-query';
+import {useQuery, useQueryClient} from '@tanstack/react-query';
+import {useEffect} from 'react';
 
-import {getEvaluationResults, getInputData,getMetrics} from "./client";
+import {EvaluationResultType} from "../types/EvaluationResultType";
+import {getEvaluationResults, getEvaluationResultsStreamUrl, getInputData,getMetrics} from "./client";
 
 export function useMetrics() {
   return useQuery({
@@ -22,6 +24,38 @@ export function useEvaluationResults(wui_id: string) {
   });
 }
 
+// Subscribes to the results of the metrics as they are evaluated, and adds them to the cached evaluation results
+export function useEvaluationResultsStream(wui_id: string, enabled: boolean) {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (!enabled || wui_id === 'result') return;
+    const eventSource = new EventSource(getEvaluationResultsStreamUrl(wui_id));
+
+    eventSource.addEventListener('metric', (event: MessageEvent) => {
+      const {metric_id, results, error, approximation} = JSON.parse(event.data);
+      if (error) {
+        console.log(`Failed to evaluate ${metric_id}: ${error}`);
+        return;
+      }
+      queryClient.setQueryData(
+        [`getEvaluationResults/${wui_id}`],
+        (evaluationResults: EvaluationResultType[] | undefined) => {
+          const otherResults = (evaluationResults ?? []).filter(result => result.metric_id !== metric_id);
+          return [...otherResults, {metric_id, results, approximation}];
+        }
+      );
+    });
+    eventSource.addEventListener('complete', () => {
+      eventSource.close();
+      // reconcile with the stored results, e.g. if the stream stopped waiting for a metric that failed
+      queryClient.invalidateQueries({queryKey: [`getEvaluationResults/${wui_id}`]});
+    });
+
+    return () => eventSource.close();
+  }, [wui_id, enabled, queryClient]);
+}
+
 export function useInputData(wui_id: string) {
   return useQuery({
     queryKey: [`getInputData/${wui_id}`],
@@ -4,10 +4,10 @@ import LinkIcon from '@mui/icons-material/Link';
 import ShareIcon from '@mui/icons-material/Share';
 import {CircularProgress} from "@mui/material";
 import {Accordion, AccordionDetails, AccordionSummary, Box, Button, Divider, Grid, Link, Tooltip, Typography} from "@mui/material";
-import React, {ReactElement, useEffect,useState} from 'react';
+import React, {ReactElement, useState} from 'react';
 import {useLocation, useNavigate} from "react-router-dom";
 
-import {useEvaluationResults, useInputData, useMetrics} from "../../client/queries";
+import {useEvaluationResults, useEvaluationResultsStream, useInputData, useMetrics} from "../../client/queries";
 import Container from '../../shared/container/Container';
 import Header from "../../shared/header/Header";
 import {EvaluationResultContentWrap} from "../../shared/wrappers/ElementWrap";
@@ -31,21 +31,15 @@ export default function EvaluationResultPage(): ReactElement {
   const id = pathname.split("/").at(-1);
   const [isWuiHidden, setIsWuiHidden] = useState(false);
   const {data: inputData, isLoading: isInputDataLoading} = useInputData(id);
-  const {data: evaluationResults, refetch} = useEvaluationResults(id);
+  const {data: evaluationResults} = useEvaluationResults(id);
   const [isUrlCopied, setIsUrlCopied] = useState(false);
   const renderedWidth = naturalSize.width > 500 ? 500 : naturalSize.width;
   const renderedHeight = Math.round(naturalSize.height / (naturalSize.width / renderedWidth));
 
-  useEffect(() => {
-    let intervalId: number;
-    if (evaluationResults && inputData && evaluationResults.length !== inputData.metrics_to_evaluate.length) {
-      // Setup an interval to refetch data every 3000ms
-      intervalId = setInterval(() => {
-        refetch();
-      }, 3000);
-    }
-    return () => clearInterval(intervalId);
-  }, [evaluationResults, inputData, refetch]);
+  // Receive the remaining results as they are evaluated instead of polling for them
+  const isEvaluationPending = !!evaluationResults && !!inputData
+    && evaluationResults.length !== inputData.metrics_to_evaluate.length;
+  useEvaluationResultsStream(id, isEvaluationPending);
 
 
   const copyUrlToClipboard = async () => {
@@ -243,6 +237,20 @@ export default function EvaluationResultPage(): ReactElement {
                           }, [])
                         }
                         </Typography>
+                        {
+                          value.approximation &&
+                          <Typography variant="body2" color="warning.main" gutterBottom>
+                            Approximate result ({value.approximation.profile} evaluation profile, {value.approximation.settings}):
+                            evaluated on a downscaled image, it may deviate from the exact result
+                            {
+                              value.approximation.expected_deviation ?
+                                ` (expected deviation: ${(value.approximation.expected_deviation.mean * 100).toFixed(1)}% on average, `
+                                + `${(value.approximation.expected_deviation.bias * 100).toFixed(1)}% bias, `
+                                + `${(value.approximation.expected_deviation.p95 * 100).toFixed(1)}% at the 95th percentile).` :
+                                ' (not calibrated).'
+                            }
+                          </Typography>
+                        }
                         <ResultTable metricInformation={metricsInformation[value.metric_id]} results={value} />
                       </AccordionDetails>
                     </Accordion>
@@ -23,6 +23,10 @@ export default function PreprocessingDefinitionTable(): ReactElement {
       key: "lab_conversion_required",
       description: " A boolean value specifying whether image conversion to CIELab color space is required by the metric."
     },
+    {
+      key: "accessibility_check_required",
+      description: " Optional. A boolean value specifying whether the axe-core accessibility check results of the rendered page are required by the metric (passed as accessibility_results)."
+    },
   ];
 
 
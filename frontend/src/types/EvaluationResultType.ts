@@ -1,4 +1,22 @@
+// Relative deviation of fast results from the exact results, as calibrated over a screenshot corpus
+export interface ExpectedDeviationType {
+  samples: number;
+  bias: number;
+  mean: number;
+  p95: number;
+  max: number;
+  median_speedup: number;
+}
+
+// Settings of the fast evaluation profile approximate results were evaluated with
+export interface ApproximationType {
+  profile: string;
+  settings: string;
+  expected_deviation: ExpectedDeviationType | null;
+}
+
 export interface EvaluationResultType {
   metric_id: string;
   results: string[];
-}
\ No newline at end of file
+  approximation?: ApproximationType | null;
+}
@@ -4,6 +4,7 @@ interface PreprocessingType {
   jpeg_conversion_required: boolean;
   segmentation_required: boolean;
   lab_conversion_required: boolean;
+  accessibility_check_required?: boolean;
 }
 
 export interface ReferenceType {
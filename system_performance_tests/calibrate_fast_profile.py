@@ -0,0 +1,109 @@
+"""
+Calibration benchmark of the fast evaluation profile (see backend/src/commons/approximation.py).
+
+Evaluates the approximated metrics (m10, m11) on a corpus of screenshots, exactly and with each of the given fast
+profile settings, and writes the deviation of the fast scalar results from the exact ones (relative to the exact
+results) and the speedups to the calibration file, from which the server reports the expected deviation of fast
+results.
+
+Example usage, from backend/src:
+    python ../../system_performance_tests/calibrate_fast_profile.py --corpus /path/to/screenshots \
+        --scales 0.5,0.25 --tiles 0,4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend" / "src"))
+
+from commons.approximation import DEFAULT_FAST_PROFILE_CALIBRATION, DEFAULT_FAST_PROFILE_TILE_SIZE, FastProfile
+from image_preprocessing.ImagePreprocessing import ImagePreprocessing
+from metrics_evaluator.metrics import m10_feature_congestion, m11_subband_entropy
+
+METRICS = {
+    "m10": m10_feature_congestion.Metric,
+    "m11": m11_subband_entropy.Metric,
+}
+
+
+def timed(func, *args, **kwargs):
+    # the metrics print their progress
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        results = func(*args, **kwargs)
+    return results, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the fast evaluation profile on a screenshot corpus.")
+    parser.add_argument("--corpus", required=True, help="directory of the screenshots (PNG files)")
+    parser.add_argument("--output", default=DEFAULT_FAST_PROFILE_CALIBRATION, help="calibration file to write")
+    parser.add_argument("--metrics", default=",".join(METRICS), help="metrics to calibrate")
+    parser.add_argument("--scales", default="0.5", help="downscaling factors")
+    parser.add_argument("--tiles", default="0", help="numbers of sampled tiles (0: whole image)")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_FAST_PROFILE_TILE_SIZE)
+    args = parser.parse_args()
+
+    screenshots = sorted(Path(args.corpus).glob("*.png"))
+    if not screenshots:
+        sys.exit(f"No PNG file in {args.corpus}")
+    metric_ids = args.metrics.split(",")
+    profiles = [
+        FastProfile(scale=float(scale), tiles=int(tiles), tile_size=args.tile_size)
+        for scale in args.scales.split(",") for tiles in args.tiles.split(",")
+    ]
+
+    # relative deviations and speedups, by metric and profile settings
+    deviations = {metric_id: {profile.key: [] for profile in profiles} for metric_id in metric_ids}
+    speedups = {metric_id: {profile.key: [] for profile in profiles} for metric_id in metric_ids}
+
+    for screenshot in screenshots:
+        lab_image = ImagePreprocessing.convert_pil_image_to_lab(Image.open(screenshot).convert("RGB"))
+        for metric_id in metric_ids:
+            metric = METRICS[metric_id]
+            exact_results, exact_duration = timed(metric.execute, lab_image=lab_image)
+            exact = exact_results[0]
+            for profile in profiles:
+                fast_results, fast_duration = timed(metric.execute_fast, profile, lab_image=lab_image)
+                if exact != 0:
+                    deviations[metric_id][profile.key].append((fast_results[0] - exact) / abs(exact))
+                speedups[metric_id][profile.key].append(exact_duration / fast_duration)
+                print(f"{screenshot.name} {metric_id} {profile.key}: exact {exact:.4f} ({exact_duration:.2f} s), "
+                      f"fast {fast_results[0]:.4f} ({fast_duration:.2f} s)")
+
+    calibration = {
+        # the screenshots the calibration is measured on, by file name
+        "corpus": [screenshot.name for screenshot in screenshots],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "metrics": {
+            metric_id: {
+                key: {
+                    "samples": len(values),
+                    # relative deviation of the fast results from the exact results
+                    "bias": float(np.mean(values)),
+                    "mean": float(np.mean(np.abs(values))),
+                    "p95": float(np.percentile(np.abs(values), 95)),
+                    "max": float(np.max(np.abs(values))),
+                    "median_speedup": float(np.median(speedups[metric_id][key]))
+                }
+                for key, values in profile_deviations.items() if values
+            }
+            for metric_id, profile_deviations in deviations.items()
+        }
+    }
+    with open(args.output, "w") as f:
+        json.dump(calibration, f, indent=2)
+    print(json.dumps(calibration["metrics"], indent=2))
+
+
+if __name__ == "__main__":
+    main()